@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Model.to_dict() versus the precompiled row serializers.
+This script fills an in-memory database with 10,000 products and orders and
+times fetching + serializing them both ways. It never touches app.db.
+
+Usage: python bench_serializers.py [rows]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from src.models.models import (
+    db, User, UserRole, Category, Vendor, Product, Order, OrderStatus, DeliveryType
+)
+from src.models.serializers import compile_serializer, row_select
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(rows):
+    user = User(username='bench', email='bench@example.com', password_hash='x',
+                first_name='Bench', last_name='User', role=UserRole.VENDOR)
+    category = Category(name='Bench')
+    db.session.add_all([user, category])
+    db.session.flush()
+    vendor = Vendor(user_id=user.id, business_name='Bench Vendor')
+    db.session.add(vendor)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Product), [{
+        'vendor_id': vendor.id, 'category_id': category.id,
+        'name': f'Product {i}', 'description': 'A long product description ' * 8,
+        'price': 1.0 + i % 50, 'sku': f'BENCH-{i}', 'stock_quantity': i % 100,
+        'cultural_significance': 'Cultural notes ' * 10, 'tags': '["bench", "test"]',
+        'created_at': now, 'updated_at': now,
+    } for i in range(rows)])
+    db.session.execute(db.insert(Order), [{
+        'order_number': f'HO-BENCH-{i}', 'customer_id': user.id, 'vendor_id': vendor.id,
+        'status': OrderStatus.DELIVERED, 'delivery_type': DeliveryType.DELIVERY,
+        'subtotal': 10.0, 'total_amount': 12.5, 'estimated_delivery_time': now,
+        'actual_delivery_time': now, 'preparation_started_at': now, 'ready_for_pickup_at': now,
+        'out_for_delivery_at': now, 'delivered_at': now, 'created_at': now, 'updated_at': now,
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def timed(label, fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<42} {best * 1000:8.1f} ms  ({len(result)} rows)")
+    return best
+
+
+def bench_model(model):
+    print(f"\n{model.__name__}:")
+    orm = timed('ORM objects + to_dict()',
+                lambda: [obj.to_dict() for obj in model.query.all()])
+
+    stmt, serialize = row_select(model)
+    core = timed('Core rows + compiled serializer',
+                 lambda: [serialize(row) for row in db.session.execute(stmt)])
+
+    # Serialization alone, on data that is already loaded
+    objects = model.query.all()
+    rows = db.session.execute(stmt).all()
+    serialize = compile_serializer(model)
+    to_dict_only = timed('to_dict() only', lambda: [obj.to_dict() for obj in objects])
+    compiled_only = timed('compiled serializer only', lambda: [serialize(row) for row in rows])
+
+    assert [obj.to_dict() for obj in objects] == [serialize(row) for row in rows]
+    print(f"  speed-up: {orm / core:.1f}x end to end, {to_dict_only / compiled_only:.1f}x serialization only")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        populate(rows)
+        bench_model(Product)
+        bench_model(Order)
+
+
+if __name__ == '__main__':
+    main()
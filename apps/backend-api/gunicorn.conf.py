@@ -0,0 +1,32 @@
+"""Gunicorn settings; gunicorn reads this file from the working directory.
+
+Run from this directory with ``gunicorn`` (no arguments needed).
+
+``GET /api/orders/stream`` holds its response open for up to
+``ORDER_STREAM_MAX_AGE`` seconds (300 by default). With gunicorn's default
+sync workers every open stream would occupy a whole worker process, so a
+few open order pages would starve the rest of the API. Threaded workers
+give each stream one thread instead. ``GUNICORN_THREADS`` should cover the
+concurrent streams a worker is expected to hold plus ordinary requests.
+Clients that cannot hold a stream open can poll ``GET /api/orders/events``.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'src.main:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+
+# gthread workers report to the arbiter from their main loop, so a long
+# stream does not count against the timeout the way it would for sync.
+timeout = 30
+keepalive = 5
+
+
+def post_worker_init(worker):
+    """Start building this worker's in-memory indexes before requests arrive."""
+    from src.services.refresher import start_refreshers
+    start_refreshers(worker.wsgi)
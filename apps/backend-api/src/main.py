@@ -11,6 +11,9 @@ from src.routes.products import products_bp
 from src.routes.vendors import vendors_bp
 from src.routes.orders import orders_bp
 from src.routes.riders import riders_bp
+from src.services.schema import ensure_autoincrement, ensure_indexes, migrate_data
+from src.services.search import init_product_search
+from src.services.tags import backfill_product_tags
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -40,11 +43,17 @@ app.register_blueprint(orders_bp, url_prefix='/api')
 app.register_blueprint(riders_bp, url_prefix='/api')
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# DATABASE_URL points elsewhere, e.g. the test suite's scratch database
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL") or \
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    ensure_autoincrement()
+    ensure_indexes()
+    init_product_search()
+    migrate_data(1, backfill_product_tags)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
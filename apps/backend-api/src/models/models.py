@@ -24,9 +24,47 @@ class DeliveryType(enum.Enum):
     DELIVERY = "delivery"
     PICKUP = "pickup"
 
+class SparseFieldsMixin:
+    """Lets ``to_dict`` emit a subset of columns for ``?fields=`` requests."""
+    
+    @classmethod
+    def parse_fields(cls, value):
+        """Parse a comma-separated field list; ``None`` means all fields.
+        
+        The primary key is always included. Raises ``ValueError`` for names
+        that are not columns of the model.
+        """
+        if not value:
+            return None
+        columns = cls.__table__.columns.keys()
+        fields = ['id']
+        for field in value.split(','):
+            field = field.strip()
+            if not field or field in fields:
+                continue
+            if field not in columns:
+                raise ValueError(f'Unknown field: {field}')
+            fields.append(field)
+        return fields
+    
+    def _sparse_dict(self, fields):
+        data = {}
+        for field in fields:
+            value = getattr(self, field)
+            if isinstance(value, enum.Enum):
+                value = value.value
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            data[field] = value
+        return data
+
 # User Model
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination order for /api/users
+        db.Index('ix_users_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -102,7 +140,7 @@ class Category(db.Model):
         }
 
 # Vendor Model
-class Vendor(db.Model):
+class Vendor(SparseFieldsMixin, db.Model):
     __tablename__ = 'vendors'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -138,7 +176,9 @@ class Vendor(db.Model):
     orders = db.relationship('Order', backref='vendor', lazy=True)
     assigned_riders = db.relationship('VendorRider', backref='vendor', lazy=True)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return self._sparse_dict(fields)
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -236,8 +276,41 @@ class VendorRider(db.Model):
         }
 
 # Product Model
-class Product(db.Model):
+class Product(SparseFieldsMixin, db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Keyset pagination order for /api/products
+        db.Index('ix_products_created_at', 'created_at'),
+        # Catalogue snapshot watermark and incremental rebuilds
+        db.Index('ix_products_updated_at', 'updated_at'),
+        # Catalogue browsing: one index per filter (none, category, vendor)
+        # and sort (price, newest, featured first), so each combination is a
+        # range scan in sort order. The rowid SQLite appends to every entry
+        # supplies the id tie-breaker.
+        db.Index('ix_products_active_price', 'is_active', 'price'),
+        db.Index('ix_products_active_created_at', 'is_active', 'created_at'),
+        db.Index('ix_products_active_featured', 'is_active', 'is_featured', 'created_at'),
+        db.Index('ix_products_active_category_price', 'is_active', 'category_id', 'price'),
+        db.Index('ix_products_active_category_created_at', 'is_active', 'category_id', 'created_at'),
+        db.Index(
+            'ix_products_active_category_featured', 'is_active', 'category_id', 'is_featured', 'created_at'
+        ),
+        db.Index('ix_products_active_vendor_price', 'is_active', 'vendor_id', 'price'),
+        db.Index('ix_products_active_vendor_created_at', 'is_active', 'vendor_id', 'created_at'),
+        db.Index(
+            'ix_products_active_vendor_featured', 'is_active', 'vendor_id', 'is_featured', 'created_at'
+        ),
+        # Low-stock listings and counts; only rows at or under their
+        # threshold are indexed, so the index stays small. Its columns
+        # follow the listing's WHERE and ORDER BY (vendor_id, stock_quantity,
+        # id), and low_stock_threshold makes it covering for the counts;
+        # without both the planner preferred the indexes above.
+        db.Index(
+            'ix_products_active_low_stock',
+            'is_active', 'vendor_id', 'stock_quantity', 'id', 'low_stock_threshold',
+            sqlite_where=db.text('is_active = 1 AND stock_quantity <= low_stock_threshold')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=False)
@@ -267,7 +340,7 @@ class Product(db.Model):
     additional_images = db.Column(db.Text)  # JSON array of image URLs
     
     # SEO and metadata
-    tags = db.Column(db.Text)  # JSON array of tags
+    tags = db.Column(db.Text)  # JSON array of tags, as given; indexed copy in product_tags
     origin_country = db.Column(db.String(100))
     cultural_significance = db.Column(db.Text)
     
@@ -277,7 +350,9 @@ class Product(db.Model):
     # Relationships
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return self._sparse_dict(fields)
         return {
             'id': self.id,
             'vendor_id': self.vendor_id,
@@ -303,9 +378,52 @@ class Product(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+# Tag Model
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # normalized, lower case
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+# Product-Tag Association Model
+class ProductTag(db.Model):
+    __tablename__ = 'product_tags'
+    __table_args__ = (
+        # Tag filter: tag -> products. The primary key covers product -> tags.
+        db.Index('ix_product_tags_tag_product', 'tag_id', 'product_id'),
+    )
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+
 # Order Model
-class Order(db.Model):
+class Order(SparseFieldsMixin, db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Keyset pagination order (created_at, id) for each order listing;
+        # SQLite appends the rowid to every index entry, which breaks ties.
+        db.Index('ix_orders_created_at', 'created_at'),
+        db.Index('ix_orders_customer_created_at', 'customer_id', 'created_at'),
+        db.Index('ix_orders_vendor_created_at', 'vendor_id', 'created_at'),
+        db.Index('ix_orders_rider_created_at', 'rider_id', 'created_at'),
+        # Closed orders due for archiving
+        db.Index('ix_orders_status_updated_at', 'status', 'updated_at'),
+        # Pickup codes are random; no two open orders may share one
+        db.Index(
+            'ix_orders_open_pickup_code', 'pickup_code', unique=True,
+            sqlite_where=db.text("pickup_code IS NOT NULL AND status NOT IN ('DELIVERED', 'CANCELLED')")
+        ),
+        # Never hand out an id again once its order moved to orders_archive
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -356,7 +474,9 @@ class Order(db.Model):
     # Relationships
     order_items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return self._sparse_dict(fields)
         return {
             'id': self.id,
             'order_number': self.order_number,
@@ -419,3 +539,98 @@ class OrderItem(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+def _archive_table(source, name, *indexes):
+    """A table with ``source``'s columns, in the same order, minus constraints."""
+    columns = [
+        db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in source.columns
+    ]
+    return db.Table(name, *columns, *indexes)
+
+
+# Closed orders moved out of the hot tables (see services/archive.py). Same
+# columns as orders/order_items so rows move with INSERT ... SELECT.
+orders_archive = _archive_table(
+    Order.__table__, 'orders_archive',
+    db.Index('ix_orders_archive_created_at', 'created_at'),
+    db.Index('ix_orders_archive_customer_created_at', 'customer_id', 'created_at'),
+    db.Index('ix_orders_archive_vendor_created_at', 'vendor_id', 'created_at'),
+    db.Index('ix_orders_archive_rider_created_at', 'rider_id', 'created_at'),
+)
+
+order_items_archive = _archive_table(
+    OrderItem.__table__, 'order_items_archive',
+    db.Index('ix_order_items_archive_order_id', 'order_id'),
+)
+
+
+# Idempotency Key Model
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+        # Expired keys are purged by expiry time
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    
+    # SHA-256 of method, path and canonical body of the first request
+    fingerprint = db.Column(db.String(64), nullable=False)
+    
+    # Stored response; NULL while the first request is still running
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    
+    # When the current claim was taken; a retry takes over a claim with no
+    # response once it is older than the lease
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+# Order Event Model
+class OrderEvent(db.Model):
+    """One row per order status change; rows are never updated or deleted."""
+    __tablename__ = 'order_events'
+    __table_args__ = (
+        # Incremental reads (id > since) per order, vendor and customer
+        db.Index('ix_order_events_order_id', 'order_id', 'id'),
+        db.Index('ix_order_events_vendor_id', 'vendor_id', 'id'),
+        db.Index('ix_order_events_customer_id', 'customer_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    # Copied from the order so streams can be filtered without a join
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rider_id = db.Column(db.Integer, db.ForeignKey('riders.id'))
+    
+    from_status = db.Column(db.Enum(OrderStatus))  # NULL for the creation event
+    to_status = db.Column(db.Enum(OrderStatus), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'vendor_id': self.vendor_id,
+            'customer_id': self.customer_id,
+            'rider_id': self.rider_id,
+            'from_status': self.from_status.value if self.from_status else None,
+            'to_status': self.to_status.value,
+            'actor_id': self.actor_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# The event log is append-only; SQLite enforces it for every writer.
+for _operation in ('UPDATE', 'DELETE'):
+    db.event.listen(OrderEvent.__table__, 'after_create', db.DDL(
+        f"CREATE TRIGGER order_events_no_{_operation.lower()} BEFORE {_operation} ON order_events "
+        f"BEGIN SELECT RAISE(ABORT, 'order_events is append-only'); END"
+    ).execute_if(dialect='sqlite'))
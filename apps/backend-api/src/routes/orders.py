@@ -1,26 +1,38 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from src.models.models import (
-    Order, OrderItem, Product, Vendor, User, UserRole, Rider, 
+    Order, OrderItem, Vendor, UserRole, Rider,
     OrderStatus, DeliveryType, db
 )
 from src.routes.user import token_required
+from src.models.serializers import row_select
+from src.services.archive import (
+    archive_after_days, archive_orders, archived_order, date_range_filters, order_columns, parse_date_range,
+    wants_archive
+)
+from src.services.expansion import (
+    ORDER_EXPANSIONS, ORDER_ROW_REQUIRED, expand_order_rows, order_load_options, parse_expand,
+    parse_fields, row_required, serialize_order
+)
+from src.services.inventory import StockError, reserve_stock
+from src.services.order_stream import (
+    latest_event_id, order_stream, publish_events, publish_rider_assigned, subscriber_filter
+)
+from src.services.pagination import (
+    ORDER_KEYSET, cursor_requested, keyset_paginate, offset_paginate, total_requested
+)
+from src.services.idempotency import idempotent
+from src.services.order_export import EXPORT_FORMATS, export_orders
+from src.services.order_numbers import assign_pickup_code, generate_order_number
+from src.services.order_state import (
+    DEFAULT_EVENT_LIMIT, MAX_BULK_UPDATES, MAX_EVENT_LIMIT, TransitionError, bulk_transition,
+    check_transition, events_since, record_event, transition
+)
+from src.services.pricing import PricingError, quote_order
+from src.services.response_cache import invalidate_products
 from datetime import datetime, timedelta
-import uuid
-import random
-import string
 
 orders_bp = Blueprint('orders', __name__)
 
-def generate_order_number():
-    """Generate a unique order number"""
-    timestamp = datetime.now().strftime('%Y%m%d')
-    random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"HO-{timestamp}-{random_part}"
-
-def generate_pickup_code():
-    """Generate a 6-digit pickup code"""
-    return ''.join(random.choices(string.digits, k=6))
-
 @orders_bp.route('/orders', methods=['GET'])
 @token_required
 def get_orders(current_user):
@@ -29,61 +41,63 @@ def get_orders(current_user):
         per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status')
         vendor_id = request.args.get('vendor_id', type=int)
+        expand = parse_expand(ORDER_EXPANSIONS, ORDER_EXPANSIONS)
+        fields = parse_fields(Order)
         
-        query = Order.query
+        # Archived orders are only read when the date range reaches them
+        date_from, date_to = parse_date_range()
+        include_archive = wants_archive(date_from, date_to)
+        source = order_columns(include_archive)
+        
+        stmt, serialize = row_select(
+            Order, fields, required=row_required(expand, ORDER_ROW_REQUIRED, 'id', 'created_at'),
+            source=source
+        )
+        query = stmt.where(*date_range_filters(source, date_from, date_to))
         
         # Filter based on user role
         if current_user.role == UserRole.BUYER:
-            query = query.filter_by(customer_id=current_user.id)
+            query = query.where(source.customer_id == current_user.id)
         elif current_user.role == UserRole.VENDOR:
             vendor = Vendor.query.filter_by(user_id=current_user.id).first()
             if vendor:
-                query = query.filter_by(vendor_id=vendor.id)
+                query = query.where(source.vendor_id == vendor.id)
             else:
                 return jsonify({'orders': [], 'total': 0, 'pages': 0, 'current_page': page}), 200
         elif current_user.role == UserRole.RIDER:
             rider = Rider.query.filter_by(user_id=current_user.id).first()
             if rider:
-                query = query.filter_by(rider_id=rider.id)
+                query = query.where(source.rider_id == rider.id)
             else:
                 return jsonify({'orders': [], 'total': 0, 'pages': 0, 'current_page': page}), 200
         # Admin can see all orders
         
         if status:
-            query = query.filter_by(status=OrderStatus(status))
+            query = query.where(source.status == OrderStatus(status))
         
         if vendor_id and current_user.role == UserRole.ADMIN:
-            query = query.filter_by(vendor_id=vendor_id)
+            query = query.where(source.vendor_id == vendor_id)
+        
+        if cursor_requested():
+            keys = ORDER_KEYSET if source is Order else [(source.created_at, True), (source.id, True)]
+            result = keyset_paginate(
+                query, keys, per_page,
+                cursor=request.args.get('cursor'), with_total=total_requested()
+            )
+            meta = result.meta()
+        else:
+            result = offset_paginate(query.order_by(source.created_at.desc()), page, per_page)
+            meta = {'total': result.total, 'pages': result.pages, 'current_page': page}
         
-        orders = query.order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        # Serialize straight from the rows; related data is batch-loaded
+        orders_data = expand_order_rows(
+            result.items, [serialize(row) for row in result.items], expand, include_archive
         )
         
-        # Include related data
-        orders_data = []
-        for order in orders.items:
-            order_dict = order.to_dict()
-            order_dict['customer'] = order.customer.to_dict() if order.customer else None
-            order_dict['vendor'] = order.vendor.to_dict() if order.vendor else None
-            order_dict['rider'] = order.rider.to_dict() if order.rider else None
-            
-            # Include order items
-            order_items = []
-            for item in order.order_items:
-                item_dict = item.to_dict()
-                item_dict['product'] = item.product.to_dict() if item.product else None
-                order_items.append(item_dict)
-            order_dict['items'] = order_items
-            
-            orders_data.append(order_dict)
-        
-        return jsonify({
-            'orders': orders_data,
-            'total': orders.total,
-            'pages': orders.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'orders': orders_data, **meta}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch orders: {str(e)}'}), 500
 
@@ -91,7 +105,23 @@ def get_orders(current_user):
 @token_required
 def get_order(current_user, order_id):
     try:
-        order = Order.query.get_or_404(order_id)
+        expand = parse_expand(ORDER_EXPANSIONS, ORDER_EXPANSIONS)
+        fields = parse_fields(Order)
+        # The ownership columns are needed for the access check below
+        required = ('customer_id', 'vendor_id', 'rider_id')
+        order = Order.query.options(*order_load_options(
+            expand, fields, required=required
+        )).filter_by(id=order_id).first()
+        
+        # Closed orders may have been moved to the archive
+        archived, serialize = (None, None)
+        if order is None:
+            archived, serialize = archived_order(
+                order_id, fields, required=row_required(expand, ORDER_ROW_REQUIRED, 'id', *required)
+            )
+            if archived is None:
+                return jsonify({'message': 'Order not found'}), 404
+            order = archived
         
         # Check access permissions
         can_access = False
@@ -111,26 +141,73 @@ def get_order(current_user, order_id):
         if not can_access:
             return jsonify({'message': 'Access denied'}), 403
         
-        order_dict = order.to_dict()
-        order_dict['customer'] = order.customer.to_dict() if order.customer else None
-        order_dict['vendor'] = order.vendor.to_dict() if order.vendor else None
-        order_dict['rider'] = order.rider.to_dict() if order.rider else None
+        if archived is not None:
+            order_data = expand_order_rows([archived], [serialize(archived)], expand, include_archive=True)[0]
+            return jsonify({'order': order_data}), 200
         
-        # Include order items
-        order_items = []
-        for item in order.order_items:
-            item_dict = item.to_dict()
-            item_dict['product'] = item.product.to_dict() if item.product else None
-            order_items.append(item_dict)
-        order_dict['items'] = order_items
-        
-        return jsonify({'order': order_dict}), 200
+        return jsonify({'order': serialize_order(order, expand, fields)}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch order: {str(e)}'}), 500
 
+@orders_bp.route('/orders/events', methods=['GET'])
+@token_required
+def get_order_events(current_user):
+    """Order status events after ``since_id``, oldest first, for incremental readers."""
+    try:
+        since_id = request.args.get('since_id', 0, type=int)
+        limit = request.args.get('limit', DEFAULT_EVENT_LIMIT, type=int)
+        limit = max(1, min(limit, MAX_EVENT_LIMIT))
+        order_id = request.args.get('order_id', type=int)
+        
+        events = events_since(current_user, since_id, limit, order_id)
+        return jsonify({
+            'events': events,
+            'last_id': events[-1]['id'] if events else since_id,
+            'has_more': len(events) == limit
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch order events: {str(e)}'}), 500
+
+@orders_bp.route('/orders/stream', methods=['GET'])
+@token_required
+def stream_order_events(current_user):
+    """Server-Sent Events stream of status changes on the caller's orders.
+
+    ``EventSource`` cannot send headers, so the token may be passed as
+    ``?token=``. Resumes after ``Last-Event-ID`` when given.
+    """
+    try:
+        order_id = request.args.get('order_id', type=int)
+        match = subscriber_filter(current_user, order_id)
+        if match is None:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            last_event_id = int(last_event_id)
+        else:
+            last_event_id = latest_event_id()
+        
+        stream = order_stream(
+            current_app._get_current_object(), current_user.id, match, last_event_id, order_id
+        )
+        return Response(stream, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except ValueError:
+        return jsonify({'message': 'Last-Event-ID must be an integer'}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to open order stream: {str(e)}'}), 500
+
 @orders_bp.route('/orders', methods=['POST'])
 @token_required
+@idempotent
 def create_order(current_user):
     try:
         if current_user.role != UserRole.BUYER:
@@ -142,163 +219,104 @@ def create_order(current_user):
         if not data.get('vendor_id') or not data.get('items') or not data.get('delivery_type'):
             return jsonify({'message': 'Missing required fields'}), 400
         
-        vendor = Vendor.query.get_or_404(data['vendor_id'])
-        delivery_type = DeliveryType(data['delivery_type'])
-        
-        # Calculate order totals
-        subtotal = 0
-        order_items_data = []
-        
-        for item_data in data['items']:
-            product = Product.query.get_or_404(item_data['product_id'])
-            
-            # Check stock
-            if product.stock_quantity < item_data['quantity']:
-                return jsonify({
-                    'message': f'Insufficient stock for {product.name}. Available: {product.stock_quantity}'
-                }), 400
-            
-            item_total = product.price * item_data['quantity']
-            subtotal += item_total
-            
-            order_items_data.append({
-                'product_id': product.id,
-                'quantity': item_data['quantity'],
-                'unit_price': product.price,
-                'total_price': item_total,
-                'special_instructions': item_data.get('special_instructions')
-            })
-        
-        # Calculate fees
-        delivery_fee = 0
-        if delivery_type == DeliveryType.DELIVERY:
-            # Check if order qualifies for free delivery
-            if subtotal >= vendor.free_delivery_threshold:
-                delivery_fee = 0
-            else:
-                # Use peak or regular delivery fee based on time (simplified logic)
-                current_hour = datetime.now().hour
-                is_peak_time = 17 <= current_hour <= 20  # 5 PM to 8 PM
-                delivery_fee = vendor.peak_delivery_fee if is_peak_time else vendor.delivery_fee
-        
-        service_fee = subtotal * 0.05  # 5% service fee
-        discount_amount = data.get('discount_amount', 0)
-        total_amount = subtotal + delivery_fee + service_fee - discount_amount
+        # Same pricing as POST /orders/quote
+        quote = quote_order(
+            data['vendor_id'], data['delivery_type'], data['items'], data.get('discount_amount', 0)
+        )
+        delivery_type = quote.delivery_type
         
         # Create order
         order = Order(
             order_number=generate_order_number(),
             customer_id=current_user.id,
-            vendor_id=vendor.id,
+            vendor_id=quote.vendor_id,
             status=OrderStatus.PENDING,
             delivery_type=delivery_type,
-            subtotal=subtotal,
-            delivery_fee=delivery_fee,
-            service_fee=service_fee,
-            discount_amount=discount_amount,
-            total_amount=total_amount,
+            subtotal=quote.subtotal,
+            delivery_fee=quote.delivery_fee,
+            service_fee=quote.service_fee,
+            discount_amount=quote.discount_amount,
+            total_amount=quote.total_amount,
             delivery_address=data.get('delivery_address'),
             delivery_instructions=data.get('delivery_instructions'),
             customer_notes=data.get('customer_notes'),
             payment_method=data.get('payment_method', 'card'),
-            payment_status='pending'
+            payment_status='pending',
+            estimated_delivery_time=quote.estimated_delivery_time
         )
         
-        # Generate pickup code for pickup orders
-        if delivery_type == DeliveryType.PICKUP:
-            order.pickup_code = generate_pickup_code()
-        
-        # Set estimated delivery time
-        prep_time = vendor.preparation_time
-        if delivery_type == DeliveryType.DELIVERY:
-            prep_time += 30  # Add 30 minutes for delivery
-        
-        order.estimated_delivery_time = datetime.utcnow() + timedelta(minutes=prep_time)
+        # Decrement stock only where it still covers the order; any short
+        # line raises and rolls back the whole order
+        reserve_stock(quote.quantities)
         
         db.session.add(order)
         db.session.flush()  # Get order ID
         
-        # Create order items and update stock
-        for item_data in order_items_data:
-            order_item = OrderItem(
-                order_id=order.id,
-                **item_data
-            )
-            db.session.add(order_item)
-            
-            # Update product stock
-            product = Product.query.get(item_data['product_id'])
-            product.stock_quantity -= item_data['quantity']
+        if delivery_type == DeliveryType.PICKUP:
+            assign_pickup_code(order)
         
+        created_event = record_event(order, None, OrderStatus.PENDING, actor_id=current_user.id)
+        
+        # Create order items
+        db.session.add_all([OrderItem(order_id=order.id, **line) for line in quote.lines])
         db.session.commit()
         
+        publish_events([created_event])
+        
+        # Stock levels are part of the cached catalogue responses
+        invalidate_products(
+            (product.id, product.vendor_id, product.category_id) for product in quote.products.values()
+        )
+        
         return jsonify({
             'message': 'Order created successfully',
             'order': order.to_dict()
         }), 201
         
+    except (StockError, PricingError) as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Failed to create order: {str(e)}'}), 500
 
+@orders_bp.route('/orders/quote', methods=['POST'])
+@token_required
+def quote_order_totals(current_user):
+    """Price an order without placing it.
+    
+    Takes the same ``vendor_id``, ``delivery_type``, ``items`` and
+    ``discount_amount`` as ``create_order`` and returns the line prices,
+    fees, total and estimated delivery time it would charge right now.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('vendor_id') or not data.get('items') or not data.get('delivery_type'):
+            return jsonify({'message': 'Missing required fields'}), 400
+        
+        quote = quote_order(
+            data['vendor_id'], data['delivery_type'], data['items'], data.get('discount_amount', 0)
+        )
+        return jsonify({'quote': quote.to_dict()}), 200
+        
+    except (StockError, PricingError) as e:
+        return jsonify({'message': str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({'message': f'Failed to quote order: {str(e)}'}), 500
+
 @orders_bp.route('/orders/<int:order_id>/status', methods=['PUT'])
 @token_required
+@idempotent
 def update_order_status(current_user, order_id):
     try:
         order = Order.query.get_or_404(order_id)
         data = request.json
         new_status = OrderStatus(data['status'])
         
-        # Check permissions based on status change
-        can_update = False
-        
-        if current_user.role == UserRole.ADMIN:
-            can_update = True
-        elif current_user.role == UserRole.VENDOR:
-            vendor = Vendor.query.filter_by(user_id=current_user.id).first()
-            if vendor and order.vendor_id == vendor.id:
-                # Vendors can update to confirmed, preparing, ready_for_pickup
-                allowed_statuses = [OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.READY_FOR_PICKUP]
-                if new_status in allowed_statuses:
-                    can_update = True
-        elif current_user.role == UserRole.RIDER:
-            rider = Rider.query.filter_by(user_id=current_user.id).first()
-            if rider and order.rider_id == rider.id:
-                # Riders can update to out_for_delivery, delivered
-                allowed_statuses = [OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED]
-                if new_status in allowed_statuses:
-                    can_update = True
-        elif current_user.role == UserRole.BUYER and order.customer_id == current_user.id:
-            # Buyers can only cancel orders
-            if new_status == OrderStatus.CANCELLED and order.status == OrderStatus.PENDING:
-                can_update = True
-        
-        if not can_update:
-            return jsonify({'message': 'Access denied or invalid status transition'}), 403
-        
-        # Update status and timestamps
-        old_status = order.status
-        order.status = new_status
-        
-        if new_status == OrderStatus.PREPARING and old_status != OrderStatus.PREPARING:
-            order.preparation_started_at = datetime.utcnow()
-        elif new_status == OrderStatus.READY_FOR_PICKUP and old_status != OrderStatus.READY_FOR_PICKUP:
-            order.ready_for_pickup_at = datetime.utcnow()
-        elif new_status == OrderStatus.OUT_FOR_DELIVERY and old_status != OrderStatus.OUT_FOR_DELIVERY:
-            order.out_for_delivery_at = datetime.utcnow()
-        elif new_status == OrderStatus.DELIVERED and old_status != OrderStatus.DELIVERED:
-            order.delivered_at = datetime.utcnow()
-            order.payment_status = 'completed'
-            
-            # Update vendor stats
-            vendor = order.vendor
-            vendor.total_orders += 1
-            
-            # Update rider stats if applicable
-            if order.rider:
-                rider = order.rider
-                rider.total_deliveries += 1
-                rider.successful_deliveries += 1
+        # The state machine decides who may make which change
+        event = None
+        if check_transition(current_user, order, new_status):
+            event = transition(order, new_status, actor_id=current_user.id)
         
         # Add notes if provided
         if data.get('notes'):
@@ -310,15 +328,53 @@ def update_order_status(current_user, order_id):
         order.updated_at = datetime.utcnow()
         db.session.commit()
         
+        if event is not None:
+            publish_events([event])
+        
         return jsonify({
             'message': 'Order status updated successfully',
             'order': order.to_dict()
         }), 200
         
+    except TransitionError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Failed to update order status: {str(e)}'}), 500
 
+@orders_bp.route('/orders/status', methods=['PUT'])
+@token_required
+@idempotent
+def bulk_update_order_status(current_user):
+    """Apply many status changes in one transaction.
+    
+    Body: ``{"updates": [{"order_id": 1, "status": "preparing"}, ...]}``.
+    Each change follows the same rules as ``update_order_status``; invalid
+    ones are reported per order and the rest applied.
+    """
+    try:
+        updates = (request.get_json(silent=True) or {}).get('updates')
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'message': 'updates must be a non-empty list'}), 400
+        if len(updates) > MAX_BULK_UPDATES:
+            return jsonify({'message': f'At most {MAX_BULK_UPDATES} updates per request'}), 400
+        
+        results, events = bulk_transition(current_user, updates)
+        db.session.commit()
+        publish_events(events)
+        
+        return jsonify({
+            'message': 'Order statuses updated',
+            'updated': len(events),
+            'failed': sum(1 for result in results if result['status'] == 'error'),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to update order statuses: {str(e)}'}), 500
+
 @orders_bp.route('/orders/<int:order_id>/assign-rider', methods=['PUT'])
 @token_required
 def assign_rider_to_order(current_user, order_id):
@@ -372,6 +428,8 @@ def assign_rider_to_order(current_user, order_id):
         order.updated_at = datetime.utcnow()
         db.session.commit()
         
+        publish_rider_assigned(order)
+        
         return jsonify({
             'message': 'Rider assigned successfully',
             'order': order.to_dict()
@@ -389,35 +447,109 @@ def get_orders_analytics(current_user):
         if current_user.role != UserRole.ADMIN:
             return jsonify({'message': 'Admin access required'}), 403
         
-        from sqlalchemy import func
+        from sqlalchemy import func, select
+        
+        # Archived orders only count when the date range reaches them
+        date_from, date_to = parse_date_range()
+        source = order_columns(wants_archive(date_from, date_to))
+        filters = date_range_filters(source, date_from, date_to)
         
         # Total orders
-        total_orders = Order.query.count()
+        total_orders = db.session.execute(select(func.count(source.id)).where(*filters)).scalar()
         
         # Orders by status
-        status_counts = db.session.query(
-            Order.status, func.count(Order.id)
-        ).group_by(Order.status).all()
+        status_counts = db.session.execute(
+            select(source.status, func.count(source.id)).where(*filters).group_by(source.status)
+        ).all()
         
         status_data = {status.value: count for status, count in status_counts}
         
         # Revenue
-        total_revenue = db.session.query(func.sum(Order.total_amount)).filter(
-            Order.status == OrderStatus.DELIVERED
+        total_revenue = db.session.execute(
+            select(func.sum(source.total_amount)).where(source.status == OrderStatus.DELIVERED, *filters)
         ).scalar() or 0
         
         # Recent orders
-        recent_orders = Order.query.order_by(Order.created_at.desc()).limit(10).all()
+        stmt, serialize = row_select(Order, source=source)
+        recent_orders = db.session.execute(
+            stmt.where(*filters).order_by(source.created_at.desc()).limit(10)
+        ).all()
         
         analytics = {
             'total_orders': total_orders,
             'orders_by_status': status_data,
             'total_revenue': float(total_revenue),
-            'recent_orders': [order.to_dict() for order in recent_orders]
+            'recent_orders': [serialize(row) for row in recent_orders]
         }
         
         return jsonify({'analytics': analytics}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch analytics: {str(e)}'}), 500
 
+@orders_bp.route('/orders/export', methods=['GET'])
+@token_required
+def export_orders_file(current_user):
+    """Stream every matching order with its items for reconciliation.
+    
+    ``?format=ndjson|csv`` (default NDJSON), filtered by ``date_from``,
+    ``date_to``, ``vendor_id`` and ``status``.
+    """
+    try:
+        if current_user.role != UserRole.ADMIN:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        date_from, date_to = parse_date_range()
+        vendor_id = request.args.get('vendor_id', type=int)
+        status = request.args.get('status')
+        status = OrderStatus(status) if status else None
+        
+        filename = f"orders-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        return Response(
+            stream_with_context(export_orders(export_format, date_from, date_to, vendor_id, status)),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to export orders: {str(e)}'}), 500
+
+@orders_bp.route('/orders/archive', methods=['POST'])
+@token_required
+def archive_closed_orders(current_user):
+    """Move closed orders past the archive age out of the hot tables.
+    
+    Meant for a scheduler. Body (optional): ``{"older_than_days": 90,
+    "max_batches": 20}``; each batch of 500 orders is its own transaction.
+    ``older_than_days`` may not be below ``ORDER_ARCHIVE_AFTER_DAYS``,
+    since date-range reads only consult the archive past that age.
+    """
+    try:
+        if current_user.role != UserRole.ADMIN:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        older_than_days = data.get('older_than_days')
+        max_batches = data.get('max_batches')
+        for name, value in (('older_than_days', older_than_days), ('max_batches', max_batches)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                return jsonify({'message': f'{name} must be a positive integer'}), 400
+        if older_than_days is not None and older_than_days < archive_after_days():
+            return jsonify({'message': f'older_than_days must be at least {archive_after_days()}'}), 400
+        
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days) if older_than_days else None
+        archived = archive_orders(cutoff=cutoff, max_batches=max_batches)
+        
+        return jsonify({'message': 'Orders archived', 'archived': archived}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to archive orders: {str(e)}'}), 500
+
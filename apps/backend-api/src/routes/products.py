@@ -1,12 +1,42 @@
 from flask import Blueprint, jsonify, request
 from src.models.models import Product, Category, Vendor, User, UserRole, db
 from src.routes.user import token_required
+from src.models.serializers import row_select
+from src.services.catalogue_import import (
+    generate_sku, import_products, iter_csv_records, iter_ndjson_records
+)
+from src.services.expansion import (
+    PRODUCT_EXPANSIONS, PRODUCT_ROW_REQUIRED, expand_product_rows, fetch_serialized, parse_expand,
+    parse_fields, product_load_options, row_required, serialize_product
+)
+from src.services.facets import cached_facets, parse_facets
+from src.services.inventory import MAX_UPDATES, apply_inventory_updates
+from src.services.matching import DEFAULT_CANDIDATES, MAX_LINES, match_lines
+from src.services.pagination import (
+    PRODUCT_KEYSET, PRODUCT_SORTS, cursor_requested, keyset_paginate, offset_paginate, parse_sort,
+    sort_order, total_requested
+)
+from src.services.refresher import IndexNotReady
+from src.services.response_cache import (
+    cached_response, invalidate, invalidate_product, invalidate_products, invalidate_vendor_products,
+    product_list_tags, tag_versions
+)
+from src.services.search import apply_product_search
+from src.services.snapshot import current_snapshot
+from src.services.suggest import DEFAULT_LIMIT, suggest
+from src.services.tags import parse_tag_filter, set_product_tags, tag_filter, tags_column_value
 from datetime import datetime
-import uuid
 
 products_bp = Blueprint('products', __name__)
 
+def _product_list_tags():
+    return product_list_tags(
+        request.args.get('vendor_id', type=int),
+        request.args.get('category_id', type=int)
+    )
+
 @products_bp.route('/products', methods=['GET'])
+@cached_response(_product_list_tags)
 def get_products():
     try:
         page = request.args.get('page', 1, type=int)
@@ -15,58 +45,166 @@ def get_products():
         vendor_id = request.args.get('vendor_id', type=int)
         search = request.args.get('search', '')
         featured = request.args.get('featured', type=bool)
-        
-        query = Product.query.filter_by(is_active=True)
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        sort = parse_sort(PRODUCT_SORTS)
+        tags, tag_mode = parse_tag_filter()
+        facets = parse_facets()
+        expand = parse_expand(PRODUCT_EXPANSIONS, PRODUCT_EXPANSIONS)
+        fields = parse_fields(Product)
+        
+        # Plain and featured listings are served from the shared snapshot
+        plain = not (
+            category_id or vendor_id or search or tags or facets or sort or cursor_requested()
+            or min_price is not None or max_price is not None
+        )
+        snapshot = current_snapshot() if plain and featured in (None, True) else None
+        if snapshot is not None:
+            result = snapshot.product_page(page, per_page, featured=bool(featured))
+            return jsonify({
+                'products': [snapshot.expand_product(p, expand, fields) for p in result.items],
+                'total': result.total,
+                'pages': result.pages,
+                'current_page': page
+            }), 200
+        
+        keys = sort or PRODUCT_KEYSET
+        stmt, serialize = row_select(
+            Product, fields,
+            required=row_required(expand, PRODUCT_ROW_REQUIRED, *(column.key for column, _ in keys))
+        )
+        query = stmt.where(Product.is_active == True)
         
         if category_id:
-            query = query.filter_by(category_id=category_id)
+            query = query.where(Product.category_id == category_id)
         
         if vendor_id:
-            query = query.filter_by(vendor_id=vendor_id)
+            query = query.where(Product.vendor_id == vendor_id)
+        
+        if min_price is not None:
+            query = query.where(Product.price >= min_price)
+        
+        if max_price is not None:
+            query = query.where(Product.price <= max_price)
         
         if search:
-            query = query.filter(
-                Product.name.contains(search) | 
-                Product.description.contains(search) |
-                Product.tags.contains(search)
+            # Full-text match, ordered by relevance unless another sort applies
+            query = apply_product_search(
+                query, search, order_by_relevance=not (sort or cursor_requested())
             )
         
         if featured is not None:
-            query = query.filter_by(is_featured=featured)
-        
-        products = query.paginate(
-            page=page, per_page=per_page, error_out=False
+            query = query.where(Product.is_featured == featured)
+        
+        if tags:
+            # Exact tag match via the product_tags index
+            query = query.where(tag_filter(tags, tag_mode))
+        
+        if facets:
+            # Counts for the whole filtered set; the signature carries the
+            # cache tag versions, so product writes retire stale counts.
+            signature = (
+                search, category_id, vendor_id, featured, min_price, max_price, tuple(tags), tag_mode,
+                tag_versions(_product_list_tags())
+            )
+            meta_facets = {'facets': cached_facets(query, facets, signature)}
+        else:
+            meta_facets = {}
+        
+        if cursor_requested():
+            result = keyset_paginate(
+                query, keys, per_page,
+                cursor=request.args.get('cursor'), with_total=total_requested()
+            )
+            meta = result.meta()
+        else:
+            if sort:
+                query = query.order_by(*sort_order(sort))
+            result = offset_paginate(query, page, per_page)
+            meta = {'total': result.total, 'pages': result.pages, 'current_page': page}
+        
+        # Serialize straight from the rows; vendor and category are batch-loaded
+        products_data = expand_product_rows(
+            result.items, [serialize(row) for row in result.items], expand
         )
         
-        # Include vendor and category information
-        products_data = []
-        for product in products.items:
-            product_dict = product.to_dict()
-            product_dict['vendor'] = product.vendor.to_dict() if product.vendor else None
-            product_dict['category'] = product.category.to_dict() if product.category else None
-            products_data.append(product_dict)
-        
-        return jsonify({
-            'products': products_data,
-            'total': products.total,
-            'pages': products.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'products': products_data, **meta, **meta_facets}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch products: {str(e)}'}), 500
 
+@products_bp.route('/products/suggest', methods=['GET'])
+def suggest_products():
+    """Typeahead suggestions: products, vendors and categories whose names
+    have a word starting with ``q``, most popular first."""
+    try:
+        q = request.args.get('q', '')
+        limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+        return jsonify({'query': q, 'suggestions': suggest(q, limit)}), 200
+        
+    except IndexNotReady:
+        return jsonify({'message': 'Suggestions are still loading, retry shortly'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch suggestions: {str(e)}'}), 500
+
+@products_bp.route('/products/match', methods=['POST'])
+def match_shopping_list():
+    """Match shopping-list lines to products, tolerating typos.
+    
+    Body: ``{"lines": ["2x plantain", "scotch bonet"], "limit": 3}``. Each
+    line comes back with its parsed quantity and ranked product candidates.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        lines = data.get('lines')
+        if not isinstance(lines, list):
+            return jsonify({'message': 'lines must be a list'}), 400
+        if len(lines) > MAX_LINES:
+            return jsonify({'message': f'At most {MAX_LINES} lines per request'}), 400
+        
+        limit = data.get('limit', DEFAULT_CANDIDATES)
+        if not isinstance(limit, int) or isinstance(limit, bool):
+            return jsonify({'message': 'limit must be an integer'}), 400
+        
+        matches = match_lines(lines, limit)
+        products = fetch_serialized(
+            Product, (product_id for match in matches for product_id, _ in match['candidates'])
+        )
+        for match in matches:
+            match['candidates'] = [
+                {'score': score, 'product': products[product_id]}
+                for product_id, score in match['candidates'] if product_id in products
+            ]
+        
+        return jsonify({'matches': matches}), 200
+        
+    except IndexNotReady:
+        return jsonify({'message': 'Product matching is still loading, retry shortly'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'message': f'Failed to match products: {str(e)}'}), 500
+
 @products_bp.route('/products/<int:product_id>', methods=['GET'])
+@cached_response(lambda product_id: ['products', f'product:{product_id}'])
 def get_product(product_id):
     try:
-        product = Product.query.filter_by(id=product_id, is_active=True).first_or_404()
+        expand = parse_expand(PRODUCT_EXPANSIONS, PRODUCT_EXPANSIONS)
+        fields = parse_fields(Product)
+        
+        snapshot = current_snapshot()
+        product = snapshot.product(product_id) if snapshot is not None else None
+        if product is not None:
+            return jsonify({'product': snapshot.expand_product(product, expand, fields)}), 200
         
-        product_dict = product.to_dict()
-        product_dict['vendor'] = product.vendor.to_dict() if product.vendor else None
-        product_dict['category'] = product.category.to_dict() if product.category else None
+        product = Product.query.options(*product_load_options(expand, fields)).filter_by(
+            id=product_id, is_active=True
+        ).first_or_404()
         
-        return jsonify({'product': product_dict}), 200
+        return jsonify({'product': serialize_product(product, expand, fields)}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch product: {str(e)}'}), 500
 
@@ -88,7 +226,7 @@ def create_product(current_user):
         # Generate SKU if not provided
         sku = data.get('sku')
         if not sku:
-            sku = f"HO-{vendor.id}-{str(uuid.uuid4())[:8].upper()}"
+            sku = generate_sku(vendor.id)
         
         product = Product(
             vendor_id=vendor.id,
@@ -106,13 +244,16 @@ def create_product(current_user):
             is_featured=data.get('is_featured', False),
             image_url=data.get('image_url'),
             additional_images=data.get('additional_images'),
-            tags=data.get('tags'),
+            tags=tags_column_value(data.get('tags')),
             origin_country=data.get('origin_country'),
             cultural_significance=data.get('cultural_significance')
         )
         
         db.session.add(product)
+        db.session.flush()
+        set_product_tags({product.id: data.get('tags')})
         db.session.commit()
+        invalidate_product(product.id, product.vendor_id, product.category_id)
         
         return jsonify({
             'message': 'Product created successfully',
@@ -123,6 +264,43 @@ def create_product(current_user):
         db.session.rollback()
         return jsonify({'message': f'Failed to create product: {str(e)}'}), 500
 
+@products_bp.route('/products/import', methods=['POST'])
+@token_required
+def bulk_import_products(current_user):
+    """Import many products from a streamed CSV or NDJSON body.
+    
+    The format comes from ``?format=csv|ndjson`` or the Content-Type. The
+    response reports how many rows were imported and why the others failed.
+    """
+    try:
+        # Only vendors can create products
+        if current_user.role != UserRole.VENDOR:
+            return jsonify({'message': 'Only vendors can import products'}), 403
+        
+        vendor = Vendor.query.filter_by(user_id=current_user.id).first()
+        if not vendor:
+            return jsonify({'message': 'Vendor profile not found'}), 404
+        
+        upload_format = request.args.get('format') or request.mimetype
+        if 'csv' in upload_format:
+            records = iter_csv_records(request.stream)
+        elif 'ndjson' in upload_format or 'jsonl' in upload_format:
+            records = iter_ndjson_records(request.stream)
+        else:
+            return jsonify({'message': 'Upload must be CSV (text/csv) or NDJSON (application/x-ndjson)'}), 415
+        
+        batch_size = request.args.get('batch_size', 500, type=int)
+        report = import_products(vendor.id, records, batch_size=max(1, min(batch_size, 5000)))
+        invalidate_vendor_products(vendor.id, report.category_ids)
+        
+        return jsonify({'message': 'Import finished', **report.to_dict()}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        # Earlier batches may have been committed
+        invalidate('products', 'vendors')
+        return jsonify({'message': f'Failed to import products: {str(e)}'}), 500
+
 @products_bp.route('/products/<int:product_id>', methods=['PUT'])
 @token_required
 def update_product(current_user, product_id):
@@ -138,6 +316,7 @@ def update_product(current_user, product_id):
             return jsonify({'message': 'Access denied'}), 403
         
         data = request.json
+        previous_category_id = product.category_id
         
         # Update allowed fields
         allowed_fields = [
@@ -151,12 +330,17 @@ def update_product(current_user, product_id):
             if field in data:
                 setattr(product, field, data[field])
         
+        if 'tags' in data:
+            product.tags = tags_column_value(data['tags'])
+            set_product_tags({product.id: data['tags']})
+        
         # Only admin can change active status
         if current_user.role == UserRole.ADMIN and 'is_active' in data:
             product.is_active = data['is_active']
         
         product.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_product(product.id, product.vendor_id, product.category_id, previous_category_id)
         
         return jsonify({
             'message': 'Product updated successfully',
@@ -167,6 +351,50 @@ def update_product(current_user, product_id):
         db.session.rollback()
         return jsonify({'message': f'Failed to update product: {str(e)}'}), 500
 
+@products_bp.route('/products/inventory', methods=['PUT'])
+@token_required
+def batch_update_inventory(current_user):
+    """Apply many stock/price changes in one transaction.
+    
+    Body: ``{"updates": [{"product_id": 1, "stock_quantity": 10},
+    {"sku": "MK001", "stock_delta": -2, "price": 4.5}, ...]}``. Each update
+    names a product by ``product_id`` or ``sku`` and sets ``stock_quantity``
+    or ``stock_delta`` and/or ``price`` or ``price_delta``. Deltas never take
+    a value below zero. Invalid updates are reported and the rest applied.
+    """
+    try:
+        # Vendors update their own products, admin any product
+        if current_user.role == UserRole.VENDOR:
+            vendor = Vendor.query.filter_by(user_id=current_user.id).first()
+            if not vendor:
+                return jsonify({'message': 'Vendor profile not found'}), 404
+            vendor_id = vendor.id
+        elif current_user.role == UserRole.ADMIN:
+            vendor_id = None
+        else:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        updates = (request.get_json(silent=True) or {}).get('updates')
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'message': 'updates must be a non-empty list'}), 400
+        if len(updates) > MAX_UPDATES:
+            return jsonify({'message': f'At most {MAX_UPDATES} updates per request'}), 400
+        
+        results, touched = apply_inventory_updates(updates, vendor_id=vendor_id)
+        db.session.commit()
+        invalidate_products(touched)
+        
+        return jsonify({
+            'message': 'Inventory updated',
+            'updated': len(touched),
+            'failed': len(results) - len(touched),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to update inventory: {str(e)}'}), 500
+
 @products_bp.route('/products/<int:product_id>', methods=['DELETE'])
 @token_required
 def delete_product(current_user, product_id):
@@ -185,6 +413,7 @@ def delete_product(current_user, product_id):
         product.is_active = False
         product.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_product(product.id, product.vendor_id, product.category_id)
         
         return jsonify({'message': 'Product deleted successfully'}), 200
         
@@ -193,8 +422,13 @@ def delete_product(current_user, product_id):
         return jsonify({'message': f'Failed to delete product: {str(e)}'}), 500
 
 @products_bp.route('/categories', methods=['GET'])
+@cached_response(lambda: ['categories'])
 def get_categories():
     try:
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            return jsonify({'categories': snapshot.categories()}), 200
+        
         categories = Category.query.filter_by(is_active=True).all()
         return jsonify({
             'categories': [category.to_dict() for category in categories]
@@ -221,6 +455,7 @@ def create_category(current_user):
         
         db.session.add(category)
         db.session.commit()
+        invalidate('categories')
         
         return jsonify({
             'message': 'Category created successfully',
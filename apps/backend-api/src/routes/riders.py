@@ -1,8 +1,15 @@
 from flask import Blueprint, jsonify, request
 from src.models.models import Rider, User, UserRole, Order, OrderStatus, VendorRider, db
 from src.routes.user import token_required
+from src.models.serializers import row_select
+from src.services.expansion import (
+    ORDER_EXPANSIONS, ORDER_ROW_REQUIRED, expand_order_rows, parse_expand, parse_fields, row_required
+)
+from src.services.pagination import (
+    ORDER_KEYSET, cursor_requested, keyset_paginate, offset_paginate, total_requested
+)
+from src.services.response_cache import invalidate_rider
 from datetime import datetime
-from sqlalchemy import func
 
 riders_bp = Blueprint('riders', __name__)
 
@@ -196,6 +203,7 @@ def update_rider_profile(current_user):
         
         rider.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_rider(rider.id)
         
         return jsonify({
             'message': 'Rider profile updated successfully',
@@ -226,6 +234,7 @@ def update_rider_availability(current_user):
         rider.is_available = is_available
         rider.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_rider(rider.id)
         
         status = 'available' if is_available else 'unavailable'
         return jsonify({
@@ -260,6 +269,7 @@ def update_rider_location(current_user):
         rider.last_location_update = datetime.utcnow()
         rider.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_rider(rider.id)
         
         return jsonify({
             'message': 'Location updated successfully',
@@ -284,31 +294,36 @@ def get_rider_deliveries(current_user):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status')
+        expand = parse_expand(('customer', 'vendor'), ORDER_EXPANSIONS)
+        fields = parse_fields(Order)
         
-        query = Order.query.filter_by(rider_id=rider.id)
+        stmt, serialize = row_select(
+            Order, fields, required=row_required(expand, ORDER_ROW_REQUIRED, 'id', 'created_at')
+        )
+        query = stmt.where(Order.rider_id == rider.id)
         
         if status:
-            query = query.filter_by(status=OrderStatus(status))
-        
-        orders = query.order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+            query = query.where(Order.status == OrderStatus(status))
+        
+        if cursor_requested():
+            result = keyset_paginate(
+                query, ORDER_KEYSET, per_page,
+                cursor=request.args.get('cursor'), with_total=total_requested()
+            )
+            meta = result.meta()
+        else:
+            result = offset_paginate(query.order_by(Order.created_at.desc()), page, per_page)
+            meta = {'total': result.total, 'pages': result.pages, 'current_page': page}
+        
+        # Serialize straight from the rows; related data is batch-loaded
+        orders_data = expand_order_rows(
+            result.items, [serialize(row) for row in result.items], expand
         )
         
-        # Include related data
-        orders_data = []
-        for order in orders.items:
-            order_dict = order.to_dict()
-            order_dict['customer'] = order.customer.to_dict() if order.customer else None
-            order_dict['vendor'] = order.vendor.to_dict() if order.vendor else None
-            orders_data.append(order_dict)
-        
-        return jsonify({
-            'deliveries': orders_data,
-            'total': orders.total,
-            'pages': orders.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'deliveries': orders_data, **meta}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch deliveries: {str(e)}'}), 500
 
@@ -370,6 +385,7 @@ def verify_rider(current_user, rider_id):
         rider.is_verified = data.get('is_verified', True)
         rider.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_rider(rider.id)
         
         status = 'verified' if rider.is_verified else 'unverified'
         return jsonify({
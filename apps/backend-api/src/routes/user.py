@@ -10,6 +10,8 @@ import jwt
 from flask import Blueprint, current_app, jsonify, request
 
 from src.models.models import User, UserRole, db
+from src.services.pagination import USER_KEYSET, cursor_requested, keyset_paginate, total_requested
+from src.services.response_cache import invalidate_user
 
 
 # Blueprint
@@ -248,6 +250,13 @@ def get_users(current_user: User):
         if role_param:
             query = query.filter_by(role=_parse_role(role_param))
 
+        if cursor_requested():
+            result = keyset_paginate(
+                query, USER_KEYSET, per_page,
+                cursor=request.args.get("cursor"), with_total=total_requested(),
+            )
+            return jsonify({"users": [u.to_dict() for u in result.items], **result.meta()}), 200
+
         users = query.paginate(page=page, per_page=per_page, error_out=False)
 
         return (
@@ -317,6 +326,7 @@ def update_user(current_user: User, user_id: int):
 
         user.updated_at = datetime.now(timezone.utc)
         db.session.commit()
+        invalidate_user(user.id)
 
         return jsonify({"message": "User updated successfully", "user": user.to_dict()}), 200
     except ValueError as ve:
@@ -337,6 +347,7 @@ def delete_user(current_user: User, user_id: int):
         user = db.session.get(User, user_id) or User.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
         return jsonify({"message": "User deleted successfully"}), 200
     except Exception:
         db.session.rollback()
@@ -1,20 +1,30 @@
 from flask import Blueprint, jsonify, request
 from src.models.models import Vendor, User, UserRole, Rider, VendorRider, Product, Order, db
 from src.routes.user import token_required
+from src.models.serializers import row_select
+from src.services.expansion import load_only_fields, parse_fields
+from src.services.inventory import low_stock_counts, low_stock_filter
+from src.services.pagination import offset_paginate
+from src.services.response_cache import add_response_tags, cached_response, invalidate, invalidate_vendor
 from datetime import datetime
 from sqlalchemy import func
 
 vendors_bp = Blueprint('vendors', __name__)
 
 @vendors_bp.route('/vendors', methods=['GET'])
+@cached_response(lambda: ['vendors'])
 def get_vendors():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         search = request.args.get('search', '')
         verified_only = request.args.get('verified', type=bool)
+        fields = Vendor.parse_fields(request.args.get('fields'))
         
         query = Vendor.query.filter_by(is_active=True)
+        if fields is not None:
+            # user_id is needed to attach the owner below
+            query = query.options(load_only_fields(Vendor, fields, required=('user_id',)))
         
         if search:
             query = query.filter(
@@ -32,8 +42,9 @@ def get_vendors():
         # Include user information and stats
         vendors_data = []
         for vendor in vendors.items:
-            vendor_dict = vendor.to_dict()
+            vendor_dict = vendor.to_dict(fields)
             vendor_dict['user'] = vendor.user.to_dict() if vendor.user else None
+            add_response_tags(f'user:{vendor.user_id}')
             
             # Add product count
             product_count = Product.query.filter_by(vendor_id=vendor.id, is_active=True).count()
@@ -48,16 +59,24 @@ def get_vendors():
             'current_page': page
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch vendors: {str(e)}'}), 500
 
 @vendors_bp.route('/vendors/<int:vendor_id>', methods=['GET'])
+@cached_response(lambda vendor_id: [f'vendor:{vendor_id}'])
 def get_vendor(vendor_id):
     try:
-        vendor = Vendor.query.filter_by(id=vendor_id, is_active=True).first_or_404()
+        fields = Vendor.parse_fields(request.args.get('fields'))
+        query = Vendor.query.filter_by(id=vendor_id, is_active=True)
+        if fields is not None:
+            query = query.options(load_only_fields(Vendor, fields, required=('user_id',)))
+        vendor = query.first_or_404()
         
-        vendor_dict = vendor.to_dict()
+        vendor_dict = vendor.to_dict(fields)
         vendor_dict['user'] = vendor.user.to_dict() if vendor.user else None
+        add_response_tags(f'user:{vendor.user_id}')
         
         # Add statistics
         product_count = Product.query.filter_by(vendor_id=vendor.id, is_active=True).count()
@@ -77,11 +96,14 @@ def get_vendor(vendor_id):
             rider_dict['user'] = rider.user.to_dict() if rider.user else None
             rider_dict['assigned_at'] = assignment.assigned_at.isoformat() if assignment.assigned_at else None
             riders_data.append(rider_dict)
+            add_response_tags(f'rider:{rider.id}', f'user:{rider.user_id}')
         
         vendor_dict['assigned_riders'] = riders_data
         
         return jsonify({'vendor': vendor_dict}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch vendor: {str(e)}'}), 500
 
@@ -140,6 +162,7 @@ def create_vendor_profile(current_user):
         
         db.session.add(vendor)
         db.session.commit()
+        invalidate_vendor(vendor.id)
         
         return jsonify({
             'message': 'Vendor profile created successfully',
@@ -177,6 +200,7 @@ def update_vendor_profile(current_user):
         
         vendor.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_vendor(vendor.id)
         
         return jsonify({
             'message': 'Vendor profile updated successfully',
@@ -213,6 +237,7 @@ def get_vendor_riders(current_user, vendor_id):
             rider_dict['user'] = rider.user.to_dict() if rider.user else None
             rider_dict['assigned_at'] = assignment.assigned_at.isoformat() if assignment.assigned_at else None
             riders_data.append(rider_dict)
+            add_response_tags(f'rider:{rider.id}', f'user:{rider.user_id}')
         
         return jsonify({'riders': riders_data}), 200
         
@@ -248,6 +273,7 @@ def assign_rider_to_vendor(current_user, vendor_id, rider_id):
         assignment = VendorRider(vendor_id=vendor_id, rider_id=rider_id)
         db.session.add(assignment)
         db.session.commit()
+        invalidate(f'vendor:{vendor_id}')
         
         return jsonify({
             'message': 'Rider assigned successfully',
@@ -280,6 +306,7 @@ def unassign_rider_from_vendor(current_user, vendor_id, rider_id):
         
         assignment.is_active = False
         db.session.commit()
+        invalidate(f'vendor:{vendor_id}')
         
         return jsonify({'message': 'Rider unassigned successfully'}), 200
         
@@ -317,6 +344,7 @@ def get_vendor_analytics(current_user, vendor_id):
         
         analytics = {
             'total_products': total_products,
+            'low_stock_products': low_stock_counts(vendor_id).get(vendor_id, 0),
             'total_orders': total_orders,
             'total_revenue': float(total_revenue),
             'recent_orders': [order.to_dict() for order in recent_orders]
@@ -327,3 +355,60 @@ def get_vendor_analytics(current_user, vendor_id):
     except Exception as e:
         return jsonify({'message': f'Failed to fetch analytics: {str(e)}'}), 500
 
+
+def _low_stock_page(vendor_id=None):
+    """One page of low-stock products, lowest stock first per vendor."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    stmt, serialize = row_select(Product, parse_fields(Product))
+    query = stmt.where(low_stock_filter())
+    if vendor_id is not None:
+        query = query.where(Product.vendor_id == vendor_id)
+    # Index order of ix_products_active_low_stock
+    query = query.order_by(Product.vendor_id, Product.stock_quantity, Product.id)
+    result = offset_paginate(query, page, per_page)
+    return {
+        'products': [serialize(row) for row in result.items],
+        'total': result.total,
+        'pages': result.pages,
+        'current_page': page
+    }
+
+@vendors_bp.route('/vendors/<int:vendor_id>/low-stock', methods=['GET'])
+@token_required
+def get_vendor_low_stock(current_user, vendor_id):
+    try:
+        # Check access permissions
+        if current_user.role == UserRole.VENDOR:
+            vendor = Vendor.query.filter_by(user_id=current_user.id, id=vendor_id).first()
+            if not vendor:
+                return jsonify({'message': 'Access denied'}), 403
+        elif current_user.role != UserRole.ADMIN:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        return jsonify(_low_stock_page(vendor_id)), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch low-stock products: {str(e)}'}), 500
+
+@vendors_bp.route('/vendors/low-stock', methods=['GET'])
+@token_required
+def get_all_low_stock(current_user):
+    try:
+        # Only admin can see every vendor's stock
+        if current_user.role != UserRole.ADMIN:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        data = _low_stock_page()
+        data['vendors'] = [
+            {'vendor_id': vendor_id, 'low_stock_count': count}
+            for vendor_id, count in low_stock_counts().items()
+        ]
+        return jsonify(data), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch low-stock products: {str(e)}'}), 500
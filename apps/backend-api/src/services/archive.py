@@ -0,0 +1,141 @@
+"""Hot/archive split for orders.
+
+Delivered and cancelled orders that have not changed for
+``ORDER_ARCHIVE_AFTER_DAYS`` days (90 by default) are moved, with their
+items, from ``orders``/``order_items`` into ``orders_archive``/
+``order_items_archive`` by ``archive_orders``. Each batch is one
+transaction. Run it from a scheduler through ``POST /api/orders/archive``.
+
+Reads use the hot tables unless a ``date_from``/``date_to`` range reaches
+back past the archive cutoff. Then ``order_columns``/``order_item_columns``
+return the columns of a ``UNION ALL`` over both tables, usable wherever the
+model's attributes would be (``source.customer_id == ...``).
+"""
+from datetime import datetime, time, timedelta
+
+from flask import current_app, request
+from sqlalchemy import delete, insert, select, union_all
+
+from src.models.models import (
+    Order, OrderItem, OrderStatus, db, order_items_archive, orders_archive
+)
+from src.models.serializers import row_select
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+DEFAULT_BATCH_SIZE = 500
+CLOSED_STATUSES = (OrderStatus.DELIVERED, OrderStatus.CANCELLED)
+
+
+def archive_after_days():
+    return current_app.config.get('ORDER_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+
+
+def archive_cutoff():
+    return datetime.utcnow() - timedelta(days=archive_after_days())
+
+
+def _parse_date(name, end_of_day=False):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or datetime')
+    if end_of_day and len(value) == 10:
+        # A bare date includes that whole day
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed
+
+
+def parse_date_range():
+    """``(date_from, date_to)`` from the query string; either may be ``None``."""
+    date_from = _parse_date('date_from')
+    date_to = _parse_date('date_to', end_of_day=True)
+    if date_from and date_to and date_from > date_to:
+        raise ValueError('date_from must not be after date_to')
+    return date_from, date_to
+
+
+def wants_archive(date_from, date_to):
+    """Whether a requested range may contain archived orders."""
+    if date_from is None and date_to is None:
+        return False
+    # Orders are archived some time after creation, so compare generously
+    return date_from is None or date_from < archive_cutoff()
+
+
+def order_columns(include_archive=False):
+    """Columns to read orders from: ``Order``, or hot and archived orders."""
+    if not include_archive:
+        return Order
+    return union_all(select(Order.__table__), select(orders_archive)).subquery('orders_all').c
+
+
+def order_item_columns(include_archive=False):
+    if not include_archive:
+        return OrderItem
+    return union_all(
+        select(OrderItem.__table__), select(order_items_archive)
+    ).subquery('order_items_all').c
+
+
+def date_range_filters(source, date_from, date_to):
+    filters = []
+    if date_from is not None:
+        filters.append(source.created_at >= date_from)
+    if date_to is not None:
+        filters.append(source.created_at <= date_to)
+    return filters
+
+
+def archived_order(order_id, fields=None, required=()):
+    """``(row, serialize)`` for an archived order, or ``(None, None)``."""
+    stmt, serialize = row_select(Order, fields, required=required, source=orders_archive.c)
+    row = db.session.execute(stmt.where(orders_archive.c.id == order_id)).first()
+    return (row, serialize) if row is not None else (None, None)
+
+
+def archive_orders(cutoff=None, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Move closed orders last updated before ``cutoff`` into the archive.
+
+    ``cutoff`` may not be later than ``archive_cutoff()``: reads only look
+    in the archive for ranges reaching back past that, so newer archived
+    orders would disappear from them. Commits after each batch of
+    ``batch_size`` orders, so writers are only ever blocked briefly.
+    Returns the number of orders moved.
+    """
+    latest = archive_cutoff()
+    if cutoff is not None and cutoff > latest:
+        raise ValueError('Orders newer than the archive cutoff cannot be archived')
+    cutoff = cutoff or latest
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = db.session.execute(
+            select(Order.id)
+            .where(Order.status.in_(CLOSED_STATUSES), Order.updated_at < cutoff)
+            .limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+
+        items = select(OrderItem.__table__).where(OrderItem.order_id.in_(order_ids))
+        db.session.execute(insert(order_items_archive).from_select(list(items.selected_columns.keys()), items))
+        orders = select(Order.__table__).where(Order.id.in_(order_ids))
+        db.session.execute(insert(orders_archive).from_select(list(orders.selected_columns.keys()), orders))
+        db.session.execute(
+            delete(OrderItem).where(OrderItem.order_id.in_(order_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            delete(Order).where(Order.id.in_(order_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        moved += len(order_ids)
+        batches += 1
+        if len(order_ids) < batch_size:
+            break
+    return moved
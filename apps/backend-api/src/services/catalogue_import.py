@@ -0,0 +1,276 @@
+"""Streaming bulk product import for vendors.
+
+Records are read incrementally from a CSV or NDJSON upload, validated one at
+a time, and inserted in batches of ``batch_size`` rows with one transaction
+per batch, so import time grows linearly with the row count and memory stays
+bounded by the batch size.
+"""
+import codecs
+import csv
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from src.models.models import Category, Product, db
+from src.services.tags import set_product_tags
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_FIELDS = ('name', 'category_id', 'price')
+FLOAT_FIELDS = ('price', 'original_price', 'weight')
+INT_FIELDS = ('category_id', 'stock_quantity', 'low_stock_threshold')
+BOOL_FIELDS = ('is_featured',)
+TEXT_FIELDS = (
+    'name', 'description', 'sku', 'barcode', 'unit', 'image_url', 'additional_images',
+    'tags', 'origin_country', 'cultural_significance'
+)
+
+
+def generate_sku(vendor_id):
+    """SKU for products created without one: ``HO-<vendor id>-<8 hex chars>``."""
+    return f"HO-{vendor_id}-{str(uuid.uuid4())[:8].upper()}"
+
+
+# -----------------------------
+# Readers
+# -----------------------------
+
+def _lines(stream, chunk_size=64 * 1024):
+    """Decode a binary stream into text lines without reading it all at once."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_csv_records(stream):
+    for record in csv.DictReader(_lines(stream)):
+        yield {key.strip(): value for key, value in record.items() if key}
+
+
+class RecordError:
+    """Stands in for a record the reader could not parse."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def iter_ndjson_records(stream):
+    for line in _lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield RecordError(f'Invalid JSON: {e}')
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    normalized = str(value).strip().lower()
+    if normalized in ('1', 'true', 'yes', 'y'):
+        return True
+    if normalized in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError
+
+
+def validate_record(record, category_ids):
+    """Coerce one uploaded record into product column values.
+
+    Returns ``(values, errors)``; ``values`` is ``None`` when there are errors.
+    """
+    if isinstance(record, RecordError):
+        return None, [record.message]
+    if not isinstance(record, dict):
+        return None, ['Record must be an object']
+
+    errors = []
+    values = {}
+    for field in REQUIRED_FIELDS:
+        if _blank(record.get(field)):
+            errors.append(f'{field} is required')
+
+    for field in FLOAT_FIELDS:
+        if not _blank(record.get(field)):
+            try:
+                values[field] = float(record[field])
+            except (TypeError, ValueError):
+                errors.append(f'{field} must be a number')
+    for field in INT_FIELDS:
+        if not _blank(record.get(field)):
+            try:
+                values[field] = int(record[field])
+            except (TypeError, ValueError):
+                errors.append(f'{field} must be an integer')
+    for field in BOOL_FIELDS:
+        if not _blank(record.get(field)):
+            try:
+                values[field] = _to_bool(record[field])
+            except ValueError:
+                errors.append(f'{field} must be a boolean')
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if _blank(value):
+            continue
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        values[field] = str(value).strip()
+
+    if 'price' in values and values['price'] < 0:
+        errors.append('price must not be negative')
+    if values.get('stock_quantity', 0) < 0:
+        errors.append('stock_quantity must not be negative')
+    if 'category_id' in values and values['category_id'] not in category_ids:
+        errors.append(f"category_id {values['category_id']} does not exist")
+
+    if errors:
+        return None, errors
+    return values, []
+
+
+# -----------------------------
+# Import
+# -----------------------------
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.category_ids = set()
+
+    def error(self, row, messages):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': messages})
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def _assign_generated_skus(vendor_id, rows, taken):
+    """Give each row a generated SKU that is unique in the batch and the table.
+
+    Generated SKUs only carry 32 random bits, so a large import is likely to
+    draw a duplicate somewhere; clashes are redrawn instead of failing the
+    whole batch on the unique constraint.
+    """
+    pending = rows
+    while pending:
+        candidates = {}
+        for values in pending:
+            sku = generate_sku(vendor_id)
+            while sku in taken or sku in candidates:
+                sku = generate_sku(vendor_id)
+            candidates[sku] = values
+        existing = set(db.session.execute(
+            select(Product.sku).where(Product.sku.in_(candidates))
+        ).scalars())
+        pending = []
+        for sku, values in candidates.items():
+            if sku in existing:
+                pending.append(values)
+            else:
+                values['sku'] = sku
+                taken.add(sku)
+
+
+def _index_tags(rows):
+    """Fill ``product_tags`` for just-inserted rows, matched back by SKU."""
+    tagged = {values['sku']: values['tags'] for values in rows if values.get('tags')}
+    if not tagged:
+        return
+    ids = db.session.execute(
+        select(Product.sku, Product.id).where(Product.sku.in_(list(tagged)))
+    ).all()
+    set_product_tags({row.id: tagged[row.sku] for row in ids})
+
+
+def _flush(vendor_id, batch, report):
+    """Insert one batch in its own transaction, reporting SKU clashes per row."""
+    skus = [values['sku'] for _, values in batch if values.get('sku')]
+    taken = set()
+    if skus:
+        taken = set(db.session.execute(select(Product.sku).where(Product.sku.in_(skus))).scalars())
+
+    now = datetime.utcnow()
+    rows = []
+    generated = []
+    for row_number, values in batch:
+        sku = values.get('sku')
+        if sku and sku in taken:
+            report.error(row_number, [f'sku {sku} already exists'])
+            continue
+        if not sku:
+            generated.append(values)
+        else:
+            taken.add(sku)
+        values.setdefault('unit', 'piece')
+        values.setdefault('stock_quantity', 0)
+        values.setdefault('low_stock_threshold', 5)
+        values.setdefault('is_featured', False)
+        values.update(vendor_id=vendor_id, is_active=True, created_at=now, updated_at=now)
+        rows.append(values)
+
+    _assign_generated_skus(vendor_id, generated, taken)
+
+    if rows:
+        db.session.execute(insert(Product), rows)
+        _index_tags(rows)
+    db.session.commit()
+    report.imported += len(rows)
+    report.category_ids.update(values['category_id'] for values in rows)
+
+
+def import_products(vendor_id, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and insert ``records`` for ``vendor_id``; returns an ``ImportReport``.
+
+    ``records`` is any iterable of dicts, typically a reader above. Rows that
+    fail validation are reported and skipped; valid rows are committed batch
+    by batch, so a failure in a later batch keeps earlier ones.
+    """
+    category_ids = set(db.session.execute(select(Category.id)).scalars())
+    report = ImportReport()
+    batch = []
+    row_number = 0
+    for row_number, record in enumerate(records, start=1):
+        values, errors = validate_record(record, category_ids)
+        if errors:
+            report.error(row_number, errors)
+            continue
+        batch.append((row_number, values))
+        if len(batch) >= batch_size:
+            _flush(vendor_id, batch, report)
+            batch = []
+    if batch:
+        _flush(vendor_id, batch, report)
+    return report
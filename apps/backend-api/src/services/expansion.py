@@ -0,0 +1,175 @@
+"""Relationship expansion and sparse fieldsets for list and detail endpoints.
+
+Clients pick the nested objects they need with ``?expand=vendor,category``.
+Each requested relationship is loaded with ``selectinload``, i.e. one batched
+``IN`` query per relationship level, so the number of queries per page stays
+fixed regardless of page size.
+
+``?fields=id,name,price`` limits both the columns SELECTed for the top-level
+model and the keys it serializes.
+
+List endpoints work on Core rows (see ``src.models.serializers``) and expand
+them with ``expand_product_rows``/``expand_order_rows``, which issue the same
+one-query-per-level batches without building ORM objects. Detail endpoints
+use the ORM loader options and ``serialize_*`` helpers.
+"""
+from flask import request
+from sqlalchemy.orm import load_only, selectinload
+
+from src.models.models import Category, Order, OrderItem, Product, Rider, User, Vendor, db
+from src.models.serializers import row_select
+from src.services.archive import order_item_columns
+
+PRODUCT_EXPANSIONS = ('vendor', 'category')
+ORDER_EXPANSIONS = ('customer', 'vendor', 'rider', 'items')
+
+
+def parse_expand(default, allowed):
+    """Read ``expand`` from the query string.
+
+    A missing parameter yields ``default``; an empty one expands nothing.
+    Raises ``ValueError`` for names not in ``allowed``.
+    """
+    raw = request.args.get('expand')
+    if raw is None:
+        return set(default)
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown expand value(s): {', '.join(sorted(unknown))}")
+    return requested
+
+
+def parse_fields(model):
+    """Read ``fields`` from the query string for ``model``; ``None`` means all."""
+    return model.parse_fields(request.args.get('fields'))
+
+
+def load_only_fields(model, fields, required=()):
+    """``load_only`` for ``fields`` plus the columns the query itself needs.
+
+    ``required`` covers foreign keys of expanded relationships and sort keys;
+    leaving them unloaded would trigger one lazy load per row.
+    """
+    columns = dict.fromkeys(list(fields) + list(required))
+    return load_only(*[getattr(model, column) for column in columns])
+
+
+def product_load_options(expand, fields=None, required=()):
+    options = []
+    if fields is not None:
+        foreign_keys = [fk for name, fk in (('vendor', 'vendor_id'), ('category', 'category_id')) if name in expand]
+        options.append(load_only_fields(Product, fields, foreign_keys + list(required)))
+    if 'vendor' in expand:
+        options.append(selectinload(Product.vendor))
+    if 'category' in expand:
+        options.append(selectinload(Product.category))
+    return options
+
+
+def order_load_options(expand, fields=None, required=()):
+    options = []
+    if fields is not None:
+        foreign_keys = [
+            fk for name, fk in (('customer', 'customer_id'), ('vendor', 'vendor_id'), ('rider', 'rider_id'))
+            if name in expand
+        ]
+        options.append(load_only_fields(Order, fields, foreign_keys + list(required)))
+    if 'customer' in expand:
+        options.append(selectinload(Order.customer))
+    if 'vendor' in expand:
+        options.append(selectinload(Order.vendor))
+    if 'rider' in expand:
+        options.append(selectinload(Order.rider))
+    if 'items' in expand:
+        options.append(selectinload(Order.order_items).selectinload(OrderItem.product))
+    return options
+
+
+def serialize_product(product, expand, fields=None):
+    product_dict = product.to_dict(fields)
+    if 'vendor' in expand:
+        product_dict['vendor'] = product.vendor.to_dict() if product.vendor else None
+    if 'category' in expand:
+        product_dict['category'] = product.category.to_dict() if product.category else None
+    return product_dict
+
+
+def serialize_order(order, expand, fields=None):
+    order_dict = order.to_dict(fields)
+    if 'customer' in expand:
+        order_dict['customer'] = order.customer.to_dict() if order.customer else None
+    if 'vendor' in expand:
+        order_dict['vendor'] = order.vendor.to_dict() if order.vendor else None
+    if 'rider' in expand:
+        order_dict['rider'] = order.rider.to_dict() if order.rider else None
+    if 'items' in expand:
+        order_items = []
+        for item in order.order_items:
+            item_dict = item.to_dict()
+            item_dict['product'] = item.product.to_dict() if item.product else None
+            order_items.append(item_dict)
+        order_dict['items'] = order_items
+    return order_dict
+
+
+# -----------------------------
+# Core row expansion (list endpoints)
+# -----------------------------
+
+PRODUCT_ROW_REQUIRED = {'vendor': 'vendor_id', 'category': 'category_id'}
+ORDER_ROW_REQUIRED = {'customer': 'customer_id', 'vendor': 'vendor_id', 'rider': 'rider_id'}
+
+
+def row_required(expand, foreign_keys, *extra):
+    """Columns a row query must select for ``expand`` and the caller's own use."""
+    return tuple(foreign_keys[name] for name in foreign_keys if name in expand) + extra
+
+
+def fetch_serialized(model, ids):
+    """Serialize the ``model`` rows with the given ids in one ``IN`` query."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    stmt, serialize = row_select(model)
+    rows = db.session.execute(stmt.where(model.id.in_(ids))).all()
+    return {row.id: serialize(row) for row in rows}
+
+
+def expand_product_rows(rows, product_dicts, expand):
+    if 'vendor' in expand:
+        vendors = fetch_serialized(Vendor, (row.vendor_id for row in rows))
+        for row, product_dict in zip(rows, product_dicts):
+            product_dict['vendor'] = vendors.get(row.vendor_id)
+    if 'category' in expand:
+        categories = fetch_serialized(Category, (row.category_id for row in rows))
+        for row, product_dict in zip(rows, product_dicts):
+            product_dict['category'] = categories.get(row.category_id)
+    return product_dicts
+
+
+def expand_order_rows(rows, order_dicts, expand, include_archive=False):
+    for name, model in (('customer', User), ('vendor', Vendor), ('rider', Rider)):
+        if name not in expand:
+            continue
+        column = ORDER_ROW_REQUIRED[name]
+        related = fetch_serialized(model, (getattr(row, column) for row in rows))
+        for row, order_dict in zip(rows, order_dicts):
+            order_dict[name] = related.get(getattr(row, column))
+
+    if 'items' in expand:
+        items_by_order = {row.id: [] for row in rows}
+        if items_by_order:
+            source = order_item_columns(include_archive)
+            stmt, serialize = row_select(OrderItem, source=source)
+            item_rows = db.session.execute(
+                stmt.where(source.order_id.in_(items_by_order)).order_by(source.id)
+            ).all()
+            products = fetch_serialized(Product, (item.product_id for item in item_rows))
+            for item in item_rows:
+                item_dict = serialize(item)
+                item_dict['product'] = products.get(item.product_id)
+                items_by_order[item.order_id].append(item_dict)
+        for row, order_dict in zip(rows, order_dicts):
+            order_dict['items'] = items_by_order[row.id]
+    return order_dicts
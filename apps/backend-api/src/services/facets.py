@@ -0,0 +1,111 @@
+"""Facet counts for product listings.
+
+All requested facets are counted in one ``GROUP BY`` over the filtered
+products and rolled up in Python, so the cost is one query whatever the
+number of facet values. Results are cached per filter signature; the
+signature includes the response-cache tag versions of the listing, so any
+product write that could change the counts also retires the cached facets.
+"""
+from flask import request
+from sqlalchemy import case, func, select
+
+from src.models.models import Category, Product, Vendor, db
+from src.services.cache import TTLCache
+
+FACETS = ('category', 'origin_country', 'vendor', 'price')
+
+# (low, high) price bounds; the last bucket is open-ended.
+PRICE_BUCKETS = ((0, 5), (5, 10), (10, 20), (20, 50), (50, None))
+
+_facet_cache = TTLCache(maxsize=512, ttl=300)
+
+
+def parse_facets():
+    """Facets requested with ``?facets=``: ``1``/``all`` or a comma-separated list."""
+    value = request.args.get('facets')
+    if not value:
+        return ()
+    if value.lower() in ('1', 'true', 'yes', 'all'):
+        return FACETS
+    facets = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name or name in facets:
+            continue
+        if name not in FACETS:
+            raise ValueError(f'Unknown facet: {name}')
+        facets.append(name)
+    return tuple(facets)
+
+
+def _price_bucket(price):
+    return case(
+        *[(price < high, index) for index, (_, high) in enumerate(PRICE_BUCKETS) if high is not None],
+        else_=len(PRICE_BUCKETS) - 1
+    )
+
+
+def _aggregate(query, facets):
+    filtered = query.with_only_columns(
+        Product.category_id, Product.origin_country, Product.vendor_id, Product.price
+    ).order_by(None).subquery()
+
+    columns = []
+    stmt = select().select_from(filtered)
+    if 'category' in facets:
+        columns += [filtered.c.category_id, Category.name.label('category_name')]
+        stmt = stmt.outerjoin(Category, Category.id == filtered.c.category_id)
+    if 'origin_country' in facets:
+        columns.append(filtered.c.origin_country)
+    if 'vendor' in facets:
+        columns += [filtered.c.vendor_id, Vendor.business_name]
+        stmt = stmt.outerjoin(Vendor, Vendor.id == filtered.c.vendor_id)
+    if 'price' in facets:
+        columns.append(_price_bucket(filtered.c.price).label('price_bucket'))
+
+    stmt = stmt.add_columns(*columns, func.count().label('count')).group_by(*columns)
+    return db.session.execute(stmt).all()
+
+
+def _ranked(counts):
+    return sorted(counts.values(), key=lambda item: (-item['count'], str(item.get('name', item.get('value')))))
+
+
+def compute_facets(query, facets):
+    """Count ``facets`` over the products matched by the ``Select`` ``query``."""
+    rollup = {facet: {} for facet in facets}
+    for row in _aggregate(query, facets):
+        if 'category' in facets:
+            item = rollup['category'].setdefault(
+                row.category_id, {'id': row.category_id, 'name': row.category_name, 'count': 0}
+            )
+            item['count'] += row.count
+        if 'origin_country' in facets:
+            item = rollup['origin_country'].setdefault(
+                row.origin_country, {'value': row.origin_country, 'count': 0}
+            )
+            item['count'] += row.count
+        if 'vendor' in facets:
+            item = rollup['vendor'].setdefault(
+                row.vendor_id, {'id': row.vendor_id, 'name': row.business_name, 'count': 0}
+            )
+            item['count'] += row.count
+        if 'price' in facets:
+            low, high = PRICE_BUCKETS[row.price_bucket]
+            item = rollup['price'].setdefault(row.price_bucket, {'min': low, 'max': high, 'count': 0})
+            item['count'] += row.count
+
+    return {
+        facet: [counts[index] for index in sorted(counts)] if facet == 'price' else _ranked(counts)
+        for facet, counts in rollup.items()
+    }
+
+
+def cached_facets(query, facets, signature):
+    """``compute_facets`` memoized on ``signature``, a hashable description of the filter."""
+    key = (signature, facets)
+    result = _facet_cache.get(key)
+    if result is None:
+        result = compute_facets(query, facets)
+        _facet_cache.set(key, result)
+    return result
@@ -0,0 +1,139 @@
+"""``Idempotency-Key`` support for unsafe endpoints.
+
+A client that retries a request after a timeout or a dropped connection
+sends the same ``Idempotency-Key`` header. The first request claims the key
+by inserting a row (unique per user and key) before the view runs; once the
+view returns, its response is stored on the row. A retry with the same key
+and the same request gets the stored response back without running the
+view again, so an order is never created or advanced twice.
+
+Keys expire after ``IDEMPOTENCY_KEY_TTL`` seconds (24 hours by default).
+Responses with a 5xx status are not stored; the claim is released so the
+client can retry. A claim can also be left without a response when its
+worker is killed (gunicorn's timeout, the OOM killer). Such a claim is
+treated as abandoned once it is ``IDEMPOTENCY_LEASE`` seconds old (60 by
+default, twice gunicorn's timeout), and the next retry of the same request
+takes it over.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.models import IdempotencyKey, db
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_LEASE = 60
+
+
+def request_fingerprint():
+    """Hash of the method, path and body; JSON bodies are compared canonically."""
+    body = request.get_json(silent=True)
+    if body is not None:
+        payload = json.dumps(body, sort_keys=True, separators=(',', ':')).encode()
+    else:
+        payload = request.get_data()
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """Insert the key's row; returns ``None`` when claimed, else the existing row."""
+    now = datetime.utcnow()
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+    db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at < now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.add(IdempotencyKey(
+        user_id=user_id, key=key, fingerprint=fingerprint,
+        created_at=now, expires_at=now + timedelta(seconds=ttl)
+    ))
+    try:
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing is not None and existing.response_status is None and \
+            existing.fingerprint == fingerprint and _take_over(existing, now, ttl):
+        return None
+    return existing
+
+
+def _take_over(record, now, ttl):
+    """Re-claim ``record`` if its claim outlived the lease; only one caller wins."""
+    lease = current_app.config.get('IDEMPOTENCY_LEASE', DEFAULT_LEASE)
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == record.id,
+            IdempotencyKey.response_status.is_(None),
+            IdempotencyKey.created_at < now - timedelta(seconds=lease),
+        )
+        .values(created_at=now, expires_at=now + timedelta(seconds=ttl))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record.response_body, status=record.response_status, mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(f):
+    """Honour ``Idempotency-Key`` on a view wrapped by ``token_required``."""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        fingerprint = request_fingerprint()
+        existing = _claim(current_user.id, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                return jsonify({'message': f'{HEADER} was already used for a different request'}), 422
+            if existing.response_status is None:
+                return jsonify({'message': f'A request with this {HEADER} is still in progress'}), 409
+            return _replay(existing)
+
+        try:
+            response = make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            _release(current_user.id, key)
+            raise
+
+        if response.status_code >= 500:
+            _release(current_user.id, key)
+        else:
+            db.session.rollback()
+            record = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).first()
+            record.response_status = response.status_code
+            record.response_body = response.get_data(as_text=True)
+            db.session.commit()
+        return response
+    return decorated
+
+
+def _release(user_id, key):
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    db.session.commit()
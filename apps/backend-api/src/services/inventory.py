@@ -0,0 +1,252 @@
+"""Batch stock and price updates.
+
+A till system pushes thousands of changes at a time. Instead of loading and
+committing each product, changes are validated up front, resolved to product
+ids with one query, and written with set-based ``UPDATE ... CASE`` statements
+inside a single transaction.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, select, update
+
+from src.models.models import Product, db
+
+MAX_UPDATES = 10000
+
+# Products per UPDATE statement; keeps the bound parameters well below
+# SQLite's per-statement limit.
+CHUNK_SIZE = 500
+
+
+def _number(entry, field, cast, errors, minimum=None):
+    if field not in entry or entry[field] is None:
+        return None
+    value = entry[field]
+    if isinstance(value, bool):
+        errors.append(f'{field} must be a number')
+        return None
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        errors.append(f'{field} must be a number')
+        return None
+    if minimum is not None and value < minimum:
+        errors.append(f'{field} must not be negative')
+        return None
+    return value
+
+
+def validate_update(entry):
+    """Return ``(change, errors)`` for one requested update."""
+    if not isinstance(entry, dict):
+        return None, ['Update must be an object']
+
+    errors = []
+    if entry.get('product_id') is None and not entry.get('sku'):
+        errors.append('product_id or sku is required')
+    if 'stock_quantity' in entry and 'stock_delta' in entry:
+        errors.append('Give stock_quantity or stock_delta, not both')
+    if 'price' in entry and 'price_delta' in entry:
+        errors.append('Give price or price_delta, not both')
+
+    change = {
+        'product_id': _number(entry, 'product_id', int, errors),
+        'sku': entry.get('sku'),
+        'stock_quantity': _number(entry, 'stock_quantity', int, errors, minimum=0),
+        'stock_delta': _number(entry, 'stock_delta', int, errors),
+        'price': _number(entry, 'price', float, errors, minimum=0),
+        'price_delta': _number(entry, 'price_delta', float, errors),
+    }
+    if not errors and all(change[f] is None for f in ('stock_quantity', 'stock_delta', 'price', 'price_delta')):
+        errors.append('Nothing to update')
+    return (None, errors) if errors else (change, [])
+
+
+def _resolve(changes, vendor_id):
+    """Map each change to its product row with one query.
+
+    With ``vendor_id`` only that vendor's products resolve, which is the
+    ownership check for the whole batch.
+    """
+    ids = {c['product_id'] for c in changes if c['product_id'] is not None}
+    skus = {c['sku'] for c in changes if c['product_id'] is None}
+    query = select(Product.id, Product.sku, Product.vendor_id, Product.category_id).where(
+        or_(Product.id.in_(ids), Product.sku.in_(skus))
+    )
+    if vendor_id is not None:
+        query = query.where(Product.vendor_id == vendor_id)
+    rows = db.session.execute(query).all()
+    by_id = {row.id: row for row in rows}
+    by_sku = {row.sku: row for row in rows if row.sku}
+    return by_id, by_sku
+
+
+def _clamped(expression):
+    return case((expression < 0, 0), else_=expression)
+
+
+def _set_values(chunk):
+    """SET clause for one chunk: per-product absolute or relative values."""
+    stock = {}
+    price = {}
+    for product_id, change in chunk:
+        if change['stock_quantity'] is not None:
+            stock[product_id] = change['stock_quantity']
+        elif change['stock_delta'] is not None:
+            stock[product_id] = _clamped(Product.stock_quantity + change['stock_delta'])
+        if change['price'] is not None:
+            price[product_id] = change['price']
+        elif change['price_delta'] is not None:
+            price[product_id] = _clamped(Product.price + change['price_delta'])
+
+    values = {'updated_at': datetime.utcnow()}
+    if stock:
+        values['stock_quantity'] = case(stock, value=Product.id, else_=Product.stock_quantity)
+    if price:
+        values['price'] = case(price, value=Product.id, else_=Product.price)
+    return values
+
+
+def apply_inventory_updates(entries, vendor_id=None):
+    """Apply a batch of stock/price changes in one transaction.
+
+    Returns ``(results, touched)``: one result per entry in request order,
+    and ``(id, vendor_id, category_id)`` for every updated product. The
+    caller commits.
+    """
+    results = [None] * len(entries)
+    valid = []
+    for index, entry in enumerate(entries):
+        change, errors = validate_update(entry)
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+        else:
+            valid.append((index, change))
+
+    by_id, by_sku = _resolve([change for _, change in valid], vendor_id) if valid else ({}, {})
+
+    planned = {}
+    for index, change in valid:
+        row = by_id.get(change['product_id']) if change['product_id'] is not None else by_sku.get(change['sku'])
+        if row is None:
+            results[index] = {'index': index, 'status': 'error', 'errors': ['Product not found']}
+        elif row.id in planned:
+            results[index] = {'index': index, 'status': 'error', 'errors': ['Duplicate update for product']}
+        else:
+            planned[row.id] = (index, change, row)
+
+    items = [(product_id, change) for product_id, (_, change, _) in planned.items()]
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = items[start:start + CHUNK_SIZE]
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_([product_id for product_id, _ in chunk]))
+            .values(**_set_values(chunk))
+            .execution_options(synchronize_session=False)
+        )
+
+    current = {}
+    product_ids = list(planned)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        rows = db.session.execute(
+            select(Product.id, Product.stock_quantity, Product.price)
+            .where(Product.id.in_(product_ids[start:start + CHUNK_SIZE]))
+        ).all()
+        current.update({row.id: row for row in rows})
+
+    touched = []
+    for product_id, (index, _, row) in planned.items():
+        after = current[product_id]
+        results[index] = {
+            'index': index, 'status': 'updated', 'product_id': product_id, 'sku': row.sku,
+            'stock_quantity': after.stock_quantity, 'price': after.price,
+        }
+        touched.append((product_id, row.vendor_id, row.category_id))
+    return results, touched
+
+
+class StockError(Exception):
+    """A stock reservation could not be made; the message says why."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def order_quantities(items):
+    """``{product_id: total quantity}`` for order line items.
+
+    Lines for the same product are added up so they are checked and
+    reserved together.
+    """
+    quantities = {}
+    for item in items:
+        quantity = item.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise StockError('Item quantity must be a positive integer')
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + quantity
+    return quantities
+
+
+def load_order_products(quantities):
+    """Load the products for ``{product_id: quantity}`` with one ``IN`` query.
+
+    Raises ``StockError`` for unknown products and for lines the current
+    stock cannot cover.
+    """
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.price, Product.stock_quantity,
+               Product.vendor_id, Product.category_id)
+        .where(Product.id.in_(list(quantities)))
+    ).all()
+    products = {row.id: row for row in rows}
+    for product_id in quantities:
+        if product_id not in products:
+            raise StockError(f'Product {product_id} not found', status_code=404)
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        if (product.stock_quantity or 0) < quantity:
+            raise StockError(
+                f'Insufficient stock for {product.name}. Available: {product.stock_quantity}'
+            )
+    return products
+
+
+def reserve_stock(quantities):
+    """Decrement stock for ``{product_id: quantity}`` in one conditional UPDATE.
+
+    Only rows that still hold enough stock are updated, so concurrent
+    checkouts cannot oversell. If any line falls short ``StockError`` is
+    raised and the caller must roll back the whole transaction.
+    """
+    wanted = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock_quantity >= wanted)
+        .values(stock_quantity=Product.stock_quantity - wanted, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        short = db.session.execute(
+            select(Product.name, Product.stock_quantity)
+            .where(Product.id.in_(list(quantities)), Product.stock_quantity < wanted)
+        ).all()
+        names = ', '.join(f'{row.name} (available: {row.stock_quantity})' for row in short)
+        raise StockError(f'Insufficient stock for {names}')
+
+
+def low_stock_filter():
+    """Criterion for active products at or under their low-stock threshold.
+
+    Written to match the ``ix_products_active_low_stock`` partial index predicate
+    so SQLite can answer it from the index.
+    """
+    return (Product.is_active == True) & (Product.stock_quantity <= Product.low_stock_threshold)
+
+
+def low_stock_counts(vendor_id=None):
+    """``{vendor_id: count}`` of low-stock products, for one or all vendors."""
+    query = select(Product.vendor_id, func.count()).where(low_stock_filter()).group_by(Product.vendor_id)
+    if vendor_id is not None:
+        query = query.where(Product.vendor_id == vendor_id)
+    return dict(db.session.execute(query).all())
@@ -0,0 +1,254 @@
+"""Typo-tolerant matching of shopping-list lines to products.
+
+Lines such as ``"2x plantain"`` or ``"scotch bonet"`` (what the OCR service's
+``extract_shopping_items`` produces) are split into a quantity and a query,
+and the query is matched against a trigram index of product names and tags.
+Each word is padded as ``"  word "`` before taking trigrams, like
+PostgreSQL's pg_trgm, so word starts weigh more and short words still have
+trigrams. A product scores by the share of the query's trigrams it contains,
+blended with plain trigram (Jaccard) similarity so tighter names rank first.
+
+The index lives in each worker and is built and refreshed from
+``updated_at`` on a background thread, the same way as the suggestion index
+(see ``suggest.py``). Candidates are checked against ``is_active`` in the
+database before they are returned, so a product deactivated by another
+worker since the last refresh never shows up.
+"""
+import heapq
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from src.models.models import Product, db
+from src.services.refresher import IndexNotReady, IndexRefresher
+from src.services.response_cache import add_invalidation_listener
+from src.services.suggest import normalize
+from src.services.tags import parse_tags
+
+MAX_LINES = 50
+DEFAULT_CANDIDATES = 3
+MAX_CANDIDATES = 10
+MIN_SCORE = 0.3
+DEFAULT_REFRESH_INTERVAL = 5.0
+WATERMARK_LAG = timedelta(seconds=5)
+# Past this many changed rows the index is rebuilt and swapped in, rather
+# than updated under the lock that matching waits on.
+REPLACE_THRESHOLD = 1000
+
+# Candidates come from the query's rarest trigrams: at least
+# MIN_SEED_TRIGRAMS of them, then more while their posting lists fit in
+# CANDIDATE_BUDGET ids. No posting list longer than MAX_SEED_POSTINGS is
+# counted; a query made only of such common trigrams instead intersects
+# them. The RESCORED candidates sharing the most seed trigrams are then
+# scored exactly.
+MIN_SEED_TRIGRAMS = 3
+MAX_SEED_POSTINGS = 5000
+CANDIDATE_BUDGET = 2000
+RESCORED = 50
+
+# "2x plantain", "2 x plantain", "3 plantains", "2kg rice"
+_QUANTITY_BEFORE = re.compile(r'^\s*(\d{1,3})\s*(?:[x×*]\s+)?(?=[^\W\d])', re.I)
+# "plantain x3", "plantain x 3"
+_QUANTITY_AFTER = re.compile(r'\s*[x×*]\s*(\d{1,3})\s*$', re.I)
+_UNITS = {
+    'kg', 'g', 'lb', 'lbs', 'l', 'ml', 'pack', 'packs', 'bag', 'bags', 'tin', 'tins',
+    'bottle', 'bottles', 'bunch', 'bunches', 'pcs', 'of',
+}
+
+
+def parse_line(line):
+    """``(quantity, query)`` for a line like ``"2x plantain"`` or ``"rice x3"``."""
+    quantity = 1
+    match = _QUANTITY_BEFORE.match(line) or _QUANTITY_AFTER.search(line)
+    if match:
+        quantity = int(match.group(1)) or 1
+        line = line[:match.start()] + ' ' + line[match.end():]
+    words = [word for word in normalize(line).split() if word not in _UNITS and not word.isdigit()]
+    return quantity, ' '.join(words)
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # trigram -> {product id}
+        self._products = {}  # product id -> (name, trigrams)
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._products)
+
+    def _remove(self, product_id):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            postings = self._postings[gram]
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[gram]
+
+    @staticmethod
+    def _grams(name, tags):
+        return trigrams(' '.join([name, *parse_tags(tags)]))
+
+    def update(self, upserts=(), removals=()):
+        """Apply ``(id, name, tags)`` upserts and product id removals."""
+        with self._lock:
+            for product_id in removals:
+                self._remove(product_id)
+            for product_id, name, tags in upserts:
+                self._remove(product_id)
+                grams = self._grams(name, tags)
+                self._products[product_id] = (name, grams)
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(product_id)
+
+    def replace(self, entries):
+        """Rebuild from ``(id, name, tags)`` tuples."""
+        postings = {}
+        products = {}
+        for product_id, name, tags in entries:
+            grams = self._grams(name, tags)
+            products[product_id] = (name, grams)
+            for gram in grams:
+                postings.setdefault(gram, set()).add(product_id)
+        with self._lock:
+            self._postings = postings
+            self._products = products
+
+    def match(self, query, limit=DEFAULT_CANDIDATES):
+        """``[(product id, score)]``, best first, for a normalized query."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._lock:
+            # Misspelt trigrams are usually absent from the index entirely
+            postings = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+            shared = Counter()
+            budget = CANDIDATE_BUDGET
+            for seeds, products in enumerate(postings):
+                if len(products) > MAX_SEED_POSTINGS:
+                    break
+                if seeds >= MIN_SEED_TRIGRAMS and len(products) > budget:
+                    break
+                shared.update(products)
+                budget -= len(products)
+
+            if shared:
+                candidates = [product_id for product_id, _ in shared.most_common(RESCORED)]
+            elif postings:
+                # Every trigram is common: narrow the rarest posting list by
+                # the others (skipping any that would empty it, e.g. a typo)
+                # and rescore the tightest names left.
+                narrowed = postings[0]
+                for products in postings[1:]:
+                    narrowed = (narrowed & products) or narrowed
+                candidates = heapq.nsmallest(
+                    RESCORED, narrowed, key=lambda product_id: (len(self._products[product_id][1]), product_id)
+                )
+            else:
+                candidates = []
+
+            scored = []
+            for product_id in candidates:
+                product_grams = self._products[product_id][1]
+                count = len(grams & product_grams)
+                coverage = count / len(grams)
+                jaccard = count / (len(grams) + len(product_grams) - count)
+                score = 0.7 * coverage + 0.3 * jaccard
+                if score >= MIN_SCORE:
+                    scored.append((score, product_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(product_id, round(score, 3)) for score, product_id in scored[:limit]]
+
+
+# -----------------------------
+# Loading from the database
+# -----------------------------
+
+def refresh(index):
+    """Apply product changes since ``index.watermark`` (everything on first use)."""
+    query = select(Product.id, Product.name, Product.tags, Product.is_active, Product.updated_at)
+    if index.watermark is not None:
+        rows = db.session.execute(query.where(Product.updated_at >= index.watermark - WATERMARK_LAG)).all()
+        if not rows:
+            return
+        if len(rows) <= REPLACE_THRESHOLD:
+            index.update(
+                [(row.id, row.name, row.tags) for row in rows if row.is_active],
+                [row.id for row in rows if not row.is_active]
+            )
+            index.watermark = max(index.watermark, *(row.updated_at for row in rows))
+            return
+
+    watermark = db.session.execute(select(func.max(Product.updated_at))).scalar()
+    rows = db.session.execute(query.where(Product.is_active == True)).all()
+    index.replace((row.id, row.name, row.tags) for row in rows)
+    index.watermark = watermark
+
+
+# -----------------------------
+# Per-worker access
+# -----------------------------
+
+_index = TrigramIndex()
+_refresher = IndexRefresher(
+    'product-matching', lambda: refresh(_index), 'MATCH_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL
+)
+
+
+def _mark_stale(tags):
+    _refresher.poke()
+
+
+add_invalidation_listener(_mark_stale)
+
+
+def _active(product_ids):
+    if not product_ids:
+        return set()
+    return set(db.session.execute(
+        select(Product.id).where(Product.id.in_(product_ids), Product.is_active == True)
+    ).scalars())
+
+
+def match_lines(lines, limit=DEFAULT_CANDIDATES):
+    """Ranked ``(product id, score)`` candidates for each shopping-list line.
+
+    Returns one dict per line with the parsed ``quantity`` and ``query``.
+    Raises ``IndexNotReady`` until the index has been built. Must run inside
+    an application context.
+    """
+    _refresher.start(current_app._get_current_object())
+    if not _refresher.ready:
+        raise IndexNotReady('product matching index')
+    limit = max(1, min(limit, MAX_CANDIDATES))
+    results = []
+    for line in lines:
+        quantity, query = parse_line(str(line))
+        results.append({
+            'line': line,
+            'quantity': quantity,
+            'query': query,
+            # Spares stand in for products deactivated since the last refresh
+            'candidates': _index.match(query, 2 * limit) if query else []
+        })
+
+    active = _active({product_id for result in results for product_id, _ in result['candidates']})
+    for result in results:
+        result['candidates'] = [
+            candidate for candidate in result['candidates'] if candidate[0] in active
+        ][:limit]
+    return results
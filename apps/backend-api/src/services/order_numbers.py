@@ -0,0 +1,182 @@
+"""Order numbers and pickup codes that never collide.
+
+Order numbers look like ``HO-20261017-0K3QZ81C07`` and are built from:
+
+    date      UTC day of the order
+    time      milliseconds into the day, 6 base-36 digits
+    worker    this process's worker id, 2 base-36 digits
+    sequence  orders this worker already numbered in that millisecond, 2 digits
+
+Every part is fixed width and base-36 digits sort in ASCII order, so numbers
+sort by creation time. Two workers never share a worker id, and one worker
+never repeats a (millisecond, sequence) pair: if the clock steps back or a
+millisecond's sequence runs out, it keeps counting from its last timestamp.
+No retry or uniqueness SELECT is needed.
+
+Each process claims a free slot by holding an ``flock`` on one of the
+``worker-<n>.lock`` files next to the database, which the OS releases when
+the process exits. The worker id is that slot plus ``WORKER_ID`` (the
+environment variable or config key, 0 by default). Forked gunicorn workers
+inherit ``WORKER_ID``, so it only offsets the slots, e.g. to give hosts that
+do not share a lock directory disjoint ranges.
+
+Pickup codes prove who may collect an order, so they are random 6-digit
+numbers, not derived from anything the API exposes. The partial unique
+index ``ix_orders_open_pickup_code`` keeps them distinct among open orders;
+``assign_pickup_code`` draws again on the rare clash.
+"""
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from src.models.models import db
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+PREFIX = 'HO'
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+TIME_WIDTH = 6
+WORKER_WIDTH = 2
+SEQUENCE_WIDTH = 2
+MAX_WORKERS = len(DIGITS) ** WORKER_WIDTH
+MAX_SEQUENCE = len(DIGITS) ** SEQUENCE_WIDTH
+
+PICKUP_CODE_DIGITS = 6
+PICKUP_CODE_SPACE = 10 ** PICKUP_CODE_DIGITS
+PICKUP_CODE_ATTEMPTS = 5
+
+_DAY_MS = 24 * 60 * 60 * 1000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _base36(value, width):
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, len(DIGITS))
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits))
+
+
+# -----------------------------
+# Worker id
+# -----------------------------
+
+class _Worker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.worker_id = None
+        self.lock_file = None
+        self.last_ms = 0
+        self.sequence = 0
+
+
+_worker = _Worker()
+
+
+def _lock_dir():
+    return current_app.config.get('WORKER_LOCK_DIR') or os.path.join(current_app.root_path, 'database')
+
+
+def _claim_slot(slots):
+    """Hold the first free ``worker-<n>.lock`` below ``slots``; returns ``(slot, open file)``."""
+    if fcntl is None:
+        return os.getpid() % slots, None
+    directory = _lock_dir()
+    os.makedirs(directory, exist_ok=True)
+    for slot in range(slots):
+        lock_file = open(os.path.join(directory, f'worker-{slot}.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return slot, lock_file
+    raise RuntimeError(f'All {slots} worker slots are taken')
+
+
+def _base_worker_id():
+    configured = os.environ.get('WORKER_ID') or current_app.config.get('WORKER_ID')
+    base = int(configured) if configured is not None else 0
+    if not 0 <= base < MAX_WORKERS:
+        raise ValueError(f'WORKER_ID must be between 0 and {MAX_WORKERS - 1}')
+    return base
+
+
+def worker_id():
+    """This process's worker id, claimed on first use."""
+    with _worker.lock:
+        return _worker_id()
+
+
+def _worker_id():
+    # A forked worker must not reuse its parent's id
+    if _worker.pid != os.getpid():
+        base = _base_worker_id()
+        slot, lock_file = _claim_slot(MAX_WORKERS - base)
+        _worker.pid = os.getpid()
+        _worker.worker_id = base + slot
+        _worker.lock_file = lock_file
+        _worker.last_ms = 0
+        _worker.sequence = 0
+    return _worker.worker_id
+
+
+# -----------------------------
+# Generators
+# -----------------------------
+
+def generate_order_number():
+    """A unique order number that sorts by creation time.
+
+    Must run inside an application context.
+    """
+    with _worker.lock:
+        worker = _worker_id()
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _worker.last_ms:
+            _worker.last_ms = now_ms
+            _worker.sequence = 0
+        else:
+            # Same millisecond, or the clock stepped back
+            _worker.sequence += 1
+            if _worker.sequence == MAX_SEQUENCE:
+                _worker.last_ms += 1
+                _worker.sequence = 0
+        stamp_ms, sequence = _worker.last_ms, _worker.sequence
+
+    day = (_EPOCH + timedelta(milliseconds=stamp_ms)).strftime('%Y%m%d')
+    return (
+        f'{PREFIX}-{day}-{_base36(stamp_ms % _DAY_MS, TIME_WIDTH)}'
+        f'{_base36(worker, WORKER_WIDTH)}{_base36(sequence, SEQUENCE_WIDTH)}'
+    )
+
+
+def generate_pickup_code():
+    """A random 6-digit pickup code."""
+    return f'{secrets.randbelow(PICKUP_CODE_SPACE):0{PICKUP_CODE_DIGITS}d}'
+
+
+def assign_pickup_code(order):
+    """Give the flushed ``order`` a pickup code no other open order holds.
+
+    Each attempt flushes inside a savepoint, so a clash on
+    ``ix_orders_open_pickup_code`` only undoes the code.
+    """
+    for _ in range(PICKUP_CODE_ATTEMPTS):
+        try:
+            with db.session.begin_nested():
+                order.pickup_code = generate_pickup_code()
+                db.session.flush()
+            return order.pickup_code
+        except IntegrityError:
+            continue
+    raise RuntimeError('No free pickup code found')
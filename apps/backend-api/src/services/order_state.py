@@ -0,0 +1,285 @@
+"""Order status state machine.
+
+``TRANSITIONS`` lists, for every ``OrderStatus``, the statuses an order may
+move to next; delivered and cancelled orders are final. ``ROLE_STATUSES``
+lists the statuses each role may move an order it is party to into.
+Steps in ``PICKUP_ONLY`` are further limited to pickup orders.
+``transition`` is the only place that changes ``Order.status``. It stamps
+the matching tracking column and appends an ``OrderEvent`` row to the
+caller's transaction, so the event is committed together with the change.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from src.models.models import DeliveryType, Order, OrderEvent, OrderStatus, Rider, UserRole, Vendor, db
+from src.models.serializers import row_select
+from src.services.post_commit import defer_increment
+
+S = OrderStatus
+
+TRANSITIONS = {
+    S.PENDING: {S.CONFIRMED, S.PREPARING, S.CANCELLED},
+    S.CONFIRMED: {S.PREPARING, S.READY_FOR_PICKUP, S.CANCELLED},
+    S.PREPARING: {S.READY_FOR_PICKUP, S.CANCELLED},
+    # Pickup orders go straight from ready to delivered when collected
+    S.READY_FOR_PICKUP: {S.OUT_FOR_DELIVERY, S.DELIVERED, S.CANCELLED},
+    S.OUT_FOR_DELIVERY: {S.DELIVERED},
+    S.DELIVERED: set(),
+    S.CANCELLED: set(),
+}
+
+# Collected by the buyer: a delivery order must go out for delivery first
+PICKUP_ONLY = {(S.READY_FOR_PICKUP, S.DELIVERED)}
+
+ROLE_STATUSES = {
+    UserRole.ADMIN: set(OrderStatus),
+    UserRole.VENDOR: {S.CONFIRMED, S.PREPARING, S.READY_FOR_PICKUP},
+    UserRole.RIDER: {S.OUT_FOR_DELIVERY, S.DELIVERED},
+    UserRole.BUYER: {S.CANCELLED},
+}
+
+# Buyers may only cancel before the vendor accepts the order
+BUYER_CANCELLABLE = {S.PENDING}
+
+# Tracking column stamped when an order enters a status
+TIMESTAMP_COLUMNS = {
+    S.PREPARING: 'preparation_started_at',
+    S.READY_FOR_PICKUP: 'ready_for_pickup_at',
+    S.OUT_FOR_DELIVERY: 'out_for_delivery_at',
+    S.DELIVERED: 'delivered_at',
+}
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code=409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS[from_status]
+
+
+def party_check(user):
+    """Predicate over orders (or order rows) that ``user`` acts on in their role.
+
+    Resolves the user's vendor or rider profile once, for checking many orders.
+    """
+    if user.role == UserRole.ADMIN:
+        return lambda order: True
+    if user.role == UserRole.VENDOR:
+        vendor = Vendor.query.filter_by(user_id=user.id).first()
+        return lambda order: vendor is not None and order.vendor_id == vendor.id
+    if user.role == UserRole.RIDER:
+        rider = Rider.query.filter_by(user_id=user.id).first()
+        return lambda order: rider is not None and order.rider_id == rider.id
+    return lambda order: order.customer_id == user.id
+
+
+def is_party(user, order):
+    """Whether ``user`` acts on ``order`` in their role (admins always do)."""
+    return party_check(user)(order)
+
+
+def check_transition(user, order, to_status, is_party_to=None):
+    """Raise ``TransitionError`` unless ``user`` may move ``order`` to ``to_status``.
+
+    Returns ``False`` when the order already has that status, so there is
+    nothing to change. ``is_party_to`` is a ``party_check(user)`` predicate
+    to reuse across orders.
+    """
+    is_party_to = is_party_to or party_check(user)
+    if not is_party_to(order) or to_status not in ROLE_STATUSES.get(user.role, ()):
+        raise TransitionError('Access denied or invalid status transition', 403)
+    if order.status == to_status:
+        return False
+    if user.role == UserRole.BUYER and order.status not in BUYER_CANCELLABLE:
+        raise TransitionError('Access denied or invalid status transition', 403)
+    if not can_transition(order.status, to_status) or (
+        (order.status, to_status) in PICKUP_ONLY and order.delivery_type != DeliveryType.PICKUP
+    ):
+        raise TransitionError(
+            f'Cannot change order status from {order.status.value} to {to_status.value}'
+        )
+    return True
+
+
+def record_event(order, from_status, to_status, actor_id=None, at=None):
+    """Add the ``OrderEvent`` for a status change to the session."""
+    event = OrderEvent(
+        order_id=order.id,
+        vendor_id=order.vendor_id,
+        customer_id=order.customer_id,
+        rider_id=order.rider_id,
+        from_status=from_status,
+        to_status=to_status,
+        actor_id=actor_id,
+        created_at=at or datetime.utcnow()
+    )
+    db.session.add(event)
+    return event
+
+
+def count_delivery(order):
+    """Bump the vendor's and rider's delivery counters once the transaction commits.
+
+    The increments are batched with other deliveries' by a background
+    flusher, so the status change does not also write the vendor row.
+    """
+    defer_increment(Vendor, order.vendor_id, 'total_orders')
+    if order.rider_id is not None:
+        defer_increment(Rider, order.rider_id, 'total_deliveries', 'successful_deliveries')
+
+
+def transition(order, to_status, actor_id=None):
+    """Move ``order`` to ``to_status`` and log it; the caller commits.
+
+    The transition must already be checked. Returns the ``OrderEvent``.
+    """
+    now = datetime.utcnow()
+    from_status = order.status
+    order.status = to_status
+    column = TIMESTAMP_COLUMNS.get(to_status)
+    if column is not None:
+        setattr(order, column, now)
+    if to_status == S.DELIVERED:
+        order.payment_status = 'completed'
+        count_delivery(order)
+    order.updated_at = now
+    return record_event(order, from_status, to_status, actor_id, now)
+
+
+# -----------------------------
+# Bulk transitions
+# -----------------------------
+
+MAX_BULK_UPDATES = 200
+
+
+def bulk_transition(user, entries):
+    """Apply many ``{"order_id", "status"}`` changes with set-based updates.
+
+    Every entry is checked like ``check_transition``. Valid changes are
+    applied with one conditional UPDATE per (from, to) status pair, so an
+    order another request moved in the meantime is reported, not overwritten.
+    Returns ``(results, events)``: one result per entry in request order and
+    the ``OrderEvent`` rows added. The caller commits.
+    """
+    results = [None] * len(entries)
+    wanted = {}
+    for index, entry in enumerate(entries):
+        order_id = entry.get('order_id') if isinstance(entry, dict) else None
+        try:
+            to_status = OrderStatus(entry.get('status')) if isinstance(entry, dict) else None
+        except ValueError:
+            to_status = None
+        if not isinstance(order_id, int) or isinstance(order_id, bool) or to_status is None:
+            results[index] = {
+                'index': index, 'status': 'error', 'errors': ['order_id and a valid status are required']
+            }
+        elif order_id in wanted:
+            results[index] = {'index': index, 'status': 'error', 'errors': ['Duplicate update for order']}
+        else:
+            wanted[order_id] = (index, to_status)
+
+    orders = {
+        row.id: row for row in db.session.execute(
+            select(
+                Order.id, Order.status, Order.delivery_type, Order.vendor_id, Order.customer_id,
+                Order.rider_id
+            )
+            .where(Order.id.in_(list(wanted)))
+        )
+    } if wanted else {}
+
+    is_party_to = party_check(user)
+    groups = {}
+    for order_id, (index, to_status) in wanted.items():
+        order = orders.get(order_id)
+        result = {'index': index, 'order_id': order_id}
+        try:
+            if order is None:
+                raise TransitionError('Order not found', 404)
+            if check_transition(user, order, to_status, is_party_to):
+                groups.setdefault((order.status, to_status), []).append(order_id)
+                continue
+            result.update(status='unchanged', order_status=to_status.value)
+        except TransitionError as e:
+            result.update(status='error', errors=[str(e)], code=e.status_code)
+        results[index] = result
+
+    now = datetime.utcnow()
+    events = []
+    for (from_status, to_status), order_ids in groups.items():
+        values = {'status': to_status, 'updated_at': now}
+        column = TIMESTAMP_COLUMNS.get(to_status)
+        if column is not None:
+            values[column] = now
+        if to_status == S.DELIVERED:
+            values['payment_status'] = 'completed'
+        # Only orders still in from_status move; RETURNING says which did
+        moved = set(db.session.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.status == from_status)
+            .values(**values)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        for order_id in order_ids:
+            index, _ = wanted[order_id]
+            if order_id not in moved:
+                results[index] = {
+                    'index': index, 'order_id': order_id, 'status': 'error', 'code': 409,
+                    'errors': ['Order status changed by another request'],
+                }
+                continue
+            order = orders[order_id]
+            events.append(record_event(order, from_status, to_status, user.id, now))
+            if to_status == S.DELIVERED:
+                count_delivery(order)
+            results[index] = {
+                'index': index, 'order_id': order_id, 'status': 'updated',
+                'from_status': from_status.value, 'order_status': to_status.value,
+            }
+
+    db.session.flush()
+    return results, events
+
+
+# -----------------------------
+# Reading the event log
+# -----------------------------
+
+DEFAULT_EVENT_LIMIT = 100
+MAX_EVENT_LIMIT = 500
+
+
+def _visible(user, stmt):
+    if user.role == UserRole.ADMIN:
+        return stmt
+    if user.role == UserRole.VENDOR:
+        vendor = Vendor.query.filter_by(user_id=user.id).first()
+        return stmt.where(OrderEvent.vendor_id == vendor.id) if vendor else None
+    if user.role == UserRole.RIDER:
+        rider = Rider.query.filter_by(user_id=user.id).first()
+        if rider is None:
+            return None
+        # Riders follow the orders assigned to them, including earlier events
+        return stmt.where(OrderEvent.order_id.in_(
+            select(Order.id).where(Order.rider_id == rider.id)
+        ))
+    return stmt.where(OrderEvent.customer_id == user.id)
+
+
+def events_since(user, since_id=0, limit=DEFAULT_EVENT_LIMIT, order_id=None):
+    """Events ``user`` may see after ``since_id``, oldest first, serialized."""
+    stmt, serialize = row_select(OrderEvent)
+    stmt = _visible(user, stmt)
+    if stmt is None:
+        return []
+    if order_id is not None:
+        stmt = stmt.where(OrderEvent.order_id == order_id)
+    stmt = stmt.where(OrderEvent.id > since_id).order_by(OrderEvent.id).limit(limit)
+    return [serialize(row) for row in db.session.execute(stmt)]
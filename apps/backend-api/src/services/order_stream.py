@@ -0,0 +1,195 @@
+"""Live order updates over Server-Sent Events.
+
+Routes publish to an in-process broker after they commit: status changes
+as their ``OrderEvent`` dicts, rider assignments as ``rider_assigned``
+messages. Each open stream subscribes with a filter for the orders its user
+may see. Rider assignments are forwarded as they arrive.
+
+Status events are always sent from ``order_events``, in id order, with
+their id as the SSE ``id``; a published status change only wakes the
+stream to read the table past the last id it sent. Post-commit publishes
+can arrive out of id order, and events committed by other workers are
+never published here, so moving the cursor to a published id could skip
+an earlier event for good. SQLite serializes writers, so ids become
+visible in order and a read from the cursor never skips a row. A client
+that reconnects with ``Last-Event-ID`` (or ``?last_event_id=``) resumes
+from that id the same way. Other worker processes have their own brokers,
+so a stream also reads the table every ``ORDER_STREAM_POLL_INTERVAL``
+seconds. A
+comment line goes out every ``ORDER_STREAM_HEARTBEAT`` seconds to keep
+proxies from closing an idle stream. After ``ORDER_STREAM_MAX_AGE`` seconds
+the stream ends and the browser's ``EventSource`` reconnects and resumes.
+"""
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import func, select
+
+from src.models.models import OrderEvent, Rider, User, UserRole, Vendor, db
+from src.services.order_state import MAX_EVENT_LIMIT, events_since
+
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_MAX_AGE = 300.0
+RETRY_MS = 3000
+QUEUE_SIZE = 256
+
+
+class _Subscriber:
+    def __init__(self, match):
+        self.match = match
+        self.queue = queue.Queue(QUEUE_SIZE)
+        # Set when messages were dropped; the stream then re-reads the table
+        self.lagging = False
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def publish(self, messages):
+        """Hand ``(kind, data)`` messages to every subscriber whose filter matches."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for message in messages:
+                if not subscriber.match(message[1]):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    subscriber.lagging = True
+
+    @contextmanager
+    def subscribe(self, match):
+        subscriber = _Subscriber(match)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+broker = Broker()
+
+
+def publish_events(events):
+    """Publish committed ``OrderEvent`` rows."""
+    broker.publish([('status', event.to_dict()) for event in events])
+
+
+def publish_rider_assigned(order):
+    """Publish a committed rider assignment for ``order``."""
+    broker.publish([('rider_assigned', {
+        'order_id': order.id,
+        'vendor_id': order.vendor_id,
+        'customer_id': order.customer_id,
+        'rider_id': order.rider_id,
+    })])
+
+
+# -----------------------------
+# Streams
+# -----------------------------
+
+def _format(kind, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {kind}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def subscriber_filter(user, order_id=None):
+    """Predicate over published messages for what ``user`` may see, or ``None``."""
+    if user.role == UserRole.ADMIN:
+        key, value = None, None
+    elif user.role == UserRole.VENDOR:
+        vendor = Vendor.query.filter_by(user_id=user.id).first()
+        if vendor is None:
+            return None
+        key, value = 'vendor_id', vendor.id
+    elif user.role == UserRole.RIDER:
+        rider = Rider.query.filter_by(user_id=user.id).first()
+        if rider is None:
+            return None
+        key, value = 'rider_id', rider.id
+    else:
+        key, value = 'customer_id', user.id
+
+    def match(data):
+        if order_id is not None and data['order_id'] != order_id:
+            return False
+        return key is None or data.get(key) == value
+    return match
+
+
+def latest_event_id():
+    return db.session.execute(select(func.max(OrderEvent.id))).scalar() or 0
+
+
+def order_stream(app, user_id, match, last_event_id, order_id=None):
+    """Generator of SSE text for one subscriber.
+
+    Runs outside the request; each database read opens its own application
+    context so no session is held while the stream waits.
+    """
+    config = app.config
+    heartbeat = config.get('ORDER_STREAM_HEARTBEAT', DEFAULT_HEARTBEAT)
+    poll_interval = config.get('ORDER_STREAM_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    max_age = config.get('ORDER_STREAM_MAX_AGE', DEFAULT_MAX_AGE)
+
+    def catch_up(since_id):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            while True:
+                events = events_since(user, since_id, MAX_EVENT_LIMIT, order_id)
+                for event in events:
+                    yield event
+                if len(events) < MAX_EVENT_LIMIT:
+                    return
+                since_id = events[-1]['id']
+
+    with broker.subscribe(match) as subscriber:
+        yield f'retry: {RETRY_MS}\n\n'
+        last_id = last_event_id
+        for event in catch_up(last_id):
+            last_id = event['id']
+            yield _format('status', event, last_id)
+
+        started = last_poll = last_sent = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - started >= max_age:
+                return
+            timeout = min(heartbeat - (now - last_sent), poll_interval - (now - last_poll))
+            try:
+                messages = [subscriber.queue.get(timeout=max(timeout, 0))]
+            except queue.Empty:
+                messages = []
+            while True:
+                try:
+                    messages.append(subscriber.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            chunks = [_format(kind, data) for kind, data in messages if kind != 'status']
+            woken = any(kind == 'status' for kind, _ in messages)
+
+            now = time.monotonic()
+            if woken or subscriber.lagging or now - last_poll >= poll_interval:
+                subscriber.lagging = False
+                last_poll = now
+                for event in catch_up(last_id):
+                    last_id = event['id']
+                    chunks.append(_format('status', event, last_id))
+
+            if not chunks and now - last_sent >= heartbeat:
+                chunks.append(': heartbeat\n\n')
+            if chunks:
+                last_sent = now
+                yield ''.join(chunks)
@@ -0,0 +1,235 @@
+"""Keyset (cursor) pagination.
+
+``page``/``per_page`` pagination runs an OFFSET query plus a ``COUNT(*)`` on
+every call, and both get slower the deeper the page. Keyset pagination
+instead remembers the sort key of the last row it returned and asks for the
+rows after it, which an index on the sort key answers directly.
+
+Cursors are opaque base64 tokens holding the sort-key values of the
+boundary row and the direction to read in.
+"""
+import base64
+import json
+from datetime import datetime
+
+import math
+
+from flask import request
+from sqlalchemy import Select, and_, func, or_, select, tuple_
+
+from src.models.models import Order, Product, User, db
+from src.services.cache import TTLCache
+
+MAX_PER_PAGE = 100
+
+# Newest first; the id breaks ties between rows created in the same instant.
+ORDER_KEYSET = [(Order.created_at, True), (Order.id, True)]
+PRODUCT_KEYSET = [(Product.created_at, True), (Product.id, True)]
+USER_KEYSET = [(User.created_at, True), (User.id, True)]
+
+# ?sort= options for /api/products, each backed by composite indexes on
+# products (see Product.__table_args__)
+PRODUCT_SORTS = {
+    'newest': PRODUCT_KEYSET,
+    'price_asc': [(Product.price, False), (Product.id, False)],
+    'price_desc': [(Product.price, True), (Product.id, True)],
+    'featured': [(Product.is_featured, True), (Product.created_at, True), (Product.id, True)],
+}
+
+# Totals are optional in cursor mode; when asked for they are cached briefly
+# so paging through one listing does not re-run the COUNT on every page.
+_count_cache = TTLCache(maxsize=512, ttl=30)
+
+
+def cursor_requested():
+    """Cursor mode is selected by passing ``cursor`` (empty for the first page)."""
+    return 'cursor' in request.args
+
+
+def parse_sort(sorts):
+    """Keys for ``?sort=`` from ``sorts``, or ``None`` when not given."""
+    value = request.args.get('sort')
+    if not value:
+        return None
+    if value not in sorts:
+        raise ValueError(f"sort must be one of: {', '.join(sorts)}")
+    return sorts[value]
+
+
+def sort_order(keys):
+    """ORDER BY clauses for ``keys`` in their natural direction."""
+    return _order_by(keys, True)
+
+
+def total_requested():
+    return request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = {'v': [_encode_value(v) for v in values], 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, key_count):
+    """Return ``(values, direction)``; raises ``ValueError`` for bad tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(v) for v in payload['v']]
+        direction = payload['d']
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if direction not in ('next', 'prev') or len(values) != key_count:
+        raise ValueError('Invalid cursor')
+    return values, direction
+
+
+def _after(keys, values, forward):
+    """Filter selecting rows strictly after ``values`` in sort order.
+
+    ``forward=False`` selects rows strictly before them instead.
+    """
+    descending = [desc != (not forward) for _, desc in keys]
+    columns = [column for column, _ in keys]
+    if all(descending) or not any(descending):
+        # Uniform direction: a row-value comparison is a single index range.
+        if descending[0]:
+            return tuple_(*columns) < tuple_(*values)
+        return tuple_(*columns) > tuple_(*values)
+
+    clauses = []
+    for i, (column, desc) in enumerate(zip(columns, descending)):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if desc else column > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def _order_by(keys, forward):
+    order = []
+    for column, desc in keys:
+        if desc == forward:
+            order.append(column.desc())
+        else:
+            order.append(column.asc())
+    return order
+
+
+def _key_values(item, keys):
+    return [getattr(item, column.key) for column, _ in keys]
+
+
+# Helpers below accept either a legacy ``Query`` or a Core ``Select`` of
+# columns (which yields plain rows instead of ORM objects).
+
+def _all(query):
+    if isinstance(query, Select):
+        return db.session.execute(query).all()
+    return query.all()
+
+
+def _count(query):
+    if isinstance(query, Select):
+        return db.session.execute(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ).scalar()
+    return query.order_by(None).count()
+
+
+def cached_count(query):
+    """COUNT for ``query``, cached per statement and parameters."""
+    statement = query.order_by(None)
+    if not isinstance(statement, Select):
+        statement = statement.statement
+    compiled = statement.compile()
+    cache_key = (str(compiled), repr(sorted(compiled.params.items())))
+    total = _count_cache.get(cache_key)
+    if total is None:
+        total = _count(query)
+        _count_cache.set(cache_key, total)
+    return total
+
+
+class OffsetPage:
+    def __init__(self, items, total, page, per_page):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.pages = math.ceil(total / per_page) if total else 0
+
+
+def offset_paginate(query, page, per_page):
+    """``page``/``per_page`` pagination, as Flask-SQLAlchemy's ``paginate()``
+    with ``error_out=False``, for queries that yield rows."""
+    if page < 1:
+        page = 1
+    if per_page < 1:
+        per_page = 20
+    items = _all(query.limit(per_page).offset((page - 1) * per_page))
+    return OffsetPage(items, _count(query), page, per_page)
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor, per_page, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+        self.total = total
+
+    def meta(self):
+        meta = {
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'per_page': self.per_page,
+        }
+        if self.total is not None:
+            meta['total'] = self.total
+        return meta
+
+
+def keyset_paginate(query, keys, per_page, cursor=None, with_total=False):
+    """Paginate ``query`` by ``keys``, a list of ``(column, descending)``.
+
+    The last key must be unique (normally the primary key) so that every row
+    has a distinct position. Any existing ORDER BY on ``query`` is replaced.
+    Row queries must select the key columns.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    total = cached_count(query) if with_total else None
+
+    direction = 'next'
+    page_query = query
+    if cursor:
+        values, direction = decode_cursor(cursor, len(keys))
+        page_query = page_query.filter(_after(keys, values, forward=direction == 'next'))
+
+    forward = direction == 'next'
+    rows = _all(page_query.order_by(None).order_by(*_order_by(keys, forward)).limit(per_page + 1))
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if not forward:
+        items.reverse()
+
+    next_cursor = prev_cursor = None
+    if items:
+        if (forward and has_more) or not forward:
+            next_cursor = encode_cursor(_key_values(items[-1], keys), 'next')
+        if (forward and cursor) or (not forward and has_more):
+            prev_cursor = encode_cursor(_key_values(items[0], keys), 'prev')
+
+    return KeysetPage(items, next_cursor, prev_cursor, per_page, total)
@@ -0,0 +1,140 @@
+"""Counter increments applied after commit, in batches.
+
+Delivering an order bumps ``Vendor.total_orders`` and the rider's delivery
+counters. Doing that inside the status-change transaction means every
+delivery for a vendor writes the same vendor row, and holds SQLite's write
+lock for longer. ``defer_increment`` instead records the increment on the
+session. Once the session commits, it moves to a per-process queue; if the
+session rolls back, it is dropped. A background thread applies the queue
+every ``COUNTER_FLUSH_INTERVAL`` seconds (0.25 by default), coalesced into
+one ``UPDATE ... CASE id`` per table and column set.
+
+Counters are bookkeeping, so a short delay is fine. Increments still queued
+when the process exits are flushed by an ``atexit`` hook. Cached responses
+that show the counters are invalidated once a flush commits.
+"""
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import case, event, update
+from sqlalchemy.orm import Session
+
+from src.models.models import db
+from src.services.response_cache import invalidate
+
+DEFAULT_FLUSH_INTERVAL = 0.25
+_SESSION_KEY = 'deferred_increments'
+
+# Response cache tags of the responses showing a table's counters
+COUNTER_TAGS = {
+    'vendors': lambda row_id: ('vendors', f'vendor:{row_id}'),
+    'riders': lambda row_id: (f'rider:{row_id}',),
+}
+
+
+def counter_increments(model, counts, *columns):
+    """``{column: column + CASE id ...}`` adding ``counts[id]`` to each column."""
+    increment = case(counts, value=model.id)
+    return {column: getattr(model, column) + increment for column in columns}
+
+
+class IncrementQueue:
+    """Committed increments waiting to be written: ``(model, columns) -> {id: n}``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._thread = None
+        self._app = None
+
+    def add(self, increments):
+        with self._lock:
+            for (model, columns, row_id), amount in increments.items():
+                self._pending[(model, columns)][row_id] += amount
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        return pending
+
+    def flush(self):
+        """Write everything queued; requeues it if the write fails."""
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            for (model, columns), counts in pending.items():
+                db.session.execute(
+                    update(model).where(model.id.in_(list(counts)))
+                    .values(**counter_increments(model, dict(counts), *columns))
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for (model, columns), counts in pending.items():
+                self.add({(model, columns, row_id): amount for row_id, amount in counts.items()})
+            raise
+        tags = {
+            tag
+            for (model, _), counts in pending.items() if model.__tablename__ in COUNTER_TAGS
+            for row_id in counts
+            for tag in COUNTER_TAGS[model.__tablename__](row_id)
+        }
+        if tags:
+            invalidate(*tags)
+
+    def start(self, app):
+        """Start this process's flusher thread once."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = app
+            self._thread = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = self._app.config.get('COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        while True:
+            time.sleep(interval)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self._app.logger.exception('Deferred counter flush failed; will retry')
+
+    def flush_at_exit(self):
+        if self._app is not None:
+            with self._app.app_context():
+                self.flush()
+
+
+_queue = IncrementQueue()
+atexit.register(_queue.flush_at_exit)
+
+
+def defer_increment(model, row_id, *columns, amount=1):
+    """Add ``amount`` to ``columns`` of ``model`` row ``row_id`` after this session commits."""
+    increments = db.session.info.setdefault(_SESSION_KEY, defaultdict(int))
+    increments[(model, tuple(columns), row_id)] += amount
+
+
+def flush_increments():
+    """Write queued increments now, e.g. before reading the counters back."""
+    _queue.flush()
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_committed(session):
+    increments = session.info.pop(_SESSION_KEY, None)
+    if increments:
+        _queue.add(increments)
+        _queue.start(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,151 @@
+"""Order pricing shared by ``POST /orders/quote`` and ``create_order``.
+
+A vendor's fee schedule (delivery fees, free-delivery threshold and
+preparation time) is cached per worker, stamped with the vendor's
+``updated_at``. Every quote reads that one column by primary key and
+reloads the schedule when it moved, so a fee change made through any
+worker applies to the next quote everywhere. A quote costs that lookup,
+the cached schedule and one batched product lookup.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from src.models.models import DeliveryType, Vendor, db
+from src.services.cache import TTLCache
+from src.services.inventory import load_order_products, order_quantities
+
+SERVICE_FEE_RATE = 0.05
+# Local hours (inclusive) charged the vendor's peak delivery fee
+PEAK_HOURS = range(17, 21)
+DELIVERY_EXTRA_MINUTES = 30
+# Only bounds how long schedules of vendors no longer quoted stay in memory
+SCHEDULE_TTL = 300
+
+_schedules = TTLCache(maxsize=4096, ttl=SCHEDULE_TTL)
+
+
+class PricingError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FeeSchedule:
+    """The pricing-relevant columns of one vendor."""
+
+    __slots__ = (
+        'vendor_id', 'delivery_fee', 'peak_delivery_fee', 'free_delivery_threshold', 'preparation_time',
+        'updated_at'
+    )
+
+    def __init__(self, row):
+        self.vendor_id = row.id
+        self.updated_at = row.updated_at
+        self.delivery_fee = row.delivery_fee or 0.0
+        self.peak_delivery_fee = (
+            self.delivery_fee if row.peak_delivery_fee is None else row.peak_delivery_fee
+        )
+        self.free_delivery_threshold = row.free_delivery_threshold
+        self.preparation_time = row.preparation_time or 0
+
+    def delivery_fee_for(self, subtotal, at):
+        if self.free_delivery_threshold is not None and subtotal >= self.free_delivery_threshold:
+            return 0.0
+        return self.peak_delivery_fee if at.hour in PEAK_HOURS else self.delivery_fee
+
+
+def fee_schedule(vendor_id):
+    """The ``FeeSchedule`` for ``vendor_id``, or ``None`` if there is no such vendor."""
+    updated_at = db.session.execute(select(Vendor.updated_at).where(Vendor.id == vendor_id)).first()
+    if updated_at is None:
+        return None
+    schedule = _schedules.get(vendor_id)
+    if schedule is None or schedule.updated_at != updated_at[0]:
+        row = db.session.execute(
+            select(
+                Vendor.id, Vendor.delivery_fee, Vendor.peak_delivery_fee,
+                Vendor.free_delivery_threshold, Vendor.preparation_time, Vendor.updated_at
+            ).where(Vendor.id == vendor_id)
+        ).first()
+        if row is None:
+            return None
+        schedule = FeeSchedule(row)
+        _schedules.set(vendor_id, schedule)
+    return schedule
+
+
+class Quote:
+    """Priced lines and totals for a prospective order."""
+
+    def __init__(self, schedule, delivery_type, lines, products, quantities, discount_amount, at):
+        self.vendor_id = schedule.vendor_id
+        self.delivery_type = delivery_type
+        self.lines = lines
+        self.products = products
+        self.quantities = quantities  # {product id: total quantity}, for reserving stock
+        self.subtotal = sum(line['total_price'] for line in lines)
+        self.is_peak_time = at.hour in PEAK_HOURS
+        self.delivery_fee = (
+            schedule.delivery_fee_for(self.subtotal, at) if delivery_type == DeliveryType.DELIVERY else 0.0
+        )
+        self.service_fee = self.subtotal * SERVICE_FEE_RATE
+        self.discount_amount = discount_amount
+        self.total_amount = self.subtotal + self.delivery_fee + self.service_fee - discount_amount
+
+        prep_time = schedule.preparation_time
+        if delivery_type == DeliveryType.DELIVERY:
+            prep_time += DELIVERY_EXTRA_MINUTES
+        self.estimated_delivery_time = datetime.utcnow() + timedelta(minutes=prep_time)
+        self.free_delivery_threshold = schedule.free_delivery_threshold
+
+    def to_dict(self):
+        return {
+            'vendor_id': self.vendor_id,
+            'delivery_type': self.delivery_type.value,
+            'items': [
+                {**line, 'name': self.products[line['product_id']].name} for line in self.lines
+            ],
+            'subtotal': self.subtotal,
+            'delivery_fee': self.delivery_fee,
+            'service_fee': self.service_fee,
+            'discount_amount': self.discount_amount,
+            'total_amount': self.total_amount,
+            'is_peak_time': self.is_peak_time,
+            'free_delivery_threshold': self.free_delivery_threshold,
+            'estimated_delivery_time': self.estimated_delivery_time.isoformat()
+        }
+
+
+def quote_order(vendor_id, delivery_type, items, discount_amount=0, at=None):
+    """Price an order request.
+
+    ``items`` are the request's ``{"product_id", "quantity",
+    "special_instructions"}`` lines. Raises ``PricingError`` for an unknown
+    vendor or delivery type and ``StockError`` for bad or unavailable items.
+    Must run inside an application context.
+    """
+    schedule = fee_schedule(vendor_id)
+    if schedule is None:
+        raise PricingError('Vendor not found', 404)
+    try:
+        delivery_type = DeliveryType(delivery_type)
+    except ValueError:
+        raise PricingError(f'Invalid delivery_type: {delivery_type}')
+
+    quantities = order_quantities(items)
+    products = load_order_products(quantities)
+    lines = []
+    for item in items:
+        product = products[item['product_id']]
+        lines.append({
+            'product_id': product.id,
+            'quantity': item['quantity'],
+            'unit_price': product.price,
+            'total_price': product.price * item['quantity'],
+            'special_instructions': item.get('special_instructions')
+        })
+    # Peak hours follow the server's local clock
+    return Quote(
+        schedule, delivery_type, lines, products, quantities, discount_amount, at or datetime.now()
+    )
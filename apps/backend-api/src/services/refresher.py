@@ -0,0 +1,84 @@
+"""Background refresh of the per-worker in-memory indexes.
+
+The catalogue snapshot, the suggestion index and the product-matching index
+are built from the database. At 100k products a first build takes seconds,
+and even an incremental refresh can be slow after a bulk change, so none of
+that may run inside a request. Each index instead has an ``IndexRefresher``:
+a daemon thread that calls the index's refresh function every ``interval``
+seconds, and straight away when ``poke()``-ed (the response cache's
+invalidation hook pokes after this worker's writes). Requests read whatever
+the last refresh left behind, and fall back while the first one is running.
+
+Gunicorn starts every worker's threads from ``post_worker_init`` so the
+indexes are built before traffic reaches them; otherwise a thread starts on
+the index's first use. With ``BACKGROUND_INDEX_REFRESH`` off (the test
+suite) no thread is started and ``refresh_now()`` refreshes synchronously.
+"""
+import threading
+import time
+
+_refreshers = []
+
+
+class IndexNotReady(Exception):
+    """The index is still being built for the first time."""
+
+
+class IndexRefresher:
+    def __init__(self, name, refresh, interval_key, default_interval, min_interval=0.0):
+        self.name = name
+        self._refresh = refresh
+        self._interval_key = interval_key
+        self._default_interval = default_interval
+        # Pokes arriving faster than this are coalesced into one refresh
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._app = None
+        self.ready = False
+        _refreshers.append(self)
+
+    def start(self, app):
+        """Start this process's refresh thread once."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if not app.config.get('BACKGROUND_INDEX_REFRESH', True):
+            return
+        with self._lock:
+            # A thread started before a fork does not survive in the child
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = app
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def poke(self):
+        """Refresh as soon as possible; never blocks."""
+        self._wake.set()
+
+    def refresh_now(self):
+        """Run one refresh in the current application context."""
+        with self._run_lock:
+            self._refresh()
+            self.ready = True
+
+    def _run(self):
+        interval = self._app.config.get(self._interval_key, self._default_interval)
+        while True:
+            # Cleared first so a poke during the refresh triggers another one
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.refresh_now()
+                except Exception:
+                    self._app.logger.exception('%s refresh failed; will retry', self.name)
+            time.sleep(self._min_interval)
+            self._wake.wait(interval)
+
+
+def start_refreshers(app):
+    """Start every index's refresh thread, e.g. when a worker boots."""
+    for refresher in _refreshers:
+        refresher.start(app)
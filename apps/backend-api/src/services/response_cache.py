@@ -0,0 +1,291 @@
+"""Response cache with ETags for the public catalogue endpoints.
+
+Cached GET responses are keyed by endpoint, URL arguments and the
+normalized query string, and labelled with invalidation tags such as
+``product:12`` or ``vendor:3:products``. Tags that depend on what the view
+loaded (say the ``user:7`` whose profile a vendor response embeds) are added
+from inside the view with ``add_response_tags()``. A request whose ``If-None-Match``
+matches a cached entry is answered with 304 before the view runs, so it
+never touches the database. Writes call ``invalidate()`` with the tags
+they affect.
+
+The entries live in each worker process, but whether they are still
+current is shared: every tag hashes onto one of ``VERSION_SLOTS`` counters in
+a small file all workers map (``RESPONSE_CACHE_VERSIONS_PATH``, next to the
+database by default). ``invalidate()`` bumps the tags' counters, and an
+entry is only served, or confirmed with 304, while the counters it was built
+under are unchanged, so a write in one worker retires every worker's copy.
+Two tags sharing a counter only cost a spurious miss. Entries also expire
+after ``CATALOGUE_CACHE_TTL`` seconds, which bounds staleness from writers
+that do not share the file, such as another host.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, make_response, request
+
+from src.services.cache import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_AGE = 0
+VERSION_SLOTS = 4096
+
+_COUNTER = struct.Struct('<Q')
+
+_cache = TTLCache(maxsize=2048, ttl=DEFAULT_TTL)
+_tag_keys = {}
+_listeners = []
+_lock = threading.Lock()
+
+
+class _SharedVersions:
+    """Invalidation counters in a file every worker maps read-write."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._key = None
+
+    def _mapping(self):
+        # Reopened after a fork: flock does not exclude processes sharing a descriptor
+        key = (os.getpid(), _versions_path())
+        if self._key != key:
+            with self._lock:
+                if self._key != key:
+                    self._open(key[1])
+                    self._key = key
+        return self._map
+
+    def _open(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        size = VERSION_SLOTS * _COUNTER.size
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < size:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def snapshot(self):
+        """Every counter as of now; read versions out of it with ``of()``."""
+        return bytes(self._mapping())
+
+    def current(self):
+        return self._mapping()
+
+    @staticmethod
+    def of(counters, tags):
+        return tuple(_COUNTER.unpack_from(counters, _slot(tag) * _COUNTER.size)[0] for tag in tags)
+
+    def bump(self, tags):
+        counters = self._mapping()
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                for slot in {_slot(tag) for tag in tags}:
+                    offset = slot * _COUNTER.size
+                    _COUNTER.pack_into(counters, offset, _COUNTER.unpack_from(counters, offset)[0] + 1)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
+def _slot(tag):
+    return zlib.crc32(tag.encode()) % VERSION_SLOTS
+
+
+def _versions_path():
+    return current_app.config.get('RESPONSE_CACHE_VERSIONS_PATH') or os.path.join(
+        current_app.root_path, 'database', 'response-cache.versions'
+    )
+
+
+_versions = _SharedVersions()
+
+
+class _Entry:
+    __slots__ = ('body', 'etag', 'mimetype', 'tags', 'versions')
+
+    def __init__(self, body, etag, mimetype, tags, versions):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+        # Shared counters of ``tags`` when the view started
+        self.tags = tags
+        self.versions = versions
+
+    def current(self):
+        return _versions.of(_versions.current(), self.tags) == self.versions
+
+
+def _cache_key():
+    query = urlencode(sorted(request.args.items(multi=True)))
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    return (request.endpoint, view_args, query)
+
+
+def _cache_control():
+    max_age = current_app.config.get('CATALOGUE_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+    return f'public, max-age={max_age}, must-revalidate'
+
+
+def _not_modified(etag):
+    return request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag
+
+
+def _finish(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = _cache_control()
+    return response
+
+
+def _store(key, entry):
+    with _lock:
+        # Skip the store if a write invalidated one of our tags meanwhile.
+        if not entry.current():
+            return
+        _cache.set(key, entry, ttl=current_app.config.get('CATALOGUE_CACHE_TTL', DEFAULT_TTL))
+        for tag in entry.tags:
+            keys = _tag_keys.setdefault(tag, set())
+            keys.add(key)
+            if len(keys) > 2 * _cache.maxsize:
+                keys.intersection_update(k for k in list(keys) if _cache.get(k) is not None)
+
+
+def cached_response(tags):
+    """Cache a GET view's 200 responses under ``tags(**view_args)``."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = _cache_key()
+            entry = _cache.get(key)
+            if entry is not None and entry.current():
+                if _not_modified(entry.etag):
+                    return _finish(current_app.response_class(status=304), entry.etag)
+                return _finish(current_app.response_class(entry.body, mimetype=entry.mimetype), entry.etag)
+
+            started = _versions.snapshot()
+            g.response_tags = set(tags(**kwargs))
+
+            response = make_response(f(*args, **kwargs))
+            entry_tags = tuple(g.pop('response_tags'))
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            _store(key, _Entry(body, etag, response.mimetype, entry_tags, _versions.of(started, entry_tags)))
+
+            if _not_modified(etag):
+                return _finish(current_app.response_class(status=304), etag)
+            return _finish(response, etag)
+        return decorated
+    return decorator
+
+
+def add_response_tags(*tags):
+    """Label the response the current ``cached_response`` view returns with ``tags`` too."""
+    if 'response_tags' in g:
+        g.response_tags.update(tags)
+
+
+def invalidate(*tags):
+    """Drop every cached response carrying any of ``tags``, in every worker."""
+    _versions.bump(tags)
+    with _lock:
+        for tag in tags:
+            for key in _tag_keys.pop(tag, ()):
+                _cache.pop(key)
+    for listener in _listeners:
+        listener(tags)
+
+
+def add_invalidation_listener(listener):
+    """Call ``listener(tags)`` after every ``invalidate()`` in this process."""
+    _listeners.append(listener)
+
+
+def tag_versions(tags):
+    """Current version of each tag; changes whenever the tag is invalidated.
+
+    Lets other caches key derived data on the same invalidation events,
+    including those raised by other workers.
+    """
+    return _versions.of(_versions.current(), tags)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+        _tag_keys.clear()
+
+
+# -----------------------------
+# Tag conventions
+# -----------------------------
+
+def product_list_tags(vendor_id=None, category_id=None):
+    tags = ['products']
+    if vendor_id:
+        tags.append(f'vendor:{vendor_id}:products')
+    if category_id:
+        tags.append(f'category:{category_id}:products')
+    if not vendor_id and not category_id:
+        tags.append('products:all')
+    return tags
+
+
+def invalidate_product(product_id, vendor_id, category_id, *extra_category_ids):
+    """Invalidate everything that may embed or count the given product."""
+    tags = [
+        f'product:{product_id}', 'products:all',
+        f'vendor:{vendor_id}:products', f'category:{category_id}:products',
+        # vendor listings carry a product_count
+        'vendors', f'vendor:{vendor_id}',
+    ]
+    tags.extend(f'category:{cid}:products' for cid in extra_category_ids)
+    invalidate(*tags)
+
+
+def invalidate_vendor_products(vendor_id, category_ids):
+    """Invalidate after a bulk change to many of one vendor's products."""
+    tags = ['products:all', f'vendor:{vendor_id}:products', 'vendors', f'vendor:{vendor_id}']
+    tags.extend(f'category:{cid}:products' for cid in category_ids)
+    invalidate(*tags)
+
+
+def invalidate_products(products):
+    """Invalidate after a batch change to ``(id, vendor_id, category_id)`` products."""
+    tags = {'products:all', 'vendors'}
+    for product_id, vendor_id, category_id in products:
+        tags.update((
+            f'product:{product_id}', f'vendor:{vendor_id}:products',
+            f'category:{category_id}:products', f'vendor:{vendor_id}',
+        ))
+    invalidate(*tags)
+
+
+def invalidate_vendor(vendor_id):
+    """Invalidate a vendor's own responses and every product embedding it."""
+    invalidate('vendors', f'vendor:{vendor_id}', 'products')
+
+
+def invalidate_rider(rider_id):
+    """Invalidate responses embedding the rider, e.g. a vendor's assigned riders."""
+    invalidate(f'rider:{rider_id}')
+
+
+def invalidate_user(user_id):
+    """Invalidate responses embedding the user's profile, e.g. a vendor's owner."""
+    invalidate(f'user:{user_id}')
@@ -0,0 +1,94 @@
+"""Schema upkeep that ``db.create_all()`` does not cover."""
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+
+from src.models.models import db
+
+# Tables whose rows move to an archive table; ids stay unique across both
+ARCHIVE_TABLES = {'orders': 'orders_archive'}
+
+# Indexes replaced by differently defined ones; dropped where still present
+RETIRED_INDEXES = ('ix_products_low_stock',)
+
+
+def ensure_indexes():
+    """Create any index declared on the models that the database lacks.
+
+    ``create_all`` only emits indexes together with a new table, so indexes
+    added to an existing model would otherwise never reach a deployed
+    database. Indexes listed in ``RETIRED_INDEXES`` are dropped. Must run
+    inside an application context.
+    """
+    with db.engine.begin() as conn:
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def migrate_data(version, migrate):
+    """Run the one-off data migration ``migrate`` once per database.
+
+    On SQLite the migrations already applied are recorded in ``PRAGMA
+    user_version``, so ``migrate`` runs on the first start after it is added
+    and is skipped from then on; each new migration takes the next
+    ``version``. Elsewhere it runs on every start. Must run inside an
+    application context.
+    """
+    sqlite = db.engine.dialect.name == 'sqlite'
+    if sqlite:
+        with db.engine.connect() as conn:
+            if conn.execute(text('PRAGMA user_version')).scalar() >= version:
+                return
+    migrate()
+    if sqlite:
+        with db.engine.begin() as conn:
+            conn.execute(text(f'PRAGMA user_version = {int(version)}'))
+
+
+def _rebuild_with_autoincrement(conn, table):
+    # SQLite cannot add AUTOINCREMENT to a table: copy it into a new one,
+    # rows and ids included, and swap it in. Its indexes go with the old
+    # table; ensure_indexes() recreates them.
+    rebuilt = table.to_metadata(db.metadata, name=f'{table.name}_rebuild')
+    try:
+        conn.execute(CreateTable(rebuilt))
+    finally:
+        db.metadata.remove(rebuilt)
+    columns = ', '.join(column.name for column in table.columns)
+    conn.execute(text(f'INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}'))
+    conn.execute(text(f'DROP TABLE {table.name}'))
+    conn.execute(text(f'ALTER TABLE {rebuilt.name} RENAME TO {table.name}'))
+
+    ids = f'SELECT id FROM {table.name}'
+    if table.name in ARCHIVE_TABLES:
+        ids += f' UNION ALL SELECT id FROM {ARCHIVE_TABLES[table.name]}'
+    conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table.name})
+    conn.execute(
+        text(f'INSERT INTO sqlite_sequence (name, seq) SELECT :name, coalesce(max(id), 0) FROM ({ids})'),
+        {'name': table.name}
+    )
+
+
+def ensure_autoincrement():
+    """Rebuild tables declared ``sqlite_autoincrement`` that were created without it.
+
+    Without AUTOINCREMENT SQLite gives a new row ``max(id) + 1``, so once
+    the newest order is archived its id would be handed out again. The
+    rebuilt table's sequence starts past every id in it and its archive.
+    Must run inside an application context, after ``db.create_all()`` and
+    before ``ensure_indexes()``.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not table.dialect_options['sqlite']['autoincrement']:
+                continue
+            sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': table.name}
+            ).scalar()
+            if sql is not None and 'AUTOINCREMENT' not in sql.upper():
+                _rebuild_with_autoincrement(conn, table)
@@ -0,0 +1,121 @@
+"""Full-text product search backed by an SQLite FTS5 index.
+
+The ``products_fts`` virtual table is an external-content index over the
+``products`` table. Triggers keep it in sync with every INSERT, UPDATE and
+DELETE on ``products``, so the product routes do not need to maintain it by
+hand. On databases without FTS5 support search falls back to ``LIKE``.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import column, false, literal_column, select, table, text
+
+from src.models.models import Product, db
+
+FTS_TABLE = 'products_fts'
+FTS_COLUMNS = ('name', 'description', 'tags', 'origin_country', 'cultural_significance')
+
+# bm25() weights, in FTS_COLUMNS order: a hit in the name matters most.
+FTS_WEIGHTS = (10.0, 2.0, 5.0, 3.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _ddl():
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+    return [
+        f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {columns},
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON products BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+    ]
+
+
+def init_product_search():
+    """Create the FTS5 index and its sync triggers if they do not exist yet.
+
+    Must run inside an application context, after ``db.create_all()``.
+    A freshly created index is populated from the existing products.
+    """
+    enabled = False
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+            try:
+                statements = _ddl()
+                if exists:
+                    statements = statements[1:]
+                for statement in statements:
+                    conn.execute(text(statement))
+                if not exists:
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                enabled = True
+            except Exception:
+                # SQLite built without FTS5
+                enabled = False
+    current_app.extensions['product_search_fts'] = enabled
+
+
+def build_match_expression(search):
+    """Turn free text into an FTS5 query where every term is a prefix match.
+
+    Terms are quoted so user input can never inject FTS5 query syntax.
+    Returns ``None`` when the input has no searchable terms.
+    """
+    terms = _TOKEN_RE.findall(search.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def apply_product_search(query, search, order_by_relevance=True):
+    """Restrict a ``Product`` query to rows matching ``search``.
+
+    With FTS5 available the results are ordered by bm25 relevance (unless
+    ``order_by_relevance`` is False); otherwise a ``LIKE`` scan is used.
+
+    Matching rows are selected with ``products.id IN (... MATCH ...)``, so
+    the FTS query runs once whatever plan SQLite picks for ``products``. A
+    plain join would be flattened, and for a COUNT (no ORDER BY) SQLite may
+    then scan ``products`` and run the MATCH once per row. The bm25 ranks
+    are joined only for ordering, from a materialized CTE for the same reason.
+    """
+    if not current_app.extensions.get('product_search_fts'):
+        return query.filter(
+            Product.name.contains(search) |
+            Product.description.contains(search) |
+            Product.tags.contains(search)
+        )
+
+    match = build_match_expression(search)
+    if match is None:
+        return query.filter(false())
+
+    fts = table(FTS_TABLE, column('rowid'))
+    matches = text(f'{FTS_TABLE} MATCH :fts_match').bindparams(fts_match=match)
+    query = query.filter(Product.id.in_(select(fts.c.rowid).where(matches)))
+    if not order_by_relevance:
+        return query
+
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    ranks = select(
+        fts.c.rowid.label('product_id'),
+        literal_column(f'bm25({FTS_TABLE}, {weights})').label('rank')
+    ).where(matches).cte('product_matches').prefix_with('MATERIALIZED')
+    return query.join(ranks, ranks.c.product_id == Product.id).order_by(ranks.c.rank, Product.id)
@@ -0,0 +1,392 @@
+"""Memory-mapped catalogue snapshot shared by all worker processes.
+
+Active products, vendors and categories are written, already serialized, to
+one versioned file that every gunicorn worker maps read-only. The pages sit
+once in the OS page cache instead of once per worker as ORM objects, and a
+catalogue read is a binary search plus a ``json.loads``.
+
+File layout (little endian)::
+
+    header    magic, format, version, watermark, category signature,
+              (offset, count) of each section below
+    products  (id, blob offset, length) per active product, sorted by id
+    vendors   same, every vendor
+    categories same, every category
+    featured  positions into ``products`` of the featured products
+    blob      the JSON records
+
+Each worker's refresh thread (see ``refresher.py``) re-checks the database
+every ``CATALOGUE_SNAPSHOT_INTERVAL`` seconds, and straight after the
+worker's own writes (via the response cache's invalidation hook). When the
+newest ``updated_at`` is past the snapshot's watermark, one worker re-reads
+only the rows changed since then, writes a new file next to the old one and
+swaps it in with ``os.replace``; the others notice the new file and remap it.
+Requests keep reading the old mapping meanwhile. The exception is a worker
+that has just written: it reads the database until a refresh started after
+its write has finished, so it never serves, or caches, a page older than
+its own write.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from src.models.models import Category, Product, Vendor, db
+from src.models.serializers import row_select
+from src.services.pagination import OffsetPage
+from src.services.refresher import IndexRefresher
+from src.services.response_cache import add_invalidation_listener
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b'HOCS'
+FORMAT = 1
+SECTIONS = ('products', 'vendors', 'categories', 'featured')
+
+HEADER = struct.Struct('<4sIQqqq' + 'QQ' * len(SECTIONS))
+ENTRY = struct.Struct('<qQI')
+POSITION = struct.Struct('<I')
+
+DEFAULT_INTERVAL = 2.0
+# Writes arriving faster than this are folded into one rebuild; until it is
+# done the writing worker reads from the database.
+MIN_REBUILD_INTERVAL = 1.0
+# Rows committed slightly out of updated_at order are still picked up.
+WATERMARK_LAG = timedelta(seconds=5)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1) if value else 0
+
+
+def _datetime(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+class _Ids:
+    """Sequence view of one section's ids, for ``bisect``."""
+
+    def __init__(self, buf, offset, count):
+        self._buf = buf
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return ENTRY.unpack_from(self._buf, self._offset + index * ENTRY.size)[0]
+
+
+class CatalogueSnapshot:
+    """Read-only view of one snapshot file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+        header = HEADER.unpack_from(self._buf, 0)
+        if header[0] != MAGIC or header[1] != FORMAT:
+            raise ValueError(f'{path} is not a catalogue snapshot')
+        self.version = header[2]
+        self.watermark = header[3]
+        self.category_signature = (header[4], header[5])
+        bounds = header[6:]
+        self._sections = {
+            name: (bounds[2 * i], bounds[2 * i + 1]) for i, name in enumerate(SECTIONS)
+        }
+
+    # -- low level --
+
+    def _entry(self, section, index):
+        offset, _ = self._sections[section]
+        return ENTRY.unpack_from(self._buf, offset + index * ENTRY.size)
+
+    def _record(self, entry):
+        _, start, length = entry
+        return self._buf[start:start + length]
+
+    def _find(self, section, record_id):
+        offset, count = self._sections[section]
+        index = bisect.bisect_left(_Ids(self._buf, offset, count), record_id)
+        if index < count:
+            entry = self._entry(section, index)
+            if entry[0] == record_id:
+                return json.loads(self._record(entry))
+        return None
+
+    def records(self, section):
+        """``{id: raw JSON bytes}`` for a section; used to rebuild."""
+        _, count = self._sections[section]
+        entries = (self._entry(section, i) for i in range(count))
+        return {entry[0]: self._record(entry) for entry in entries}
+
+    def featured_ids(self):
+        offset, count = self._sections['featured']
+        return {
+            self._entry('products', POSITION.unpack_from(self._buf, offset + i * POSITION.size)[0])[0]
+            for i in range(count)
+        }
+
+    # -- lookups --
+
+    def product(self, product_id):
+        """Serialized active product, or ``None``."""
+        return self._find('products', product_id)
+
+    def vendor(self, vendor_id):
+        return self._find('vendors', vendor_id)
+
+    def category(self, category_id):
+        return self._find('categories', category_id)
+
+    def categories(self):
+        """Active categories in id order."""
+        _, count = self._sections['categories']
+        categories = (json.loads(self._record(self._entry('categories', i))) for i in range(count))
+        return [category for category in categories if category['is_active']]
+
+    def expand_product(self, product, expand, fields=None):
+        """``product`` as ``serialize_product`` would return it."""
+        data = product if fields is None else {field: product[field] for field in fields}
+        if 'vendor' in expand:
+            data['vendor'] = self.vendor(product['vendor_id'])
+        if 'category' in expand:
+            data['category'] = self.category(product['category_id'])
+        return data
+
+    def product_page(self, page, per_page, featured=False):
+        """An ``OffsetPage`` of serialized active products in id order."""
+        if page < 1:
+            page = 1
+        if per_page < 1:
+            per_page = 20
+        if featured:
+            offset, total = self._sections['featured']
+            start = (page - 1) * per_page
+            positions = [
+                POSITION.unpack_from(self._buf, offset + i * POSITION.size)[0]
+                for i in range(start, min(start + per_page, total))
+            ]
+        else:
+            _, total = self._sections['products']
+            start = (page - 1) * per_page
+            positions = range(start, min(start + per_page, total))
+        items = [json.loads(self._record(self._entry('products', i))) for i in positions]
+        return OffsetPage(items, total, page, per_page)
+
+
+# -----------------------------
+# Building
+# -----------------------------
+
+def _signature():
+    """``(watermark, (category count, max category id))`` from the database."""
+    row = db.session.execute(select(
+        select(func.max(Product.updated_at)).scalar_subquery(),
+        select(func.max(Vendor.updated_at)).scalar_subquery(),
+        select(func.count(Category.id)).scalar_subquery(),
+        select(func.max(Category.id)).scalar_subquery(),
+    )).one()
+    return max(_micros(row[0]), _micros(row[1])), (row[2] or 0, row[3] or 0)
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(',', ':')).encode()
+
+
+def _changed_rows(model, since, active_only):
+    stmt, serialize = row_select(model)
+    if since is not None:
+        stmt = stmt.where(model.updated_at >= since)
+    elif active_only:
+        stmt = stmt.where(model.is_active == True)
+    return ((row, serialize(row)) for row in db.session.execute(stmt.order_by(model.id)))
+
+
+def _write(path, version, watermark, category_signature, products, vendors, categories, featured):
+    sections = [sorted(products.items()), sorted(vendors.items()), sorted(categories.items())]
+    positions = [i for i, (product_id, _) in enumerate(sections[0]) if product_id in featured]
+
+    offset = HEADER.size
+    bounds = []
+    for entries in sections:
+        bounds += [offset, len(entries)]
+        offset += len(entries) * ENTRY.size
+    bounds += [offset, len(positions)]
+    offset += len(positions) * POSITION.size
+
+    index = bytearray()
+    blob = []
+    for entries in sections:
+        for record_id, record in entries:
+            index += ENTRY.pack(record_id, offset, len(record))
+            blob.append(record)
+            offset += len(record)
+    for position in positions:
+        index += POSITION.pack(position)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, version, watermark, *category_signature, *bounds))
+        f.write(index)
+        f.writelines(blob)
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(path, previous=None):
+    """Write a new snapshot at ``path``, reusing ``previous`` where unchanged."""
+    watermark, category_signature = _signature()
+    if previous is not None:
+        products = previous.records('products')
+        vendors = previous.records('vendors')
+        featured = previous.featured_ids()
+        since = _datetime(previous.watermark) - WATERMARK_LAG
+        version = previous.version + 1
+    else:
+        products, vendors, featured = {}, {}, set()
+        since = None
+        version = 1
+
+    for row, record in _changed_rows(Product, since, active_only=True):
+        if row.is_active:
+            products[row.id] = _dumps(record)
+        else:
+            products.pop(row.id, None)
+        if row.is_active and row.is_featured:
+            featured.add(row.id)
+        else:
+            featured.discard(row.id)
+
+    for row, record in _changed_rows(Vendor, since, active_only=False):
+        vendors[row.id] = _dumps(record)
+
+    # Categories have no updated_at and are few; always reload them.
+    stmt, serialize = row_select(Category)
+    categories = {row.id: _dumps(serialize(row)) for row in db.session.execute(stmt)}
+
+    _write(path, version, watermark, category_signature, products, vendors, categories, featured)
+
+
+# -----------------------------
+# Per-worker access
+# -----------------------------
+
+class _State:
+    def __init__(self):
+        self.snapshot = None
+        # Invalidations seen in this worker, and how many of them the current
+        # snapshot is known to include
+        self.writes = 0
+        self.refreshed_writes = 0
+
+
+_state = _State()
+
+
+def _mark_stale(tags):
+    _state.writes += 1
+    _refresher.poke()
+
+
+add_invalidation_listener(_mark_stale)
+
+
+def _snapshot_path():
+    return current_app.config.get('CATALOGUE_SNAPSHOT_PATH') or os.path.join(
+        current_app.root_path, 'database', 'catalogue.snapshot'
+    )
+
+
+def _open(path):
+    try:
+        return CatalogueSnapshot(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+class _FileLock:
+    """Exclusive ``flock`` shared by the workers; a no-op without fcntl."""
+
+    def __init__(self, path):
+        self._path = f'{path}.lock'
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self._path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+
+
+def _refresh(path):
+    snapshot = _state.snapshot
+    if snapshot is None or _file_id(path) != snapshot.file_id:
+        snapshot = _open(path) or snapshot
+
+    watermark, category_signature = _signature()
+    if snapshot is not None and snapshot.watermark >= watermark and \
+            snapshot.category_signature == category_signature:
+        return snapshot
+
+    with _FileLock(path):
+        # Another worker may have rebuilt while we waited for the lock.
+        current = _open(path)
+        if current is not None and current.watermark >= watermark and \
+                current.category_signature == category_signature:
+            return current
+        build_snapshot(path, current)
+        return _open(path)
+
+
+def _refresh_snapshot():
+    if not current_app.config.get('CATALOGUE_SNAPSHOT', True):
+        return
+    writes = _state.writes
+    _state.snapshot = _refresh(_snapshot_path())
+    _state.refreshed_writes = writes
+
+
+_refresher = IndexRefresher(
+    'catalogue-snapshot', _refresh_snapshot, 'CATALOGUE_SNAPSHOT_INTERVAL', DEFAULT_INTERVAL,
+    min_interval=MIN_REBUILD_INTERVAL
+)
+
+
+def current_snapshot():
+    """This worker's snapshot, or ``None`` to read the database.
+
+    Never builds the snapshot itself: returns ``None`` until the refresh
+    thread has built one, and after this worker's writes until it has caught
+    up with them. Must run inside an application context.
+    """
+    if not current_app.config.get('CATALOGUE_SNAPSHOT', True):
+        return None
+    _refresher.start(current_app._get_current_object())
+    if _state.refreshed_writes != _state.writes:
+        return None
+    return _state.snapshot
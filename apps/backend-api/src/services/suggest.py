@@ -0,0 +1,305 @@
+"""In-memory prefix index for search-box suggestions.
+
+Product names, vendor business names and category names are normalized and
+kept in one sorted array of ``(key, entry)`` pairs. Every word of a name
+starts a key, so ``"ric"`` finds "Jollof Rice Spice Mix". A lookup bisects
+to the range of keys with the typed prefix and keeps the ``limit`` most
+popular entries in it. Entries are also bucketed by one- to three-character
+key prefixes in popularity order, which answers short prefixes, and long
+prefixes with huge ranges, without walking the range.
+
+Popularity is units sold for products, ``total_orders`` for vendors and the
+number of active products for categories.
+
+Each worker builds its own index on a background thread (see
+``refresher.py``); until the first build is done ``suggest`` raises
+``IndexNotReady``. After that the thread only re-reads products and vendors
+whose ``updated_at`` moved past the last refresh, every
+``SUGGEST_REFRESH_INTERVAL`` seconds and straight after a write in this
+worker, and recounts only the categories those products are in. Above
+``REPLACE_THRESHOLD`` changed rows (a bulk import, say) it rebuilds instead.
+"""
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from src.models.models import Category, OrderItem, Product, Vendor, db
+from src.services.refresher import IndexNotReady, IndexRefresher
+from src.services.response_cache import add_invalidation_listener
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+DEFAULT_REFRESH_INTERVAL = 5.0
+MAX_WORDS = 8
+# Entries are also bucketed by every key prefix up to this length, most
+# popular first, so short prefixes need no range scan.
+BUCKET_PREFIX_LENGTH = 3
+RANGE_SCAN_LIMIT = 256
+# Rows committed slightly out of updated_at order are still picked up.
+WATERMARK_LAG = timedelta(seconds=5)
+# Every incremental upsert shifts the sorted arrays, so past this many
+# changed rows a full rebuild is cheaper.
+REPLACE_THRESHOLD = 1000
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Lower case, accents stripped, punctuation collapsed to single spaces."""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(_NON_WORD.sub(' ', text.lower()).split())
+
+
+def _keys(text):
+    words = normalize(text).split()[:MAX_WORDS]
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # sorted (key, entry id)
+        self._buckets = {}  # short prefix -> [(rank, entry id)] most popular first
+        self._entries = {}  # entry id -> (text, rank, keys)
+        self.watermark = None
+        # Active product id -> category id, to know which counts a change moves
+        self.product_categories = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _prefixes(keys):
+        return {key[:length] for key in keys for length in range(1, BUCKET_PREFIX_LENGTH + 1)}
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        _, rank, keys = entry
+        for key in keys:
+            index = bisect.bisect_left(self._keys, (key, entry_id))
+            if index < len(self._keys) and self._keys[index] == (key, entry_id):
+                del self._keys[index]
+        for prefix in self._prefixes(keys):
+            bucket = self._buckets[prefix]
+            index = bisect.bisect_left(bucket, (rank, entry_id))
+            if index < len(bucket) and bucket[index] == (rank, entry_id):
+                del bucket[index]
+
+    def _put(self, entry_id, text, popularity):
+        self._remove(entry_id)
+        keys = _keys(text)
+        rank = (-popularity, len(text), text)
+        self._entries[entry_id] = (text, rank, keys)
+        for key in keys:
+            bisect.insort(self._keys, (key, entry_id))
+        for prefix in self._prefixes(keys):
+            bisect.insort(self._buckets.setdefault(prefix, []), (rank, entry_id))
+
+    def update(self, upserts=(), removals=()):
+        """Apply ``(kind, id, text, popularity)`` upserts and ``(kind, id)`` removals."""
+        with self._lock:
+            for entry_id in removals:
+                self._remove(entry_id)
+            for kind, entry_id, text, popularity in upserts:
+                self._put((kind, entry_id), text, popularity)
+
+    def replace(self, entries):
+        """Rebuild from ``(kind, id, text, popularity)`` tuples."""
+        keys = []
+        buckets = {}
+        built = {}
+        for kind, entry_id, text, popularity in entries:
+            entry_id = (kind, entry_id)
+            entry_keys = _keys(text)
+            rank = (-popularity, len(text), text)
+            built[entry_id] = (text, rank, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+            for prefix in self._prefixes(entry_keys):
+                buckets.setdefault(prefix, []).append((rank, entry_id))
+        keys.sort()
+        for bucket in buckets.values():
+            bucket.sort()
+        with self._lock:
+            self._keys = keys
+            self._buckets = buckets
+            self._entries = built
+
+    def _matches(self, prefix, limit):
+        if len(prefix) <= BUCKET_PREFIX_LENGTH:
+            # Every entry in the bucket matches; it is already in rank order
+            return [entry_id for _, entry_id in self._buckets.get(prefix, ())[:limit]]
+
+        low = bisect.bisect_left(self._keys, (prefix,))
+        high = bisect.bisect_left(self._keys, (prefix + '\U0010ffff',), low)
+        if high - low > RANGE_SCAN_LIMIT:
+            # Many matches: walk the short-prefix bucket in rank order and
+            # stop at the first ``limit`` that match the whole prefix.
+            found = []
+            for _, entry_id in self._buckets.get(prefix[:BUCKET_PREFIX_LENGTH], ()):
+                if any(key.startswith(prefix) for key in self._entries[entry_id][2]):
+                    found.append(entry_id)
+                    if len(found) == limit:
+                        break
+            return found
+
+        matched = {entry_id for _, entry_id in self._keys[low:high]}
+        return heapq.nsmallest(limit, matched, key=lambda entry_id: self._entries[entry_id][1])
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        """The ``limit`` most popular entries with a word starting with ``prefix``."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            return [
+                {'type': kind, 'id': entry_id, 'text': self._entries[(kind, entry_id)][0]}
+                for kind, entry_id in self._matches(prefix, limit)
+            ]
+
+
+# -----------------------------
+# Loading from the database
+# -----------------------------
+
+def _product_sales(product_ids=None):
+    query = select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id)
+    if product_ids is not None:
+        query = query.where(OrderItem.product_id.in_(product_ids))
+    return dict(db.session.execute(query).all())
+
+
+def _category_entries(category_ids=None):
+    """Category entries, for all active categories or just ``category_ids``."""
+    counts = select(Product.category_id, func.count()).where(Product.is_active == True)
+    categories = select(Category.id, Category.name).where(Category.is_active == True)
+    if category_ids is not None:
+        counts = counts.where(Product.category_id.in_(category_ids))
+        categories = categories.where(Category.id.in_(category_ids))
+    product_counts = dict(db.session.execute(counts.group_by(Product.category_id)).all())
+    rows = db.session.execute(categories).all()
+    return [('category', row.id, row.name, product_counts.get(row.id, 0)) for row in rows]
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def load(index):
+    """Fill ``index`` with every active product, vendor and category."""
+    watermark = _latest(
+        db.session.execute(select(func.max(Product.updated_at))).scalar(),
+        db.session.execute(select(func.max(Vendor.updated_at))).scalar(),
+    )
+    sales = _product_sales()
+    products = db.session.execute(
+        select(Product.id, Product.name, Product.category_id).where(Product.is_active == True)
+    ).all()
+    vendors = db.session.execute(
+        select(Vendor.id, Vendor.business_name, Vendor.total_orders).where(Vendor.is_active == True)
+    ).all()
+
+    entries = [('product', row.id, row.name, sales.get(row.id, 0)) for row in products]
+    entries += [('vendor', row.id, row.business_name, row.total_orders or 0) for row in vendors]
+    entries += _category_entries()
+    index.replace(entries)
+    index.product_categories = {row.id: row.category_id for row in products}
+    index.watermark = watermark
+
+
+def refresh(index, reload_categories=False):
+    """Apply product and vendor changes since ``index.watermark``."""
+    if index.watermark is None:
+        return load(index)
+
+    since = index.watermark - WATERMARK_LAG
+    products = db.session.execute(
+        select(Product.id, Product.name, Product.category_id, Product.is_active, Product.updated_at)
+        .where(Product.updated_at >= since)
+    ).all()
+    vendors = db.session.execute(
+        select(Vendor.id, Vendor.business_name, Vendor.is_active, Vendor.total_orders, Vendor.updated_at)
+        .where(Vendor.updated_at >= since)
+    ).all()
+    if not products and not vendors and not reload_categories:
+        return
+    if len(products) + len(vendors) > REPLACE_THRESHOLD:
+        return load(index)
+
+    sales = _product_sales([row.id for row in products]) if products else {}
+    upserts = [('product', row.id, row.name, sales.get(row.id, 0)) for row in products if row.is_active]
+    upserts += [
+        ('vendor', row.id, row.business_name, row.total_orders or 0) for row in vendors if row.is_active
+    ]
+    removals = [('product', row.id) for row in products if not row.is_active]
+    removals += [('vendor', row.id) for row in vendors if not row.is_active]
+    # A product moves the count of the category it left and the one it is in
+    touched = {index.product_categories.get(row.id) for row in products}
+    touched.update(row.category_id for row in products if row.is_active)
+    touched.discard(None)
+    for row in products:
+        if row.is_active:
+            index.product_categories[row.id] = row.category_id
+        else:
+            index.product_categories.pop(row.id, None)
+    if reload_categories:
+        upserts += _category_entries()
+    elif touched:
+        upserts += _category_entries(touched)
+    index.update(upserts, removals)
+    index.watermark = _latest(index.watermark, *(row.updated_at for row in products + vendors))
+
+
+# -----------------------------
+# Per-worker access
+# -----------------------------
+
+_index = SuggestIndex()
+_state = {'categories': False}
+
+
+def _refresh_index():
+    categories = _state['categories']
+    _state['categories'] = False
+    try:
+        refresh(_index, reload_categories=categories)
+    except Exception:
+        _state['categories'] = _state['categories'] or categories
+        raise
+
+
+_refresher = IndexRefresher(
+    'suggest-index', _refresh_index, 'SUGGEST_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL
+)
+
+
+def _mark_stale(tags):
+    if 'categories' in tags:
+        _state['categories'] = True
+    _refresher.poke()
+
+
+add_invalidation_listener(_mark_stale)
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    """Suggestions for ``prefix`` from this worker's index.
+
+    Raises ``IndexNotReady`` until the first build has finished. Must run
+    inside an application context.
+    """
+    _refresher.start(current_app._get_current_object())
+    if not _refresher.ready:
+        raise IndexNotReady('suggestion index')
+    return _index.search(prefix, max(1, min(limit, MAX_LIMIT)))
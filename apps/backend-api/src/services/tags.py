@@ -0,0 +1,141 @@
+"""Normalized product tags.
+
+``Product.tags`` keeps the JSON array exactly as the vendor supplied it, for
+output. Each product's tags are also stored as rows in ``tags`` and
+``product_tags`` so an exact tag filter is an index lookup rather than a
+substring scan over the JSON text.
+"""
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import delete, exists, func, insert, select
+
+from src.models.models import Product, ProductTag, Tag, db
+
+MAX_TAG_LENGTH = 100
+TAG_MODES = ('any', 'all')
+
+
+def normalize_tag(name):
+    return str(name).strip().lower()[:MAX_TAG_LENGTH]
+
+
+def parse_tags(value):
+    """Normalized, de-duplicated tag names from a stored or submitted value.
+
+    Accepts a list, a JSON array string, or a comma-separated string.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            decoded = value.split(',')
+        value = decoded if isinstance(decoded, list) else [decoded]
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+
+    names = []
+    for item in value:
+        if item is None or isinstance(item, (dict, list)):
+            continue
+        name = normalize_tag(item)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def tags_column_value(value):
+    """Value to store in ``Product.tags``; lists are kept as JSON text."""
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value))
+    return value
+
+
+def _tag_ids(names):
+    """Ids for ``names``, creating the missing tags."""
+    if not names:
+        return {}
+    names = list(names)
+    now = datetime.utcnow()
+    # OR IGNORE: a concurrent request may create the same tag
+    db.session.execute(
+        insert(Tag).prefix_with('OR IGNORE'),
+        [{'name': name, 'created_at': now} for name in names]
+    )
+    rows = db.session.execute(select(Tag.id, Tag.name).where(Tag.name.in_(names))).all()
+    return {row.name: row.id for row in rows}
+
+
+def set_product_tags(tags_by_product):
+    """Replace the indexed tags of each product in ``{product_id: tags}``.
+
+    Tags may be given in any form ``parse_tags`` accepts. The caller commits.
+    """
+    if not tags_by_product:
+        return
+    parsed = {product_id: parse_tags(tags) for product_id, tags in tags_by_product.items()}
+    ids = _tag_ids({name for names in parsed.values() for name in names})
+
+    db.session.execute(
+        delete(ProductTag).where(ProductTag.product_id.in_(list(parsed)))
+        .execution_options(synchronize_session=False)
+    )
+    links = [
+        {'product_id': product_id, 'tag_id': ids[name]}
+        for product_id, names in parsed.items() for name in names
+    ]
+    if links:
+        db.session.execute(insert(ProductTag), links)
+
+
+def backfill_product_tags(batch_size=500):
+    """Index the tags of products that have none in ``product_tags`` yet.
+
+    Covers rows written before the tag tables existed; run once per database
+    through ``migrate_data``. Products are read and committed ``batch_size``
+    at a time in id order. Must run inside an application context.
+    """
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Product.id, Product.tags)
+            .where(Product.id > last_id)
+            .where(Product.tags.isnot(None), Product.tags != '', Product.tags != '[]')
+            .where(~exists().where(ProductTag.product_id == Product.id))
+            .order_by(Product.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        set_product_tags({row.id: row.tags for row in rows})
+        db.session.commit()
+        last_id = rows[-1].id
+
+
+def parse_tag_filter():
+    """``(tags, mode)`` from ``?tag=a&tag=b`` (or ``tag=a,b``) and ``tag_mode=any|all``."""
+    tags = []
+    for value in request.args.getlist('tag'):
+        for name in value.split(','):
+            name = normalize_tag(name)
+            if name and name not in tags:
+                tags.append(name)
+    mode = request.args.get('tag_mode', 'any')
+    if mode not in TAG_MODES:
+        raise ValueError('tag_mode must be any or all')
+    return tags, mode
+
+
+def tag_filter(tags, mode='any'):
+    """Criterion matching products tagged with any or all of ``tags``."""
+    matches = (
+        select(ProductTag.product_id)
+        .join(Tag, Tag.id == ProductTag.tag_id)
+        .where(Tag.name.in_(tags))
+    )
+    if mode == 'all':
+        matches = matches.group_by(ProductTag.product_id).having(func.count() == len(tags))
+    return Product.id.in_(matches)
@@ -0,0 +1,109 @@
+"""Shared fixtures: the Flask app on a scratch SQLite database.
+
+The schema and the sample data from ``seed_data`` are built once per run.
+Every test then starts from a fresh copy of that database file, and the
+per-process caches are emptied so nothing leaks between tests.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+_SCRATCH = tempfile.mkdtemp(prefix='home-origin-tests-')
+_DB_PATH = os.path.join(_SCRATCH, 'app.db')
+_TEMPLATE_PATH = os.path.join(_SCRATCH, 'template.db')
+
+os.environ['DATABASE_URL'] = f'sqlite:///{_DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app as flask_app  # noqa: E402
+from src.models.models import User, db  # noqa: E402
+from src.routes.user import _generate_access_token  # noqa: E402
+from src.seed_data import create_sample_data  # noqa: E402
+from src.services import facets, pagination, pricing, response_cache, snapshot  # noqa: E402
+
+flask_app.config.update(
+    TESTING=True,
+    BACKGROUND_INDEX_REFRESH=False,
+    CATALOGUE_SNAPSHOT=False,
+    CATALOGUE_SNAPSHOT_PATH=os.path.join(_SCRATCH, 'catalogue.snapshot'),
+    RESPONSE_CACHE_VERSIONS_PATH=os.path.join(_SCRATCH, 'response-cache.versions'),
+    WORKER_LOCK_DIR=_SCRATCH,
+)
+
+
+@pytest.fixture(scope='session')
+def _template():
+    with flask_app.app_context():
+        create_sample_data()
+        db.session.remove()
+        db.engine.dispose()
+    shutil.copyfile(_DB_PATH, _TEMPLATE_PATH)
+    yield _TEMPLATE_PATH
+    shutil.rmtree(_SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def app(_template):
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    shutil.copyfile(_template, _DB_PATH)
+    response_cache.clear()
+    pagination._count_cache.clear()
+    facets._facet_cache.clear()
+    pricing._schedules.clear()
+    with flask_app.app_context():
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(app):
+    """``auth(username)`` -> request headers carrying that user's token."""
+    def headers(username):
+        user = User.query.filter_by(username=username).one()
+        return {'Authorization': f'Bearer {_generate_access_token(user)}'}
+    return headers
+
+
+@pytest.fixture
+def snapshots(app, monkeypatch, tmp_path):
+    """Serve catalogue reads from a snapshot at a scratch path; build it with ``_refresher.refresh_now()``."""
+    monkeypatch.setitem(app.config, 'CATALOGUE_SNAPSHOT', True)
+    monkeypatch.setitem(app.config, 'CATALOGUE_SNAPSHOT_PATH', str(tmp_path / 'catalogue.snapshot'))
+    monkeypatch.setattr(snapshot, '_state', snapshot._State())
+    return snapshot
+
+
+@pytest.fixture
+def explain(app):
+    """``explain(statement)`` -> SQLite's query plan, one detail string per step."""
+    def plan(statement):
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        return [row[3] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+    return plan
+
+
+@pytest.fixture
+def place_order(client, auth):
+    """``place_order(**overrides)`` -> a new pending order of mama_kemi's products, as a dict."""
+    def place(items=None, headers=None, **fields):
+        body = {
+            'vendor_id': 1,
+            'delivery_type': 'delivery',
+            'delivery_address': '1 Test Street',
+            'items': items or [{'product_id': 1, 'quantity': 2}],
+            **fields,
+        }
+        response = client.post('/api/orders', json=body, headers=headers or auth('john_buyer'))
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['order']
+    return place
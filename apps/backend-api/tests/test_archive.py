@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+from src.models.models import Order, OrderItem, OrderStatus, db, order_items_archive, orders_archive
+from src.services.archive import archive_orders
+
+
+def _age(order_id, days, status=OrderStatus.DELIVERED):
+    then = datetime.utcnow() - timedelta(days=days)
+    db.session.execute(
+        update(Order).where(Order.id == order_id).values(status=status, created_at=then, updated_at=then)
+    )
+    db.session.commit()
+
+
+def _count(table):
+    return db.session.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_only_old_closed_orders_move(app, place_order):
+    old, recent, open_old = place_order(), place_order(), place_order()
+    _age(old['id'], 120)
+    _age(recent['id'], 10)
+    _age(open_old['id'], 120, status=OrderStatus.PREPARING)
+
+    assert archive_orders() == 1
+
+    assert [o.id for o in Order.query.order_by(Order.id)] == [recent['id'], open_old['id']]
+    assert db.session.execute(select(orders_archive.c.id)).scalars().all() == [old['id']]
+    assert _count(order_items_archive) == 1
+    assert OrderItem.query.filter_by(order_id=old['id']).count() == 0
+
+
+def test_batches_stop_at_max_batches(app, place_order):
+    for _ in range(3):
+        _age(place_order()['id'], 120)
+
+    assert archive_orders(batch_size=1, max_batches=2) == 2
+    assert Order.query.count() == 1
+
+
+def test_reads_reach_the_archive_only_for_old_ranges(client, auth, place_order):
+    order = place_order()
+    _age(order['id'], 120)
+    archive_orders()
+    headers = auth('john_buyer')
+
+    assert client.get('/api/orders', headers=headers).get_json()['total'] == 0
+    since = (datetime.utcnow() - timedelta(days=200)).date().isoformat()
+    listed = client.get(f'/api/orders?date_from={since}&expand=items', headers=headers).get_json()
+    assert [o['id'] for o in listed['orders']] == [order['id']]
+    assert [item['product_id'] for item in listed['orders'][0]['items']] == [1]
+
+    single = client.get(f"/api/orders/{order['id']}", headers=headers)
+    assert single.status_code == 200
+    assert single.get_json()['order']['order_number'] == order['order_number']
+
+
+def test_archive_route_is_admin_only(client, auth):
+    assert client.post('/api/orders/archive', json={}, headers=auth('mama_kemi')).status_code == 403
+    response = client.post('/api/orders/archive', json={'max_batches': 0}, headers=auth('admin'))
+    assert response.status_code == 400
+
+
+def test_archiving_the_newest_order_does_not_free_its_id(client, auth, place_order):
+    older, newest = place_order(), place_order()
+    _age(newest['id'], 120)
+    archive_orders()
+
+    created = place_order()
+
+    assert created['id'] > newest['id']
+    since = (datetime.utcnow() - timedelta(days=200)).date().isoformat()
+    listed = client.get(f'/api/orders?date_from={since}', headers=auth('john_buyer')).get_json()
+    assert sorted(o['id'] for o in listed['orders']) == [older['id'], newest['id'], created['id']]
+
+
+def test_orders_inside_the_read_window_are_not_archived(client, auth, place_order):
+    order = place_order()
+    _age(order['id'], 3)
+
+    response = client.post('/api/orders/archive', json={'older_than_days': 1}, headers=auth('admin'))
+
+    assert response.status_code == 400
+    with pytest.raises(ValueError):
+        archive_orders(cutoff=datetime.utcnow() - timedelta(days=1))
+    since = (datetime.utcnow() - timedelta(days=4)).date().isoformat()
+    listed = client.get(f'/api/orders?date_from={since}', headers=auth('john_buyer')).get_json()
+    assert [o['id'] for o in listed['orders']] == [order['id']]
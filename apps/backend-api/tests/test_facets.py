@@ -0,0 +1,45 @@
+from collections import Counter
+
+import pytest
+
+from src.services.facets import PRICE_BUCKETS
+
+
+def _listing(client, query):
+    response = client.get(f'/api/products?{query}&facets=all&expand=&per_page=100')
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return body['products'], body['facets']
+
+
+def _counts(facet):
+    return Counter({item['id']: item['count'] for item in facet})
+
+
+def _bucket(price):
+    return next(index for index, (low, high) in enumerate(PRICE_BUCKETS) if high is None or price < high)
+
+
+@pytest.mark.parametrize('query', ['', 'vendor_id=1', 'category_id=1', 'search=spice', 'min_price=5'])
+def test_facet_counts_match_the_listing(client, query):
+    products, facets = _listing(client, query)
+
+    assert _counts(facets['category']) == Counter(p['category_id'] for p in products)
+    assert _counts(facets['vendor']) == Counter(p['vendor_id'] for p in products)
+    assert {f['value']: f['count'] for f in facets['origin_country']} == Counter(p['origin_country'] for p in products)
+    buckets = Counter(_bucket(p['price']) for p in products)
+    assert [f['count'] for f in facets['price']] == [buckets[index] for index in sorted(buckets)]
+
+
+def test_product_writes_refresh_cached_facets(client, auth):
+    # Product 1 is vendor 1's, in category 1
+    vendors_before = _counts(_listing(client, 'category_id=1')[1]['vendor'])
+    categories_before = _counts(_listing(client, 'vendor_id=1')[1]['category'])
+
+    client.put('/api/products/1', json={'category_id': 2}, headers=auth('mama_kemi'))
+
+    vendors_after = _counts(_listing(client, 'category_id=1')[1]['vendor'])
+    categories_after = _counts(_listing(client, 'vendor_id=1')[1]['category'])
+    assert vendors_before - vendors_after == Counter({1: 1})
+    assert categories_after - categories_before == Counter({2: 1})
+    assert categories_before - categories_after == Counter({1: 1})
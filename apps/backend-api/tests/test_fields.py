@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.fixture(params=['database', 'snapshot'])
+def source(request, app):
+    """Run the test against the database path and the snapshot path."""
+    if request.param == 'snapshot':
+        request.getfixturevalue('snapshots')._refresher.refresh_now()
+    return request.param
+
+
+def _get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_fields_limit_product_keys(client, source):
+    # Expansions are on by default; an empty expand leaves only the fields
+    listed = _get(client, '/api/products?fields=id,name&expand=')['products']
+    assert listed and all(set(product) == {'id', 'name'} for product in listed)
+
+    product = _get(client, '/api/products/1?fields=name&expand=')['product']
+    assert product == {'id': 1, 'name': 'Jollof Rice Spice Mix'}
+
+    expanded = _get(client, '/api/products/1?fields=name&expand=vendor')['product']
+    assert set(expanded) == {'id', 'name', 'vendor'}
+
+
+def test_unknown_fields_are_rejected(client, source):
+    assert client.get('/api/products?fields=id,secret').status_code == 400
+    assert client.get('/api/products/1?fields=password_hash').status_code == 400
+
+
+def test_fields_limit_order_keys(client, auth, place_order):
+    order = place_order()
+
+    response = client.get(f"/api/orders/{order['id']}?fields=status&expand=", headers=auth('john_buyer'))
+
+    assert response.get_json()['order'] == {'id': order['id'], 'status': 'pending'}
+    assert client.get('/api/orders?fields=nope', headers=auth('john_buyer')).status_code == 400
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from src.models.models import IdempotencyKey, Order, Product, db
+from src.services.idempotency import DEFAULT_LEASE
+
+
+def test_retry_replays_the_stored_response(client, auth):
+    headers = {**auth('john_buyer'), 'Idempotency-Key': 'checkout-1'}
+    body = {'vendor_id': 1, 'delivery_type': 'pickup', 'items': [{'product_id': 1, 'quantity': 2}]}
+
+    first = client.post('/api/orders', json=body, headers=headers)
+    retry = client.post('/api/orders', json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Order.query.count() == 1
+    assert db.session.get(Product, 1).stock_quantity == 48
+
+
+def test_key_reused_for_another_request_is_rejected(client, auth):
+    headers = {**auth('john_buyer'), 'Idempotency-Key': 'checkout-1'}
+    body = {'vendor_id': 1, 'delivery_type': 'pickup', 'items': [{'product_id': 1, 'quantity': 2}]}
+
+    client.post('/api/orders', json=body, headers=headers)
+    body['items'][0]['quantity'] = 3
+    response = client.post('/api/orders', json=body, headers=headers)
+
+    assert response.status_code == 422
+    assert Order.query.count() == 1
+
+
+def test_keys_are_per_user(client, auth):
+    body = {'vendor_id': 1, 'delivery_type': 'pickup', 'items': [{'product_id': 1, 'quantity': 1}]}
+
+    for username in ('john_buyer', 'sarah_customer'):
+        response = client.post(
+            '/api/orders', json=body, headers={**auth(username), 'Idempotency-Key': 'same-key'}
+        )
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+    assert Order.query.count() == 2
+
+
+def test_client_errors_are_stored_but_server_errors_release_the_key(client, auth):
+    headers = {**auth('john_buyer'), 'Idempotency-Key': 'too-many'}
+    body = {'vendor_id': 1, 'delivery_type': 'pickup', 'items': [{'product_id': 1, 'quantity': 1000}]}
+
+    first = client.post('/api/orders', json=body, headers=headers)
+    retry = client.post('/api/orders', json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 400
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+
+    headers['Idempotency-Key'] = 'broken'
+    response = client.post('/api/orders', data='not json', content_type='application/json', headers=headers)
+    assert response.status_code == 500
+    assert IdempotencyKey.query.filter_by(key='broken').first() is None
+
+
+def test_abandoned_claim_is_taken_over_after_the_lease(client, auth):
+    headers = {**auth('john_buyer'), 'Idempotency-Key': 'killed'}
+    body = {'vendor_id': 1, 'delivery_type': 'pickup', 'items': [{'product_id': 1, 'quantity': 1}]}
+    client.post('/api/orders', json=body, headers=headers)
+    # As if the worker had died after claiming the key
+    record = IdempotencyKey.query.filter_by(key='killed').one()
+    record.response_status = record.response_body = None
+    db.session.commit()
+
+    assert client.post('/api/orders', json=body, headers=headers).status_code == 409
+
+    record.created_at = datetime.utcnow() - timedelta(seconds=DEFAULT_LEASE + 1)
+    db.session.commit()
+    retry = client.post('/api/orders', json=body, headers=headers)
+
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert client.post('/api/orders', json=body, headers=headers).headers['Idempotent-Replayed'] == 'true'
@@ -0,0 +1,61 @@
+import pytest
+
+from src.models.models import Product, db
+from src.services.inventory import StockError, reserve_stock
+
+
+def _put(client, headers, updates):
+    return client.put('/api/products/inventory', json={'updates': updates}, headers=headers)
+
+
+def test_batch_update_applies_valid_entries(client, auth):
+    response = _put(client, auth('mama_kemi'), [
+        {'product_id': 1, 'stock_quantity': 7},
+        {'sku': 'MK002', 'stock_delta': -100, 'price_delta': 1.0},
+        {'product_id': 3, 'stock_quantity': -1},
+        {'product_id': 1, 'stock_delta': 1},
+    ])
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['updated'], body['failed']) == (2, 2)
+    assert [r['status'] for r in body['results']] == ['updated', 'updated', 'error', 'error']
+    assert body['results'][1]['stock_quantity'] == 0  # deltas clamp at zero
+    assert db.session.get(Product, 1).stock_quantity == 7
+    assert db.session.get(Product, 2).price == pytest.approx(9.99)
+    assert db.session.get(Product, 3).stock_quantity == 40
+
+
+def test_vendors_cannot_touch_other_vendors_products(client, auth):
+    response = _put(client, auth('mama_kemi'), [{'product_id': 4, 'stock_quantity': 0}])
+
+    assert response.get_json()['results'][0]['errors'] == ['Product not found']
+    assert db.session.get(Product, 4).stock_quantity == 25
+
+
+def test_reserve_stock_never_oversells(app):
+    reserve_stock({1: 50, 2: 10})
+    db.session.commit()
+    assert db.session.get(Product, 1).stock_quantity == 0
+
+    with pytest.raises(StockError, match='available: 0'):
+        reserve_stock({1: 1, 2: 1})
+    db.session.rollback()
+    assert db.session.get(Product, 2).stock_quantity == 20
+
+
+def test_low_stock_listing(client, auth):
+    _put(client, auth('admin'), [
+        {'product_id': 2, 'stock_quantity': 3},
+        {'product_id': 1, 'stock_quantity': 5},
+        {'product_id': 4, 'stock_quantity': 0},
+    ])
+
+    mine = client.get('/api/vendors/1/low-stock', headers=auth('mama_kemi')).get_json()
+    assert [p['id'] for p in mine['products']] == [2, 1]
+    everyone = client.get('/api/vendors/low-stock', headers=auth('admin')).get_json()
+    assert [p['id'] for p in everyone['products']] == [2, 1, 4]
+    assert everyone['vendors'] == [
+        {'vendor_id': 1, 'low_stock_count': 2}, {'vendor_id': 2, 'low_stock_count': 1}
+    ]
+    assert client.get('/api/vendors/2/low-stock', headers=auth('mama_kemi')).status_code == 403
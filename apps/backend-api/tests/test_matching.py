@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import update
+
+from src.models.models import Product, db
+from src.services import matching
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    monkeypatch.setattr(matching, '_index', matching.TrigramIndex())
+    monkeypatch.setattr(matching._refresher, 'ready', False)
+    return matching._index
+
+
+def _top(client, *lines):
+    response = client.post('/api/products/match', json={'lines': list(lines)})
+    assert response.status_code == 200, response.get_json()
+    return [match['candidates'][0]['product']['id'] if match['candidates'] else None
+            for match in response.get_json()['matches']]
+
+
+def test_match_is_unavailable_until_the_index_is_built(client, index):
+    loading = client.post('/api/products/match', json={'lines': ['2x plantain']})
+    assert loading.status_code == 503
+    assert loading.headers['Retry-After'] == '1'
+
+    matching._refresher.refresh_now()
+    assert _top(client, '2x plantain', 'scotch bonet') == [4, 5]
+
+
+def test_products_deactivated_since_the_last_refresh_are_not_matched(client, index):
+    matching._refresher.refresh_now()
+    # As another worker would, without this worker's index hearing of it
+    db.session.execute(update(Product).where(Product.id == 5).values(is_active=False))
+    db.session.commit()
+
+    assert _top(client, 'scotch bonet') == [None]
+
+
+def test_common_trigrams_are_intersected_rather_than_counted(client, index, monkeypatch):
+    matching._refresher.refresh_now()
+    monkeypatch.setattr(matching, 'MAX_SEED_POSTINGS', 0)
+
+    assert _top(client, 'scotch bonet', 'jollof rice') == [5, 1]
@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from src.models.models import Order, OrderStatus, db
+from src.models.serializers import serialized_fields
+from src.services import order_export
+from src.services.archive import archive_orders
+
+
+@pytest.fixture
+def orders(place_order):
+    two_items = place_order(items=[{'product_id': 1, 'quantity': 1}, {'product_id': 2, 'quantity': 3}])
+    one_item = place_order()
+    return two_items, one_item
+
+
+def _export(client, auth, **params):
+    response = client.get('/api/orders/export', query_string=params, headers=auth('admin'))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def test_ndjson_has_one_order_per_line(client, auth, orders, monkeypatch):
+    # Pages of one order exercise the keyset paging
+    monkeypatch.setattr(order_export, 'CHUNK_SIZE', 1)
+
+    response = _export(client, auth)
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="orders-')
+    assert response.headers['Content-Disposition'].endswith('.ndjson"')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == [order['id'] for order in orders]
+    assert all(set(line) == set(serialized_fields(Order)) | {'items'} for line in lines)
+    assert [[item['product_id'] for item in line['items']] for line in lines] == [[1, 2], [1]]
+
+
+def test_csv_has_one_row_per_item(client, auth, orders):
+    response = _export(client, auth, format='csv')
+
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].endswith('.csv"')
+    header, *rows = csv.reader(io.StringIO(response.get_data(as_text=True)))
+    assert header == list(serialized_fields(Order)) + [f'item_{field}' for field in order_export.ITEM_FIELDS]
+    records = [dict(zip(header, row)) for row in rows]
+    assert [(int(r['id']), int(r['item_product_id']), int(r['item_quantity'])) for r in records] == [
+        (orders[0]['id'], 1, 1), (orders[0]['id'], 2, 3), (orders[1]['id'], 1, 2),
+    ]
+
+
+def test_archived_orders_in_the_range_are_exported(client, auth, orders):
+    archived, recent = orders
+    then = datetime.utcnow() - timedelta(days=120)
+    db.session.execute(
+        update(Order).where(Order.id == archived['id'])
+        .values(status=OrderStatus.DELIVERED, created_at=then, updated_at=then)
+    )
+    db.session.commit()
+    assert archive_orders() == 1
+
+    date_from = (then - timedelta(days=1)).strftime('%Y-%m-%d')
+    lines = _export(client, auth, date_from=date_from).get_data(as_text=True).splitlines()
+    exported = [json.loads(line) for line in lines]
+    assert [order['id'] for order in exported] == [archived['id'], recent['id']]
+    assert len(exported[0]['items']) == 2
+
+    response = _export(client, auth, format='csv', date_from=date_from)
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row['id']) for row in rows] == [archived['id'], archived['id'], recent['id']]
+
+
+def test_export_is_admin_only_and_checks_the_format(client, auth, orders):
+    assert client.get('/api/orders/export', headers=auth('mama_kemi')).status_code == 403
+    assert client.get('/api/orders/export?format=xml', headers=auth('admin')).status_code == 400
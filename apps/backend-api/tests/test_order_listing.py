@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import event, update
+
+from src.models.models import Order, Rider, db
+
+VENDOR_ITEMS = {
+    1: [{'product_id': 1, 'quantity': 1}, {'product_id': 2, 'quantity': 1}],
+    2: [{'product_id': 4, 'quantity': 1}, {'product_id': 5, 'quantity': 1}],
+    3: [{'product_id': 7, 'quantity': 1}, {'product_id': 8, 'quantity': 1}],
+}
+
+
+@pytest.fixture
+def orders(auth, place_order):
+    for n in range(12):
+        vendor_id = n % 3 + 1
+        buyer = ('john_buyer', 'sarah_customer')[n % 2]
+        place_order(vendor_id=vendor_id, items=VENDOR_ITEMS[vendor_id], headers=auth(buyer))
+    riders = [rider.id for rider in Rider.query.all()]
+    for n, order in enumerate(Order.query.order_by(Order.id)):
+        db.session.execute(update(Order).where(Order.id == order.id).values(rider_id=riders[n % len(riders)]))
+    db.session.commit()
+
+
+def _statements(client, url, headers):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['orders'], statements
+
+
+def test_expanded_listing_runs_the_same_queries_at_any_page_size(client, auth, orders):
+    headers = auth('admin')
+    url = '/api/orders?expand=customer,vendor,rider,items&per_page={}'
+
+    small, small_statements = _statements(client, url.format(5), headers)
+    large, large_statements = _statements(client, url.format(50), headers)
+
+    assert (len(small), len(large)) == (5, 12)
+    assert all(order['customer'] and order['vendor'] and order['rider'] and order['items'] for order in large)
+    assert len(small_statements) == len(large_statements), large_statements
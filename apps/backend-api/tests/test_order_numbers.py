@@ -0,0 +1,58 @@
+import os
+
+from src.services import order_numbers
+from src.services.order_numbers import generate_order_number, generate_pickup_code, worker_id
+
+
+def _forked_worker_id():
+    """Worker id claimed by a forked copy of this process (as under gunicorn)."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write_end, str(worker_id()).encode())
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_end) as pipe:
+        return int(pipe.read())
+
+
+def test_forked_workers_get_distinct_ids_despite_shared_worker_id(app, monkeypatch):
+    monkeypatch.setenv('WORKER_ID', '40')
+    monkeypatch.setattr(order_numbers, '_worker', order_numbers._Worker())
+
+    parent = worker_id()
+
+    assert parent >= 40
+    assert _forked_worker_id() not in (parent, None)
+
+
+def test_order_numbers_are_unique_and_sorted(app):
+    numbers = [generate_order_number() for _ in range(2000)]
+
+    assert len(set(numbers)) == len(numbers)
+    assert numbers == sorted(numbers)
+
+
+def test_pickup_codes_are_random_six_digit_strings():
+    codes = [generate_pickup_code() for _ in range(50)]
+
+    assert len(set(codes)) > 1
+    assert all(len(code) == 6 and code.isdigit() for code in codes)
+
+
+def test_open_orders_never_share_a_pickup_code(client, auth, place_order, monkeypatch):
+    draws = iter(['123456', '123456', '654321', '123456'])
+    monkeypatch.setattr(order_numbers, 'generate_pickup_code', lambda: next(draws))
+
+    first = place_order(delivery_type='pickup')
+    second = place_order(delivery_type='pickup')
+    assert (first['pickup_code'], second['pickup_code']) == ('123456', '654321')
+
+    # Once the first order is closed its code is free again
+    response = client.put(f"/api/orders/{first['id']}/status", json={'status': 'cancelled'},
+                          headers=auth('john_buyer'))
+    assert response.status_code == 200, response.get_json()
+    assert place_order(delivery_type='pickup')['pickup_code'] == '123456'
@@ -0,0 +1,95 @@
+import pytest
+
+from src.models.models import Order, OrderEvent, OrderStatus, db
+from src.services.order_state import TRANSITIONS, can_transition
+
+S = OrderStatus
+
+
+def _set_status(client, auth, username, order_id, status):
+    return client.put(f'/api/orders/{order_id}/status', json={'status': status}, headers=auth(username))
+
+
+def test_final_statuses_have_no_way_out():
+    assert TRANSITIONS[S.DELIVERED] == set()
+    assert TRANSITIONS[S.CANCELLED] == set()
+    assert not can_transition(S.DELIVERED, S.PENDING)
+    assert can_transition(S.READY_FOR_PICKUP, S.DELIVERED)
+
+
+def test_vendor_walks_an_order_forward_with_events(client, auth, place_order):
+    order = place_order()
+
+    for status in ('confirmed', 'preparing', 'ready_for_pickup'):
+        response = _set_status(client, auth, 'mama_kemi', order['id'], status)
+        assert response.status_code == 200, response.get_json()
+
+    stored = db.session.get(Order, order['id'])
+    assert stored.status == S.READY_FOR_PICKUP
+    assert stored.preparation_started_at is not None
+    assert stored.ready_for_pickup_at is not None
+    events = OrderEvent.query.filter_by(order_id=order['id']).order_by(OrderEvent.id).all()
+    assert [(e.from_status, e.to_status) for e in events] == [
+        (None, S.PENDING), (S.PENDING, S.CONFIRMED), (S.CONFIRMED, S.PREPARING),
+        (S.PREPARING, S.READY_FOR_PICKUP),
+    ]
+
+
+@pytest.mark.parametrize('delivery_type, code', [('pickup', 200), ('delivery', 409)])
+def test_only_pickup_orders_are_delivered_from_ready(client, auth, place_order, delivery_type, code):
+    order = place_order(delivery_type=delivery_type)
+    for status in ('confirmed', 'ready_for_pickup'):
+        _set_status(client, auth, 'mama_kemi', order['id'], status)
+
+    assert _set_status(client, auth, 'admin', order['id'], 'delivered').status_code == code
+    bulk = client.put('/api/orders/status', json={'updates': [{'order_id': order['id'], 'status': 'delivered'}]},
+                      headers=auth('admin'))
+    assert bulk.get_json()['results'][0]['status'] == ('unchanged' if code == 200 else 'error')
+
+
+def test_skipping_ahead_is_a_conflict(client, auth, place_order):
+    order = place_order()
+
+    response = _set_status(client, auth, 'admin', order['id'], 'delivered')
+
+    assert response.status_code == 409
+    assert db.session.get(Order, order['id']).status == S.PENDING
+
+
+@pytest.mark.parametrize('username, status', [
+    ('mama_kemi', 'delivered'),         # not a vendor status
+    ('caribbean_delights', 'confirmed'),  # another vendor's order
+    ('sarah_customer', 'cancelled'),    # another buyer's order
+])
+def test_role_and_party_checks(client, auth, place_order, username, status):
+    order = place_order()
+
+    assert _set_status(client, auth, username, order['id'], status).status_code == 403
+
+
+def test_buyer_may_only_cancel_before_confirmation(client, auth, place_order):
+    first, second = place_order(), place_order()
+    _set_status(client, auth, 'mama_kemi', second['id'], 'confirmed')
+
+    assert _set_status(client, auth, 'john_buyer', first['id'], 'cancelled').status_code == 200
+    assert _set_status(client, auth, 'john_buyer', second['id'], 'cancelled').status_code == 403
+
+
+def test_bulk_update_reports_each_entry(client, auth, place_order):
+    first, second = place_order(), place_order()
+    updates = [
+        {'order_id': first['id'], 'status': 'confirmed'},
+        {'order_id': second['id'], 'status': 'delivered'},
+        {'order_id': 999999, 'status': 'confirmed'},
+        {'order_id': first['id'], 'status': 'preparing'},
+    ]
+
+    response = client.put('/api/orders/status', json={'updates': updates}, headers=auth('mama_kemi'))
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['updated'] == 1
+    assert [r['status'] for r in body['results']] == ['updated', 'error', 'error', 'error']
+    assert [r.get('code') for r in body['results'][1:3]] == [403, 404]
+    assert db.session.get(Order, first['id']).status == S.CONFIRMED
+    assert db.session.get(Order, second['id']).status == S.PENDING
@@ -0,0 +1,35 @@
+import re
+import threading
+import time
+
+from src.models.models import Order, OrderStatus, User, db
+from src.services.order_state import record_event
+from src.services.order_stream import latest_event_id, order_stream, publish_events, subscriber_filter
+
+
+def _sent_ids(chunk):
+    return [int(event_id) for event_id in re.findall(r'^id: (\d+)$', chunk, re.M)]
+
+
+def test_a_late_lower_event_is_not_skipped(app, monkeypatch, place_order):
+    monkeypatch.setitem(app.config, 'ORDER_STREAM_POLL_INTERVAL', 3600)
+    monkeypatch.setitem(app.config, 'ORDER_STREAM_HEARTBEAT', 3600)
+    first, second = (db.session.get(Order, place_order()['id']) for _ in range(2))
+    admin = User.query.filter_by(username='admin').one()
+    stream = order_stream(app, admin.id, subscriber_filter(admin), latest_event_id())
+    chunks = []
+    # The stream blocks waiting for the broker, so it runs on its own thread
+    reader = threading.Thread(target=lambda: chunks.extend([next(stream), next(stream)]), daemon=True)
+    reader.start()
+    time.sleep(0.2)
+
+    # The earlier event is committed but its publish has not arrived (or it
+    # was committed by another worker); only the later one is published
+    earlier = record_event(first, OrderStatus.PENDING, OrderStatus.CONFIRMED)
+    later = record_event(second, OrderStatus.PENDING, OrderStatus.CONFIRMED)
+    db.session.commit()
+    publish_events([later])
+    reader.join(5)
+
+    assert chunks[0].startswith('retry:')
+    assert _sent_ids(chunks[1]) == [earlier.id, later.id]
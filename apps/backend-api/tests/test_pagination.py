@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from src.models.models import Product, db
+
+
+@pytest.fixture
+def tied(app):
+    # Every product shares its created_at, and pairs share a price
+    db.session.execute(update(Product).values(created_at=datetime(2025, 1, 1), price=Product.id / 2))
+    db.session.commit()
+
+
+def _page(client, sort, cursor):
+    response = client.get('/api/products', query_string={'sort': sort, 'per_page': 2, 'cursor': cursor})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return [product['id'] for product in body['products']], body
+
+
+@pytest.mark.parametrize('sort, expected', [
+    ('newest', [9, 8, 7, 6, 5, 4, 3, 2, 1]),
+    ('price_asc', [1, 2, 3, 4, 5, 6, 7, 8, 9]),
+])
+def test_cursors_walk_tied_keys_both_ways(client, tied, sort, expected):
+    pages, cursor = [], ''
+    while cursor is not None:
+        ids, meta = _page(client, sort, cursor)
+        pages.append(ids)
+        cursor = meta['next_cursor']
+    assert [product_id for ids in pages for product_id in ids] == expected
+
+    # And back from the last page, one page at a time
+    cursor = meta['prev_cursor']
+    for ids in reversed(pages[:-1]):
+        back, meta = _page(client, sort, cursor)
+        assert back == ids
+        cursor = meta['prev_cursor']
+    assert cursor is None
+
+
+def test_malformed_cursors_are_rejected(client):
+    _, meta = _page(client, 'featured', '')
+
+    for cursor in ('not-a-cursor', meta['next_cursor'][:-4], '!!!!'):
+        assert client.get('/api/products', query_string={'cursor': cursor}).status_code == 400
+    # A cursor from a three-key sort does not fit the two-key default
+    assert client.get('/api/products', query_string={'cursor': meta['next_cursor']}).status_code == 400
@@ -0,0 +1,38 @@
+from src.models.models import Vendor, db
+from src.services import post_commit
+from src.services.post_commit import defer_increment, flush_increments
+
+
+def _set_status(client, headers, order_id, status):
+    response = client.put(f'/api/orders/{order_id}/status', json={'status': status}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+
+def test_delivery_counters_land_after_flush_and_refresh_cached_vendors(client, auth, place_order):
+    before = client.get('/api/vendors/1').get_json()['vendor']['total_orders']
+    order = place_order(delivery_type='pickup')
+    for status in ('confirmed', 'preparing', 'ready_for_pickup'):
+        _set_status(client, auth('mama_kemi'), order['id'], status)
+    _set_status(client, auth('admin'), order['id'], 'delivered')
+    # Cache the responses while the increment is still queued
+    client.get('/api/vendors/1')
+    client.get('/api/vendors')
+
+    flush_increments()
+
+    db.session.expire_all()
+    assert db.session.get(Vendor, 1).total_orders == before + 1
+    assert client.get('/api/vendors/1').get_json()['vendor']['total_orders'] == before + 1
+    listed = client.get('/api/vendors').get_json()['vendors']
+    assert next(v for v in listed if v['id'] == 1)['total_orders'] == before + 1
+
+
+def test_rolled_back_increments_are_not_queued(app):
+    before = db.session.get(Vendor, 1).total_orders
+    defer_increment(Vendor, 1, 'total_orders')
+    db.session.rollback()
+
+    assert not post_commit._queue._take()
+    flush_increments()
+    db.session.expire_all()
+    assert db.session.get(Vendor, 1).total_orders == before
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from src.models.models import Vendor, db
+
+BODY = {'vendor_id': 1, 'delivery_type': 'delivery', 'items': [{'product_id': 1, 'quantity': 1}]}
+
+
+def _set_fees(fee):
+    # As another worker would: no invalidation reaches this process
+    db.session.execute(update(Vendor).where(Vendor.id == 1).values(
+        delivery_fee=fee, peak_delivery_fee=fee, free_delivery_threshold=None, updated_at=datetime.utcnow()
+    ))
+    db.session.commit()
+
+
+def test_quotes_and_orders_pick_up_a_fee_changed_elsewhere(client, auth, place_order):
+    _set_fees(2.5)
+    quote = client.post('/api/orders/quote', json=BODY, headers=auth('john_buyer'))
+    assert quote.get_json()['quote']['delivery_fee'] == 2.5
+
+    _set_fees(4.0)
+
+    quote = client.post('/api/orders/quote', json=BODY, headers=auth('john_buyer'))
+    assert quote.get_json()['quote']['delivery_fee'] == 4.0
+    assert place_order()['delivery_fee'] == 4.0
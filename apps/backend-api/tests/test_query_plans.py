@@ -0,0 +1,71 @@
+"""Catalogue listings must be index range scans in sort order.
+
+A ``USE TEMP B-TREE FOR ORDER BY`` step means SQLite sorts every matching
+row before returning a page, which is what the composite indexes on
+``products`` exist to avoid.
+"""
+import pytest
+from sqlalchemy import func, select
+
+from src.models.models import Product
+from src.services.inventory import low_stock_filter
+from src.services.pagination import PRODUCT_SORTS, sort_order
+
+SORT_INDEXES = {
+    'newest': 'created_at',
+    'price_asc': 'price',
+    'price_desc': 'price',
+    'featured': 'featured',
+}
+FILTERS = {
+    'all': (),
+    'category': (Product.category_id == 1,),
+    'vendor': (Product.vendor_id == 1,),
+}
+
+
+def _listing(*filters):
+    return select(Product.id).where(Product.is_active == True, *filters)
+
+
+@pytest.mark.parametrize('sort', sorted(PRODUCT_SORTS))
+@pytest.mark.parametrize('scope', sorted(FILTERS))
+def test_sorted_listing_uses_matching_index(explain, scope, sort):
+    stmt = _listing(*FILTERS[scope]).order_by(*sort_order(PRODUCT_SORTS[sort])).limit(20)
+    plan = explain(stmt)
+
+    prefix = 'ix_products_active' if scope == 'all' else f'ix_products_active_{scope}'
+    assert len(plan) == 1, plan
+    assert f'{prefix}_{SORT_INDEXES[sort]} ' in plan[0]
+    assert not any('TEMP B-TREE' in step for step in plan)
+
+
+@pytest.mark.parametrize('sort', ['price_asc', 'price_desc'])
+def test_price_range_is_an_index_range(explain, sort):
+    stmt = _listing(Product.price >= 2, Product.price <= 5)
+    plan = explain(stmt.order_by(*sort_order(PRODUCT_SORTS[sort])).limit(20))
+
+    assert plan == [
+        'SEARCH products USING COVERING INDEX ix_products_active_price (is_active=? AND price>? AND price<?)'
+    ]
+
+
+def test_price_range_within_category(explain):
+    stmt = _listing(Product.category_id == 1, Product.price >= 2, Product.price <= 5)
+    plan = explain(stmt.order_by(*sort_order(PRODUCT_SORTS['price_asc'])).limit(20))
+
+    assert plan == [
+        'SEARCH products USING COVERING INDEX ix_products_active_category_price '
+        '(is_active=? AND category_id=? AND price>? AND price<?)'
+    ]
+
+
+@pytest.mark.parametrize('scope', ['all', 'vendor'])
+def test_low_stock_listing_reads_the_partial_index(explain, scope):
+    stmt = select(Product.id).where(low_stock_filter(), *FILTERS[scope])
+    listing = explain(stmt.order_by(Product.vendor_id, Product.stock_quantity, Product.id).limit(20))
+    count = explain(select(func.count()).select_from(stmt.subquery()))
+
+    for plan in (listing, count):
+        assert len(plan) == 1, plan
+        assert 'INDEX ix_products_active_low_stock ' in plan[0]
@@ -0,0 +1,59 @@
+from sqlalchemy import update
+
+from src.models.models import Rider, Vendor, VendorRider, db
+from src.services import response_cache
+
+
+def _assign(vendor_id, rider_id):
+    if VendorRider.query.filter_by(vendor_id=vendor_id, rider_id=rider_id).first() is None:
+        db.session.add(VendorRider(vendor_id=vendor_id, rider_id=rider_id, is_active=True))
+        db.session.commit()
+
+
+def test_vendor_responses_are_served_from_cache(client):
+    first = client.get('/api/vendors/1')
+    again = client.get('/api/vendors/1', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+
+
+def test_another_workers_write_retires_this_workers_copy(client):
+    first = client.get('/api/vendors/1')
+
+    # What a write in another process does: commit, then invalidate through
+    # its own mapping of the shared counters
+    db.session.execute(update(Vendor).where(Vendor.id == 1).values(business_name='Kemi Foods'))
+    db.session.commit()
+    response_cache._SharedVersions().bump(['vendor:1'])
+
+    again = client.get('/api/vendors/1', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert again.get_json()['vendor']['business_name'] == 'Kemi Foods'
+
+
+def test_rider_updates_refresh_vendors_embedding_the_rider(client, auth):
+    rider = Rider.query.join(Rider.user).filter_by(username='kwame_rider').one()
+    _assign(1, rider.id)
+    client.get('/api/vendors/1')
+
+    client.put('/api/riders/location', json={'latitude': 51.5, 'longitude': -0.1}, headers=auth('kwame_rider'))
+    client.put('/api/riders/availability', json={'is_available': False}, headers=auth('kwame_rider'))
+
+    riders = client.get('/api/vendors/1').get_json()['vendor']['assigned_riders']
+    embedded = next(r for r in riders if r['id'] == rider.id)
+    assert embedded['current_latitude'] == 51.5
+    assert embedded['is_available'] is False
+
+
+def test_user_profile_updates_refresh_vendors_embedding_the_user(client, auth):
+    owner_id = db.session.get(Vendor, 1).user_id
+    client.get('/api/vendors')
+    client.get('/api/vendors/1')
+
+    response = client.put(f'/api/users/{owner_id}', json={'first_name': 'Oluwakemi'}, headers=auth('mama_kemi'))
+    assert response.status_code == 200
+
+    listed = client.get('/api/vendors').get_json()['vendors']
+    assert next(v for v in listed if v['id'] == 1)['user']['first_name'] == 'Oluwakemi'
+    assert client.get('/api/vendors/1').get_json()['vendor']['user']['first_name'] == 'Oluwakemi'
@@ -0,0 +1,54 @@
+from sqlalchemy import delete, text
+
+from src.models.models import Product, db
+from src.services.search import FTS_TABLE
+
+
+def _search(client, term):
+    response = client.get('/api/products', query_string={'search': term})
+    assert response.status_code == 200, response.get_json()
+    return [product['id'] for product in response.get_json()['products']]
+
+
+def _indexed(term):
+    """Rowids the FTS index itself matches, active or not."""
+    rows = db.session.execute(
+        text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :term ORDER BY rowid'), {'term': term}
+    )
+    return [row[0] for row in rows]
+
+
+def test_terms_match_word_prefixes(client):
+    assert 1 in _search(client, 'jol')
+    assert 1 in _search(client, 'JOLLOF ric')
+    assert _search(client, 'ollof') == []
+    # Quoted terms: FTS5 syntax in the input is not interpreted
+    assert _search(client, 'jollof OR "') == _search(client, 'jollof or')
+
+
+def test_name_hits_rank_above_description_hits(client, auth):
+    client.put('/api/products/2', json={'description': 'Pairs well with zobo'}, headers=auth('mama_kemi'))
+    client.put('/api/products/6', json={'name': 'Zobo Sorrel Concentrate'}, headers=auth('caribbean_delights'))
+
+    assert _search(client, 'zob') == [6, 2]
+
+
+def test_triggers_follow_product_writes(client, auth):
+    created = client.post('/api/products', json={
+        'category_id': 1, 'name': 'Egusi Seeds', 'price': 4.5, 'stock_quantity': 10
+    }, headers=auth('mama_kemi'))
+    product_id = created.get_json()['product']['id']
+    assert _search(client, 'egusi') == [product_id]
+
+    client.put(f'/api/products/{product_id}', json={'name': 'Ground Melon Seeds'}, headers=auth('mama_kemi'))
+    assert _search(client, 'egusi') == []
+    assert _search(client, 'melon') == [product_id]
+
+    # Deactivated products stay indexed but are not listed
+    client.delete(f'/api/products/{product_id}', headers=auth('mama_kemi'))
+    assert _indexed('melon') == [product_id]
+    assert _search(client, 'melon') == []
+
+    db.session.execute(delete(Product).where(Product.id == product_id))
+    db.session.commit()
+    assert _indexed('melon') == []
@@ -0,0 +1,24 @@
+def test_requests_never_build_the_snapshot(client, snapshots, tmp_path):
+    response = client.get('/api/products')
+
+    assert response.status_code == 200
+    assert snapshots.current_snapshot() is None
+    assert not (tmp_path / 'catalogue.snapshot').exists()
+
+    snapshots._refresher.refresh_now()
+    assert snapshots.current_snapshot().product(1)['id'] == 1
+
+
+def test_writer_reads_the_database_until_the_rebuild_lands(client, auth, snapshots):
+    snapshots._refresher.refresh_now()
+    old = snapshots.current_snapshot()
+
+    response = client.put('/api/products/1', json={'name': 'Fresh Yam'}, headers=auth('mama_kemi'))
+    assert response.status_code == 200
+
+    assert snapshots.current_snapshot() is None
+    assert client.get('/api/products/1').get_json()['product']['name'] == 'Fresh Yam'
+    assert old.product(1)['name'] != 'Fresh Yam'
+
+    snapshots._refresher.refresh_now()
+    assert snapshots.current_snapshot().product(1)['name'] == 'Fresh Yam'
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from src.models.models import Product, db
+from src.services import suggest
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    # Seed rows are otherwise within the watermark lag of every change
+    db.session.execute(update(Product).values(updated_at=datetime(2024, 1, 1)))
+    db.session.commit()
+    monkeypatch.setattr(suggest, '_index', suggest.SuggestIndex())
+    monkeypatch.setattr(suggest._refresher, 'ready', False)
+    return suggest._index
+
+
+def _category_count(index, category_id):
+    return -index._entries[('category', category_id)][1][0]
+
+
+def test_suggest_is_unavailable_until_the_index_is_built(client, index):
+    loading = client.get('/api/products/suggest?q=jol')
+    assert loading.status_code == 503
+    assert loading.headers['Retry-After'] == '1'
+
+    suggest._refresher.refresh_now()
+    suggestions = client.get('/api/products/suggest?q=jol').get_json()['suggestions']
+    assert suggestions == [{'type': 'product', 'id': 1, 'text': 'Jollof Rice Spice Mix'}]
+
+
+def test_moving_a_product_recounts_only_the_two_categories(client, auth, index, monkeypatch):
+    suggest.refresh(index)
+    assert (_category_count(index, 1), _category_count(index, 2)) == (2, 1)
+
+    recounted = []
+    category_entries = suggest._category_entries
+    monkeypatch.setattr(suggest, '_category_entries', lambda ids=None: recounted.append(ids) or category_entries(ids))
+    client.put('/api/products/1', json={'category_id': 2}, headers=auth('mama_kemi'))
+    suggest.refresh(index)
+
+    assert recounted == [{1, 2}]
+    assert (_category_count(index, 1), _category_count(index, 2)) == (1, 2)
+
+
+def test_bulk_changes_rebuild_the_index(client, auth, index, monkeypatch):
+    suggest.refresh(index)
+    monkeypatch.setattr(suggest, 'REPLACE_THRESHOLD', 1)
+    monkeypatch.setattr(index, 'update', lambda *args: pytest.fail('updated row by row'))
+    for product_id, name in ((1, 'Jollof Seasoning'), (2, 'Red Palm Oil')):
+        client.put(f'/api/products/{product_id}', json={'name': name}, headers=auth('mama_kemi'))
+
+    suggest.refresh(index)
+
+    assert {'type': 'product', 'id': 1, 'text': 'Jollof Seasoning'} in index.search('seas')
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import text, update
+
+from src.models.models import Product, ProductTag, db
+from src.services.schema import migrate_data
+from src.services.tags import backfill_product_tags
+
+TAGS = {1: ['rice', 'spicy'], 2: ['price', 'spicy'], 4: ['Rice']}
+
+
+@pytest.fixture
+def tagged(client, auth):
+    owners = {1: 'mama_kemi', 2: 'mama_kemi', 4: 'caribbean_delights'}
+    for product_id, tags in TAGS.items():
+        response = client.put(f'/api/products/{product_id}', json={'tags': tags}, headers=auth(owners[product_id]))
+        assert response.status_code == 200, response.get_json()
+
+
+def _ids(client, query):
+    response = client.get(f'/api/products?{query}')
+    assert response.status_code == 200, response.get_json()
+    return sorted(product['id'] for product in response.get_json()['products'])
+
+
+def test_tag_filter_matches_whole_tags(client, tagged):
+    assert _ids(client, 'tag=rice') == [1, 4]
+    assert _ids(client, 'tag=RICE,price') == [1, 2, 4]
+    assert _ids(client, 'tag=rice&tag=spicy&tag_mode=all') == [1]
+    assert _ids(client, 'tag=ric') == []
+    assert client.get('/api/products?tag=rice&tag_mode=some').status_code == 400
+
+
+def test_backfill_runs_once_per_database(app):
+    # Rows written before the tag tables existed
+    db.session.execute(update(Product).where(Product.id == 1).values(tags='["Rice", "spicy"]'))
+    db.session.execute(update(Product).where(Product.id == 2).values(tags='[""]'))
+    db.session.execute(text('PRAGMA user_version = 0'))
+    db.session.commit()
+
+    migrate_data(1, backfill_product_tags)
+    assert ProductTag.query.filter_by(product_id=1).count() == 2
+
+    runs = []
+    migrate_data(1, lambda: runs.append(1))
+    assert runs == []